@@ -1,6 +1,6 @@
 from .action import access
+from . import gitmeta
 import os
-import subprocess
 
 
 def _get_version():
@@ -26,15 +26,9 @@ def _get_version():
             version = "0.0.0"
 
     # Append git short commit hash if in a git repo
-    try:
-        commit = subprocess.check_output(
-            ["git", "-C", root_dir, "rev-parse", "--short", "HEAD"],
-            stderr=subprocess.DEVNULL, text=True
-        ).strip()
-        if commit:
-            version = f"{version}+{commit}"
-    except Exception:
-        pass
+    head = gitmeta.read_head(root_dir)
+    if head and head['commit']:
+        version = f"{version}+{head['commit'][:7]}"
 
     return version
 
@@ -5,15 +5,27 @@ import yaml
 import logging
 import re
 import shutil
+import keyword
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from filelock import Timeout
 
 from .logger import logger, setup_logging
 
 from . import utils
 from .index import Index
 from .repo import Repo
+from .repo_registry import RepoRegistry
 from .item import Item
 from .error_codes import WarningCode
+from .cache_reservation import CacheReservation
+from .blob_store import BlobStore
+from . import cache_keys
+from . import cache_layout
+from . import trash
+from . import remote_cache
+from . import cache_placement
+from . import index_artifact
 
 # Base class for actions
 
@@ -45,6 +57,10 @@ class Action:
         # logger.info(f"options = {options}")
 
         action_name = action_name.replace("-", "_")
+        # actions named after python keywords (e.g. import) are implemented
+        # as <name>_
+        if keyword.iskeyword(action_name):
+            action_name += "_"
 
         action_target = options.get('target')
         if not action_target:
@@ -84,24 +100,9 @@ class Action:
         return None
 
     def load_repos_and_meta(self):
-        repos_list = []
-        repos_file_path = os.path.join(self.repos_path, 'repos.json')
-
-        # Read the JSON file line by line
-        try:
-            # Load and parse the JSON file containing the list of repository
-            # paths
-            with open(repos_file_path, 'r') as file:
-                repo_paths = json.load(file)  # Load the JSON file into a list
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding JSON: {e}")
-            return []
-        except FileNotFoundError:
-            logger.error(f"Error: File {repos_file_path} not found.")
-            return []
-        except Exception as e:
-            logger.error(f"Error reading file: {e}")
-            return []
+        # repos.json and the repo metas are only read again when repos.json
+        # changed since the last call in this process
+        repos_list = RepoRegistry.get(self.repos_path).get_repos()
 
         def is_curdir_inside_path(base_path):
             # Convert to absolute paths
@@ -111,51 +112,11 @@ class Action:
             # Check if curdir is inside base_path
             return base_path in curdir.parents or curdir == base_path
 
-        # Iterate through the list of repository paths
-        for repo_path in repo_paths:
-            if not os.path.exists(repo_path):
-                logger.warning(
-                    f"""Warning: {repo_path} not found. Considering it as a corrupt entry and deleting from repos.json...""")
-                from .repo_action import rm_repo
-                res = rm_repo(
-                    repo_path,
-                    os.path.join(
-                        self.repos_path,
-                        'repos.json'),
-                    True)
-
-                if res["return"] > 0:
-                    return res
-                continue
-
-            repo_path = repo_path.strip()  # Remove any extra whitespace or newlines
-            if is_curdir_inside_path(repo_path):
-                self.current_repo_path = repo_path
-
-           # Skip empty lines
-            if not repo_path:
-                continue
-
-            meta_yaml_path = os.path.join(repo_path, "meta.yaml")
-
-            # Check if meta.yaml exists
-            if not os.path.isfile(meta_yaml_path):
-                logger.warning(
-                    f"{meta_yaml_path} not found. Could be due to accidental deletion of meta.yaml. Try to stash the changes or reclone by doing `rm repo` and `pull repo`. Skipping...")
-                continue
-
-            # Load the YAML file
-            try:
-                with open(meta_yaml_path, 'r') as yaml_file:
-                    meta = yaml.safe_load(yaml_file)
-            except yaml.YAMLError as e:
-                logger.error(f"Error loading YAML in {meta_yaml_path}: {e}")
-                continue
-
-            if meta['alias'] == "local":
-                self.local_repo = f"""{meta['alias']},{meta['uid']}"""
-            # Create a Repo object and add it to the list
-            repos_list.append(Repo(path=repo_path, meta=meta))
+        for repo in repos_list:
+            if is_curdir_inside_path(repo.path):
+                self.current_repo_path = repo.path
+            if repo.meta.get('alias') == "local":
+                self.local_repo = f"""{repo.meta['alias']},{repo.meta['uid']}"""
         return repos_list
 
     def load_repos(self):
@@ -227,10 +188,76 @@ class Action:
         # logger.info(f"In Action class: {self.repos_path}")
         self._index = None
 
+    def _get_local_repo(self):
+        res = self.access({
+            "automation": "repo",
+            "action": "find",
+            "item": f"{self.local_repo}"
+        })
+        if res["return"] > 0:
+            return res
+        if len(res["list"]) == 0:
+            return {'return': 1, 'error': 'Local repo is not registered in MLC'}
+        return {'return': 0, 'repo': res["list"][0]}
+
+    def _remove_tmp_cache(self, path):
+        """
+        Remove a tmp cache placed on tmpfs together with its index entry and
+        its references to deduplicated blobs.
+        """
+        index = self.get_index()
+        # other processes may have updated the index since it was loaded
+        index.reload_index("cache")
+        entries = [entry for entry in index.indices["cache"]
+                   if entry["path"] == path]
+        metas = [Item(path, None).meta] if os.path.isdir(path) else []
+        metas = [meta for meta in metas if meta]
+        if entries and not metas:
+            metas = [{"uid": entry["uid"]} for entry in entries]
+        index.rm_items(metas, "cache")
+        for meta in metas:
+            if meta.get('cache_key'):
+                cache_keys.remove_key(self.repos_path, meta['cache_key'], path)
+        shutil.rmtree(path, ignore_errors=True)
+
+        blob_store = BlobStore(self.repos_path)
+        if blob_store.exists() and metas:
+            res = blob_store.release([meta['uid'] for meta in metas])
+            if res['return'] > 0:
+                logger.warning(res['error'])
+
+    def _fetch_remote_cache(self, key):
+        """
+        Look up a cache key in the remote cache configured by MLC_CACHE_REMOTE and
+        add the downloaded entry to the local repo on a hit. Remote failures are
+        reported as misses so that the cache can still be created locally.
+
+        Returns:
+            Item: The fetched cache item or None.
+        """
+        remote = remote_cache.get_remote_cache()
+        if not remote:
+            return None
+
+        res = self._get_local_repo()
+        if res['return'] > 0:
+            logger.warning(res['error'])
+            return None
+
+        r = remote_cache.fetch(
+            remote, key, self.repos_path, res['repo'], self.get_index())
+        if r['return'] > 0:
+            logger.warning(f"Remote cache lookup failed: {r['error']}")
+            return None
+        return r['list'][0] if r['list'] else None
+
     def add(self, i):
         """
         Adds a new item to the repository.
 
+        Cache items are created while holding the per-key cache reservation lock,
+        so that concurrent processes never create the same cache at the same time.
+
         Args:
             i (dict): Input dictionary with the following keys:
                 - item_repo (tuple): Repository alias and UID (default: local repo).
@@ -238,10 +265,85 @@ class Action:
                 - tags (str): Comma-separated tags.
                 - new_tags (str): Additional comma-separated tags to add.
                 - yaml (bool): Whether to save metadata in YAML format. Defaults to JSON.
+                - cache_key_env (dict): Env which together with the tags determines the cache key (cache only).
+                - cache_key (str): Explicit cache key overriding the one computed from tags and cache_key_env (cache only).
+                - single_flight (bool): Return an existing cache with exactly the same tags and cache key
+                                        instead of creating a new one (cache only). On a local miss, the remote
+                                        cache (MLC_CACHE_REMOTE) is consulted for the cache key.
+                - reservation_timeout (float): Seconds to wait for another process creating the cache with the
+                                               same key (cache only, default: no limit).
 
         Returns:
             dict: Result of the operation with 'return' code and error/message if applicable.
         """
+        target_name = i.get('target_name', self.action_type)
+        if target_name != "cache":
+            return self._add_item(i)
+
+        res = utils.get_cache_key(i.get('tags', ''), i.get('cache_key_env'))
+        if res['return'] > 0:
+            return res
+        cache_key = i.get('cache_key', res['key'])
+
+        reservation = CacheReservation(
+            self.repos_path, cache_key, timeout=i.get('reservation_timeout', -1))
+        try:
+            reservation.acquire()
+        except Timeout:
+            return reservation.get_timeout_error()
+        try:
+            if i.get('single_flight') and i.get('tags'):
+                # another process may have created the cache while we were
+                # waiting for the reservation
+                self.get_index().reload_index("cache")
+                r = self.search({'target_name': 'cache',
+                                 'tags': i['tags'],
+                                 'exact_tags_match': True})
+                if r['return'] > 0:
+                    return r
+                # the same tags with another env make another cache
+                matches = [item for item in r['list']
+                           if item.meta.get('cache_key') == cache_key]
+                if matches:
+                    existing = matches[0]
+                    logger.debug(
+                        f"Reusing cache created by another process at {existing.path}")
+                    return {
+                        "return": 0,
+                        "message": f"Item already exists at {existing.path}",
+                        "path": existing.path,
+                        "repo": existing.repo,
+                        "existing": True,
+                        "lock_wait_time": reservation.wait_time
+                    }
+                fetched = self._fetch_remote_cache(cache_key)
+                if fetched:
+                    return {
+                        "return": 0,
+                        "message": f"Item fetched from the remote cache to {fetched.path}",
+                        "path": fetched.path,
+                        "repo": fetched.repo,
+                        "existing": True,
+                        "remote": True,
+                        "lock_wait_time": reservation.wait_time
+                    }
+            # the meta of the caller is left as it is
+            meta = dict(i['meta']) if isinstance(i.get('meta'), dict) else {}
+            meta['cache_key'] = cache_key
+            i = {**i, 'meta': meta}
+            r = self._add_item(i)
+            if r['return'] == 0:
+                cache_keys.save_key(self.repos_path, cache_key,
+                                    r['path'], i['meta']['uid'])
+        finally:
+            reservation.release()
+
+        if r['return'] == 0:
+            r['lock_wait_time'] = reservation.wait_time
+            r['cache_key'] = cache_key
+        return r
+
+    def _add_item(self, i):
         # Determine repository
         item_repo = i.get("item_repo")
         if not item_repo:
@@ -296,11 +398,32 @@ class Action:
         else:
             folder_name = item_name or item_id
 
+        tmp_root = None
+        if target_name == "cache":
+            tags = (i.get("tags") or "").split(",") + \
+                (i.get("new_tags") or "").split(",")
+            if 'tmp' in tags and repo.meta.get('alias') == "local":
+                tmp_root = cache_placement.place_tmp_cache(self.repos_path)
+            if tmp_root:
+                target_path = tmp_root
+            else:
+                if repo.meta.get('alias') == "local":
+                    target_path = cache_placement.select_cache_root(
+                        self.repos_path, [t for t in tags if t], target_path)
+                target_path = cache_layout.get_item_parent(
+                    target_path, item_id, cache_layout.get_layout(target_path))
+
         item_path = os.path.join(target_path, folder_name)
 
         if os.path.exists(item_path):
             return {"return": 1, "error": f"""Item exists at {item_path}"""}
 
+        if tmp_root:
+            # the owner file is written first so that `mlc gc` never takes
+            # the new folder for the one of a process which is gone
+            cache_placement.register_tmp_cache(
+                item_path, self._remove_tmp_cache)
+
         # Create item directory if it does not exist
         os.makedirs(item_path)
 
@@ -314,6 +437,9 @@ class Action:
         if res['return'] > 0:
             return res
 
+        if tmp_root:
+            logger.debug(f"Created the tmp cache {item_path} on tmpfs")
+
         return {
             "return": 0,
             "message": f"Item successfully added at {item_path}",
@@ -331,6 +457,8 @@ class Action:
                 - item (str): Item alias and optional UID in "alias,uid" format.
                 - tags (str): Comma-separated tags.
                 - yaml (bool): Whether to save metadata in YAML format. Defaults to JSON.
+                - detach (bool): Delete the removed items in a detached background process.
+                - cascade (bool): Also remove the caches depending on the removed caches.
 
         Returns:
             dict: Result of the operation with 'return' code and error/message if applicable.
@@ -400,30 +528,60 @@ class Action:
                         force_remove = True
 
         results = res['list']
+        if i.get('cascade') and target_name == "cache":
+            dependents = self.get_index().get_cache_dependents(
+                [result.path for result in results])
+            if dependents:
+                logger.info(
+                    f"Also removing {len(dependents)} dependent {target_name} item(s)")
+                results = results + [Item(entry['path'], entry['repo'])
+                                     for entry in dependents]
+        removed = []
+        trash_paths = set()
 
-        for result in results:
-            item_path = result.path
-            item_meta = result.meta
-
-            if os.path.exists(item_path):
-                if force_remove == True:
-                    shutil.rmtree(item_path)
-                else:
-                    user_choice = input(
-                        f"Confirm to delete {target_name} item: {item_path}? (yes/no): ").strip().lower()
-                    if user_choice not in ['yes', 'y']:
-                        continue
+        try:
+            for result in results:
+                item_path = result.path
+
+                if os.path.exists(item_path):
+                    if force_remove != True:
+                        user_choice = input(
+                            f"Confirm to delete {target_name} item: {item_path}? (yes/no): ").strip().lower()
+                        if user_choice not in ['yes', 'y']:
+                            continue
+
+                    # renaming into the trash is atomic, the contents are
+                    # deleted after the index is updated
+                    trash_path = trash.get_trash_path(
+                        self.repos_path, item_path)
+                    if trash.move_to_trash(item_path, trash_path):
+                        trash_paths.add(trash_path)
                     else:
                         shutil.rmtree(item_path)
 
-                logger.info(
-                    f"{target_name} item: {item_path} has been successfully removed")
+                    logger.info(
+                        f"{target_name} item: {item_path} has been successfully removed")
 
-            self.get_index().rm(item_meta, target_name, item_path)
+                removed.append(result)
+        finally:
+            # update the index once for all the removed items, even if
+            # interrupted
+            self.get_index().rm_items(
+                [result.meta for result in removed], target_name)
+
+        if trash_paths:
+            if i.get('detach'):
+                logger.info(
+                    "Deleting the removed items in the background. Run `mlc gc` to finish an interrupted deletion")
+                trash.empty_trash_detached()
+            else:
+                for trash_path in trash_paths:
+                    trash.empty_trash(trash_path)
 
         return {
             "return": 0,
             "message": f"Item {item_path} successfully removed",
+            "list": removed
         }
 
     def save_new_meta(self, i, item_id, item_name,
@@ -725,6 +883,45 @@ class Action:
         exact_tags_match = i.get('exact_tags_match', False)
         fetch_all = True if i.get('fetch_all') else False
 
+        # version filters are answered from the versions stored in the index
+        version_min = utils.version_to_tuple(
+            i['version_min']) if i.get('version_min') else None
+        version_max = utils.version_to_tuple(
+            i['version_max']) if i.get('version_max') else None
+
+        def version_matches(entry):
+            if version_min is None and version_max is None:
+                return True
+            version_key = entry.get('version_key')
+            if version_key is None:
+                return False
+            return (version_min is None or version_key >= version_min) and (
+                version_max is None or version_key <= version_max)
+
+        # caches can be looked up by the new_env of their cached state, e.g.
+        # which cache produced a path
+        env = i.get('env') if target == "cache" else None
+        if env and not isinstance(env, dict):
+            return {'return': 1,
+                    'error': "env must be given as --env.<KEY>=<value>"}
+        env_uids = self.get_index().find_cache_by_env(env) if env else None
+
+        def env_matches(entry):
+            if not env:
+                return True
+            if env_uids is not None:
+                return entry['uid'] in env_uids
+            # the env index is disabled: read the cached state
+            state_file = os.path.join(entry['path'], "mlc-cached-state.json")
+            try:
+                with open(state_file, "r") as f:
+                    new_env = json.load(f).get("new_env", {})
+            except (OSError, ValueError, AttributeError):
+                return False
+            return isinstance(new_env, dict) and all(
+                key in new_env and str(new_env[key]) == str(value)
+                for key, value in env.items())
+
         # For targets like cache, sometimes user would need to clear the entire cache folder present in the system
         # this helps to fetch entire data pertaining to particular target
         if fetch_all:
@@ -787,6 +984,8 @@ class Action:
                 tags = i.get("tags")
                 if tags:
                     tags_split = tags.split(",")
+                elif env:
+                    tags_split = []
                 else:
                     return {
                         "return": 1, "error": f"Tags are not specified for completing the requested action"}
@@ -804,6 +1003,8 @@ class Action:
                 p_tags = list(set(tags_to_match) - set(n_tags_))
                 for res in target_index:
                     c_tags = res["tags"]
+                    if not version_matches(res) or not env_matches(res):
+                        continue
                     if (exact_tags_match and set(p_tags) == set(c_tags)) or (not exact_tags_match and set(
                             p_tags).issubset(set(c_tags)) and set(n_tags).isdisjoint(set(c_tags))):
                         it = Item(res['path'], res['repo'])
@@ -820,6 +1021,9 @@ class Action:
             i (dict): Input dictionary with the following keys:
                 - reindex_target (str, optional): Target to reindex ('script', 'cache', 'repo', 'all', or None).
                                                    If not provided or 'all', reindexes all targets.
+                - artifacts (str or bool, optional): Also write the index artifacts of the clean git
+                                                     checkouts of the repos to this folder (True: the
+                                                     MLC_INDEX_ARTIFACTS folder).
 
         Returns:
             dict: Result of the operation with 'return' code 0 on success.
@@ -828,15 +1032,26 @@ class Action:
             mlc reindex               # Reindex all targets
             mlc reindex script        # Reindex only script target
             mlc reindex cache         # Reindex only cache target
+            mlc reindex --artifacts=/shared/mlc-index   # Also write the index artifacts
         """
         reindex_target = i.get('reindex_target')
 
+        artifacts_dir = None
+        if i.get('artifacts'):
+            artifacts_dir = index_artifact.get_artifacts_dir(
+                i['artifacts'] if isinstance(i['artifacts'], str) else None)
+            if not artifacts_dir:
+                return {'return': 1,
+                        'error': 'Use --artifacts=<folder> or set MLC_INDEX_ARTIFACTS to write the index artifacts'}
+
         if not reindex_target or reindex_target == 'all' or reindex_target == 'repos' or reindex_target == 'repo':
             # Reindex all targets
             logger.info(
                 "Reindexing all targets (script, cache, experiment)...")
             index = self.get_index()
             index.build_index(force_rebuild=True)
+            if artifacts_dir:
+                self._save_index_artifacts(index, artifacts_dir)
 
             logger.info("Successfully reindexed all targets.")
             return {'return': 0, 'message': 'All targets reindexed successfully'}
@@ -859,11 +1074,116 @@ class Action:
             # individual target rebuild is not implemented and not very
             # critical)
             index.build_index(force_rebuild=True)
+            if artifacts_dir:
+                self._save_index_artifacts(index, artifacts_dir)
 
             logger.info(f"Successfully reindexed {reindex_target} target.")
             return {
                 'return': 0, 'message': f'{reindex_target} target reindexed successfully'}
 
+    def _save_index_artifacts(self, index, artifacts_dir):
+        for artifact_path in index.save_repo_artifacts(artifacts_dir):
+            logger.info(f"Saved the index artifact {artifact_path}")
+
+    def _detect_old_repos_path(self):
+        """
+        Detect the previous location of the repos folder from the repo paths
+        registered in repos.json which no longer exist.
+        """
+        for repo_path in self.load_repos() or []:
+            repo_path = repo_path.rstrip("/\\")
+            if os.path.exists(repo_path):
+                continue
+            if os.path.isfile(os.path.join(
+                    self.repos_path, os.path.basename(repo_path), "meta.yaml")):
+                return os.path.dirname(repo_path)
+        return None
+
+    def relocate(self, i):
+        """
+        Update the absolute paths stored in repos.json, cache metas, cached states
+        and cache keys after the repos folder was moved or mounted at a different path.
+
+        Args:
+            i (dict): Input dictionary with the following keys:
+                - from (str, optional): Previous path of the repos folder. Detected from
+                                        repos.json if not given.
+
+        Returns:
+            dict: Result of the operation with 'return' code, the old and new paths
+                  and the number of rewritten files.
+
+        Example:
+            mlc relocate
+            mlc relocate --from=/home/user/MLC/repos
+        """
+        old_path = i.get('from') or self._detect_old_repos_path()
+        if not old_path:
+            return {'return': 1,
+                    'error': 'Could not detect the previous path of the repos folder. Use --from=<path>'}
+        old_path = old_path.rstrip("/\\")
+        new_path = self.repos_path.rstrip("/\\")
+        if old_path == new_path:
+            return {'return': 0, 'message': 'Nothing to relocate',
+                    'from': old_path, 'to': new_path, 'rewritten': 0}
+
+        old_prefix = os.path.join(old_path, "")
+        new_prefix = os.path.join(new_path, "")
+
+        def rewrite(value):
+            if value == old_path:
+                return new_path
+            return value.replace(old_prefix, new_prefix)
+
+        # repos.json is rewritten under its lock and reloaded
+        rewritten = 0
+        repos_lists = []
+
+        def rewrite_repos(repos_list):
+            repos_lists.append(repos_list)
+            return [rewrite(path) for path in repos_list]
+
+        if RepoRegistry.get(self.repos_path).update(
+                rewrite_repos) != repos_lists[0]:
+            rewritten += 1
+
+        files = []
+        cache_roots = [os.path.join(repo.path, "cache")
+                       for repo in self.repos]
+        cache_roots += cache_placement.get_extra_cache_roots(self.repos_path)
+        for cache_root in cache_roots:
+            if not os.path.isdir(cache_root):
+                continue
+            for _, item_path in cache_layout.iter_item_dirs(cache_root):
+                for name in ["meta.json", "meta.yaml",
+                             "mlc-cached-state.json"]:
+                    files.append(os.path.join(item_path, name))
+        keys_path = os.path.join(self.repos_path, ".cache_keys")
+        if os.path.isdir(keys_path):
+            for root, _, filenames in os.walk(keys_path):
+                files += [os.path.join(root, f)
+                          for f in filenames if f.endswith(".json")]
+
+        with ThreadPoolExecutor() as executor:
+            results = list(executor.map(
+                lambda f: utils.rewrite_file_strings(f, rewrite), files))
+        for r in results:
+            if r['return'] > 0:
+                logger.warning(r['error'])
+            elif r['changed']:
+                rewritten += 1
+
+        # reload the repos and bring the index up to date with the rewritten
+        # metas
+        self.repos = self.load_repos_and_meta()
+        self._index = None
+        self.get_index()
+
+        message = f"Relocated {old_path} to {new_path} ({rewritten} file(s) updated)"
+        logger.info(message)
+        return {'return': 0, 'message': message,
+                'from': old_path, 'to': new_path, 'rewritten': rewritten}
+
 
 default_parent = None
 if not default_parent:
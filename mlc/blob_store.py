@@ -0,0 +1,260 @@
+import os
+import json
+import shutil
+import errno
+from concurrent.futures import ThreadPoolExecutor
+from filelock import FileLock
+
+from . import utils
+from .logger import logger
+
+
+# Files written by MLC itself are small and frequently rewritten, so they are
+# never moved into the blob store
+SKIPPED_FILES = ["meta.json", "meta.yaml", "mlc-cached-state.json"]
+
+
+class BlobStore:
+    """
+    Content-addressed store for cache payload files.
+
+    Blobs are stored under <repos_path>/.blobs/<first two hex digits>/<sha256>.
+    Identical files in different cache entries are replaced by hardlinks (or
+    reflinks) to the same blob. refs.json records, for every blob, the uids of
+    the cache entries referencing it, so that a blob is only freed when its
+    last reference goes away. Reflinked files do not share the inode of their
+    blob, so reflinks.json records them by blob digest (with their inode, size
+    and mtime) to recognize them without hashing them again.
+    """
+
+    def __init__(self, repos_path):
+        self.path = os.path.join(repos_path, ".blobs")
+        self.refs_file = os.path.join(self.path, "refs.json")
+        self.reflinks_file = os.path.join(self.path, "reflinks.json")
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest)
+
+    def _load_json(self, file_path):
+        if os.path.exists(file_path):
+            with open(file_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def _save_json(self, file_path, data):
+        tmp_file = file_path + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_file, file_path)
+
+    def _load_refs(self):
+        return self._load_json(self.refs_file)
+
+    def _save_refs(self, refs):
+        self._save_json(self.refs_file, refs)
+
+    def _reflinked_files(self):
+        """
+        Map the path of every file reflinked to a blob to its recorded
+        (st_ino, st_size, st_mtime_ns) and the digest of the blob.
+        """
+        files = {}
+        for digest, paths in self._load_json(self.reflinks_file).items():
+            for file_path, stamp in paths.items():
+                files[file_path] = (tuple(stamp), digest)
+        return files
+
+    def _blob_inodes(self):
+        """
+        Map (st_dev, st_ino) of every stored blob to its digest, so that files
+        which are already linked to a blob are not hashed again.
+        """
+        inodes = {}
+        if not self.exists():
+            return inodes
+        for shard in os.listdir(self.path):
+            shard_path = os.path.join(self.path, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for digest in os.listdir(shard_path):
+                try:
+                    st = os.stat(os.path.join(shard_path, digest))
+                except OSError:
+                    continue
+                inodes[(st.st_dev, st.st_ino)] = digest
+        return inodes
+
+    def _link(self, src, dst, mode):
+        """
+        Create dst as a hardlink or reflink of src.
+
+        Returns:
+            str: The link type, None if the filesystem does not support it
+                 (dst is not created then).
+        """
+        if mode == "hardlink":
+            try:
+                os.link(src, dst)
+                return "hardlink"
+            except OSError as e:
+                logger.debug(f"Hardlink from {src} failed ({e})")
+        elif mode == "reflink":
+            try:
+                import fcntl
+                FICLONE = 0x40049409
+                with open(src, "rb") as s, open(dst, "wb") as d:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                shutil.copystat(src, dst)
+                return "reflink"
+            except (ImportError, OSError) as e:
+                logger.debug(f"Reflink from {src} failed ({e})")
+                if os.path.exists(dst):
+                    os.remove(dst)
+        return None
+
+    def dedup(self, entries, mode="hardlink", min_size=0, max_workers=None):
+        """
+        Move the payload files of the given cache entries into the blob store and
+        replace duplicates by links to the stored blobs.
+
+        Args:
+            entries (list): List of (uid, path) tuples of the cache entries.
+            mode (str): hardlink (default) or reflink. Files which can not be
+                        linked (e.g. the filesystem does not support the link
+                        type) are left in place.
+            min_size (int): Files smaller than this size (in bytes) are skipped.
+            max_workers (int, optional): Number of hashing threads.
+
+        Returns:
+            dict: return code and statistics (files, duplicates, saved_bytes,
+                  unlinked: files left in place as they could not be linked).
+        """
+        if mode not in ["hardlink", "reflink"]:
+            return {'return': 1,
+                    'error': f"Unsupported dedup mode {mode}. Use hardlink or reflink"}
+
+        os.makedirs(self.path, exist_ok=True)
+        blob_inodes = self._blob_inodes()
+        reflinked_files = self._reflinked_files()
+
+        # collect candidate files
+        files = []
+        for uid, entry_path in entries:
+            for root, dirs, filenames in os.walk(entry_path):
+                for filename in filenames:
+                    if root == entry_path and filename in SKIPPED_FILES:
+                        continue
+                    file_path = os.path.join(root, filename)
+                    try:
+                        st = os.lstat(file_path)
+                    except OSError:
+                        continue
+                    if os.path.islink(
+                            file_path) or st.st_size < max(min_size, 1):
+                        continue
+                    files.append((uid, file_path, st))
+
+        def linked_digest(file_path, st):
+            digest = blob_inodes.get((st.st_dev, st.st_ino))
+            if digest is None and file_path in reflinked_files:
+                stamp, digest = reflinked_files[file_path]
+                if stamp != (st.st_ino, st.st_size, st.st_mtime_ns) or \
+                        not os.path.exists(self._blob_path(digest)):
+                    digest = None
+            return digest
+
+        # hash the files which are not already linked to a blob
+        to_hash = [f for _, f, st in files if linked_digest(f, st) is None]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            digests = dict(zip(to_hash, executor.map(
+                utils.get_file_hash, to_hash)))
+
+        stats = {'files': len(files), 'duplicates': 0, 'saved_bytes': 0,
+                 'unlinked': 0}
+
+        with FileLock(self.refs_file + ".lock"):
+            refs = self._load_refs()
+            reflinks = self._load_json(self.reflinks_file)
+            for uid, file_path, st in files:
+                digest = linked_digest(file_path, st)
+                if digest is None:
+                    digest = digests[file_path]
+                    blob_path = self._blob_path(digest)
+                    if not os.path.exists(blob_path):
+                        # first occurrence becomes the stored blob
+                        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                        linked = self._link(file_path, blob_path, mode)
+                    else:
+                        tmp_path = file_path + ".mlc-dedup-tmp"
+                        linked = self._link(blob_path, tmp_path, mode)
+                        if linked:
+                            os.replace(tmp_path, file_path)
+                            stats['duplicates'] += 1
+                            stats['saved_bytes'] += st.st_size
+                    if not linked:
+                        # a copy would not save any space
+                        stats['unlinked'] += 1
+                        continue
+                    blob_st = os.stat(blob_path)
+                    blob_inodes[(blob_st.st_dev, blob_st.st_ino)] = digest
+                    if linked == "reflink":
+                        file_st = os.stat(file_path)
+                        reflinks.setdefault(digest, {})[file_path] = [
+                            file_st.st_ino, file_st.st_size, file_st.st_mtime_ns]
+
+                if uid not in refs.setdefault(digest, []):
+                    refs[digest].append(uid)
+            self._save_refs(refs)
+            if reflinks:
+                self._save_json(self.reflinks_file, reflinks)
+
+        if stats['unlinked']:
+            logger.warning(
+                f"{stats['unlinked']} file(s) could not be {mode}ed to the blob store and were left in place")
+
+        return {'return': 0, **stats}
+
+    def release(self, uids):
+        """
+        Drop the references of the given (removed) cache entries and free the
+        blobs which are no longer referenced.
+
+        Returns:
+            dict: return code and the number of freed blobs.
+        """
+        if not self.exists():
+            return {'return': 0, 'freed': 0}
+
+        uids = set(uids)
+        freed = 0
+        with FileLock(self.refs_file + ".lock"):
+            refs = self._load_refs()
+            reflinks = self._load_json(self.reflinks_file)
+            for digest in list(refs):
+                remaining = [u for u in refs[digest] if u not in uids]
+                if remaining:
+                    refs[digest] = remaining
+                    continue
+                del refs[digest]
+                reflinks.pop(digest, None)
+                blob_path = self._blob_path(digest)
+                try:
+                    os.remove(blob_path)
+                    freed += 1
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        logger.warning(
+                            f"Failed to free blob {digest}: {e}")
+                try:
+                    # the shard folder of the last blob
+                    os.rmdir(os.path.dirname(blob_path))
+                except OSError:
+                    pass
+            self._save_refs(refs)
+            if os.path.exists(self.reflinks_file):
+                self._save_json(self.reflinks_file, reflinks)
+
+        return {'return': 0, 'freed': freed}
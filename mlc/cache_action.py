@@ -2,8 +2,20 @@ from .action import Action
 import os
 import json
 import time
+from filelock import Timeout
+from concurrent.futures import ThreadPoolExecutor
 from . import utils
 from .logger import logger
+from .blob_store import BlobStore
+from .cache_reservation import CacheReservation, lock_metrics
+from .item import Item
+from . import cache_keys
+from . import cache_layout
+from . import trash
+from . import cache_bundle
+from . import remote_cache
+from . import cache_placement
+from . import cache_verify
 
 
 class CacheAction(Action):
@@ -18,6 +30,14 @@ class CacheAction(Action):
     4. remove(rm)
     5. prune
     6. mark-tmp
+    7. du
+    8. dedup
+    9. migrate
+    10. gc
+    11. export
+    12. import
+    13. push
+    14. verify
 
     """
 
@@ -39,9 +59,17 @@ class CacheAction(Action):
 
     mlc find cache --tags=<list_of_tag_used_to_run_the_particular_script>
 
+    Options:
+        1. `--version_min=<version>`, `--version_max=<version>`: Only return the caches whose cached version (as
+           recorded in the index from `mlc-cached-state.json`) is within the given bounds.
+        2. `--env.<KEY>=<value>`: Only return the caches whose cached `new_env` sets `<KEY>` to `<value>`. Tags are
+           optional with this filter.
+
     Example Command:
 
     mlc find cache --tags=get,dataset,igbh
+    mlc find cache --tags=get,python --version_min=3.10
+    mlc find cache --env.MLC_DATASET_PATH=/data/imagenet
 
         """
         i['target_name'] = "cache"
@@ -50,18 +78,13 @@ class CacheAction(Action):
         if r['return'] > 0:
             return r
         cleaned_list = []
+        # caches depending (transitively) on a removed cache
+        invalid_paths = self.parent.get_index().get_invalid_cache_paths()
 
         for item in r['list']:
             item_meta = item.meta
-            '''#handled in script automation now
-            dep = item_meta.get('dependent_cached_path')
-            if dep and not os.path.exists(dep):
-                continue  # skip item
-
-            deps = item_meta.get('dependent_cached_paths', '').split(',')
-            if any(d and not os.path.exists(d) for d in deps):
-                continue  # skip item
-            '''
+            if item.path in invalid_paths:
+                continue  # skip item, a dependency was removed
 
             expiration_time = item_meta.get('cache_expiration')
             if expiration_time is not None and expiration_time < time.time():
@@ -90,6 +113,10 @@ class CacheAction(Action):
 
     Options:
         1. `-f`: Force removes caches without confirmation. Without `-f`, the user will be prompted for confirmation before deletion.
+        2. `--detach`: Delete the removed caches in a background process. Removed caches are first moved into the
+           `.trash` folder and the index is updated immediately, so the command returns without waiting for the deletion.
+        3. `--cascade`: Also remove the caches which depend, directly or transitively, on the removed caches (through
+           `dependent_cached_path(s)` in their meta). Without it, such caches are no longer returned by `find`.
 
     To remove all generated caches, use:
 
@@ -102,7 +129,29 @@ class CacheAction(Action):
         """
         i['target_name'] = "cache"
         # logger.debug(f"Removing cache with input: {i}")
-        return self.parent.rm(i)
+        r = self.parent.rm(i)
+        if r['return'] > 0:
+            return r
+
+        for item in r.get('list', []):
+            if item.meta and item.meta.get('cache_key'):
+                cache_keys.remove_key(
+                    self.repos_path, item.meta['cache_key'], item.path)
+
+        cache_verify.forget(
+            self.repos_path, [item.meta['uid'] for item in r.get('list', []) if item.meta])
+
+        # free the deduplicated blobs which are no longer referenced
+        blob_store = BlobStore(self.repos_path)
+        if blob_store.exists() and r.get('list'):
+            res = blob_store.release(
+                [item.meta['uid'] for item in r['list'] if item.meta])
+            if res['return'] > 0:
+                return res
+            if res['freed']:
+                logger.info(f"Freed {res['freed']} deduplicated blob(s)")
+
+        return r
 
     def mark_tmp(self, i):
         """
@@ -113,6 +162,9 @@ class CacheAction(Action):
 
     The `mark-tmp` action marks one or more cache entries as `tmp` without removing the cache contents.
 
+    Caches created with the `tmp` tag are placed on tmpfs (see `MLC_CACHE_TMP_ROOT`), while caches marked `tmp`
+    afterwards stay where they are, as their contents may be in use.
+
     Syntax:
 
     mlc mark-tmp cache --tags=<list_of_tags_used_to_run_the_particular_script>
@@ -242,14 +294,17 @@ Cache Meta:""")
 
         """
         self.action_type = "cache"
-        # to fetch the details of all the caches generated
-        run_args = {"fetch_all": True}
+        # to fetch the details of all the caches generated, in all the cache
+        # folders. self.search would skip the expired caches
+        run_args = {"target_name": "cache", "fetch_all": True}
 
-        res = self.search(run_args)
+        res = self.parent.search(run_args)
         if res['return'] > 0:
             return res
 
         for item in res['list']:
+            if not item.meta:
+                continue
             expiration_time = item.meta.get('cache_expiration')
             if expiration_time is not None and expiration_time < time.time():
                 ii = {}
@@ -291,3 +346,639 @@ Cache Meta:""")
             print("......................................................")
 
         return {'return': 0}
+
+    def du(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: du
+    ####################################################################################################################
+
+    The `du` action reports the disk usage of cache entries.
+
+    Sizes are computed once per cache entry using a parallel directory walk and stored in `cache_sizes.json`
+    inside the MLC repos folder. They are recomputed only when the modification time of the cache entry folder
+    changes, so subsequent calls report instantly.
+
+    Syntax:
+
+    mlc du cache [--tags=<list_of_tags_used_to_run_the_particular_script>]
+
+    Options:
+        1. `--sort=size|name`: Sort the entries by size (largest first, default) or by folder name.
+        2. `--force`: Recompute the sizes of all the selected entries.
+
+    Example Command:
+
+    mlc du cache --tags=get,dataset --sort=size
+
+        """
+        self.action_type = "cache"
+        if run_args.get('tags'):
+            res = self.search({'tags': run_args['tags']})
+        else:
+            res = self.search({"fetch_all": True})
+        if res['return'] > 0:
+            return res
+
+        paths = [item.path for item in res['list']]
+        sizes = self.get_index().get_cache_sizes(
+            paths, force=run_args.get('force', False))
+
+        entries = []
+        for item in res['list']:
+            if item.path not in sizes:
+                continue
+            entries.append({
+                'path': item.path,
+                'tags': item.meta.get('tags', []),
+                'size': sizes[item.path]['size'],
+                'files': sizes[item.path]['files']
+            })
+
+        sort_key = run_args.get('sort', 'size')
+        if sort_key == 'name':
+            entries.sort(key=lambda e: os.path.basename(e['path']))
+        elif sort_key == 'size':
+            entries.sort(key=lambda e: e['size'], reverse=True)
+        else:
+            return {'return': 1,
+                    'error': f"Unsupported sort key {sort_key}. Use size or name"}
+
+        total_size = sum(e['size'] for e in entries)
+
+        for e in entries:
+            print(
+                f"{utils.human_readable_size(e['size']):>12}  {e['path']}")
+        print("......................................................")
+        print(
+            f"{utils.human_readable_size(total_size):>12}  total ({len(entries)} cache item(s))")
+
+        return {'return': 0, 'list': entries, 'total_size': total_size}
+
+    def dedup(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: dedup
+    ####################################################################################################################
+
+    The `dedup` action replaces byte-identical files across cache entries with links to a single copy kept in a
+    content-addressed blob store (`.blobs` inside the MLC repos folder). File hashes are computed in parallel and
+    files already linked to a stored blob are not hashed again. Blobs are reference counted, so removing a cache
+    entry frees only the blobs which are not used by any other cache entry.
+
+    Syntax:
+
+    mlc dedup cache [--tags=<list_of_tags_used_to_run_the_particular_script>]
+
+    Options:
+        1. `--mode=hardlink|reflink`: Link type used for duplicates (default: hardlink). Files which can not be
+           linked (e.g. the filesystem does not support the link type) are left in place.
+        2. `--min_size=<bytes>`: Skip files smaller than the given size (default: 1048576).
+
+    Note:
+    - Deduplicated files share their content, so they must not be modified in place.
+
+    Example Command:
+
+    mlc dedup cache --tags=get,ml-model
+
+        """
+        self.action_type = "cache"
+        if run_args.get('tags'):
+            res = self.search({'tags': run_args['tags']})
+        else:
+            res = self.search({"fetch_all": True})
+        if res['return'] > 0:
+            return res
+
+        entries = [(item.meta['uid'], item.path)
+                   for item in res['list'] if item.meta]
+
+        blob_store = BlobStore(self.repos_path)
+        r = blob_store.dedup(entries,
+                             mode=run_args.get('mode', 'hardlink'),
+                             min_size=int(run_args.get('min_size', 1048576)))
+        if r['return'] > 0:
+            return r
+
+        logger.info(
+            f"Scanned {r['files']} file(s) in {len(entries)} cache item(s), replaced {r['duplicates']} duplicate(s) "
+            f"saving {utils.human_readable_size(r['saved_bytes'])}")
+
+        return r
+
+    def verify(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: verify
+    ####################################################################################################################
+
+    The `verify` action checks that the payload files of cache entries are intact, e.g. after a disk incident.
+
+    Files are hashed in chunks by a thread pool and their digests are stored in `.cache_checksums` inside the MLC
+    repos folder. The first verification of a cache entry records its digests. Later runs only hash the files whose
+    inode, size or modification time changed, and report a cache entry as corrupted when a file no longer matches
+    its recorded digest or is missing.
+
+    Syntax:
+
+    mlc verify cache [--tags=<list_of_tags_used_to_run_the_particular_script>]
+
+    Options:
+        1. `--full`: Hash all the files again, e.g. to detect silent corruption which leaves the file metadata
+           unchanged.
+        2. `--mark_tmp`: Mark the corrupted cache entries as `tmp` (see `mark-tmp`).
+        3. `--update`: Record the digests of the current files instead of reporting the modified and missing ones,
+           e.g. after a cache entry was legitimately rewritten.
+
+    Example Command:
+
+    mlc verify cache --tags=get,dataset,imagenet --full
+
+        """
+        self.action_type = "cache"
+        if run_args.get('tags'):
+            res = self.search({'tags': run_args['tags']})
+        else:
+            res = self.search({"fetch_all": True})
+        if res['return'] > 0:
+            return res
+
+        entries = [(item.meta['uid'], item.path)
+                   for item in res['list'] if item.meta]
+
+        r = cache_verify.verify_entries(
+            self.repos_path, entries, full=run_args.get('full', False),
+            update=run_args.get('update', False))
+        if r['return'] > 0:
+            return r
+
+        corrupted = [e for e in r['list'] if e['status'] == 'corrupted']
+        for e in corrupted:
+            logger.error(f"Corrupted cache {e['path']}")
+            for rel_path in e['corrupted']:
+                logger.error(f"  modified: {rel_path}")
+            for rel_path in e['missing']:
+                logger.error(f"  missing: {rel_path}")
+
+        for e in r['list']:
+            if e['status'] == 'updated':
+                logger.info(f"Updated the checksums of {e['path']}")
+
+        hashed = sum(e['hashed'] for e in r['list'])
+        skipped = sum(e['skipped'] for e in r['list'])
+        logger.info(
+            f"Verified {len(entries)} cache item(s): {len(corrupted)} corrupted, hashed {hashed} file(s), "
+            f"{skipped} unchanged file(s) skipped")
+
+        if corrupted and run_args.get('mark_tmp'):
+            for e in corrupted:
+                res = self.mark_tmp({'uid': e['uid']})
+                if res['return'] > 0:
+                    return res
+
+        return {'return': 0, 'list': r['list'],
+                'corrupted': [e['path'] for e in corrupted]}
+
+    def reserve(self, i):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: reserve (Python API only)
+    ####################################################################################################################
+
+    The `reserve` action takes the exclusive per-key lock of a cache so that, when many processes need the same
+    cache at the same time, only the first one creates it (single-flight). The key is computed from the normalized
+    tags and the given env. Other processes block until the lock is released and then find the created cache.
+
+    Example usage:
+
+    r = mlc.access({'action': 'reserve', 'target': 'cache', 'tags': 'get,dataset,imagenet',
+                    'cache_key_env': {'MLC_DATASET_SIZE': '500'}})
+    if not r['list']:
+        # create the cache (mlc.access({'action': 'add', 'target': 'cache', ...})) and populate it
+    r['reservation'].release()  # or mlc.access({'action': 'release', 'target': 'cache', 'key': r['key']})
+
+    The result contains the caches created for the key (`list`), the reservation object (`reservation`), the cache `key` and
+    the time spent waiting for the lock (`lock_wait_time`).
+
+        """
+        if not i.get('tags'):
+            return {'return': 1, 'error': 'Tags are required to reserve a cache'}
+
+        res = utils.get_cache_key(i['tags'], i.get('cache_key_env'))
+        if res['return'] > 0:
+            return res
+        key = res['key']
+
+        reservation = CacheReservation(
+            self.repos_path, key, timeout=i.get('timeout', -1))
+        try:
+            reservation.acquire()
+        except Timeout:
+            return reservation.get_timeout_error()
+
+        # another process may have created the cache while we were waiting
+        self.get_index().reload_index("cache")
+        r = self.search({'tags': i['tags'], 'exact_tags_match': True})
+        if r['return'] > 0:
+            reservation.release()
+            return r
+        matches = [item for item in r['list']
+                   if item.meta.get('cache_key') == key]
+
+        return {'return': 0, 'key': key, 'reservation': reservation,
+                'list': matches, 'lock_wait_time': reservation.wait_time}
+
+    def release(self, i):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: release (Python API only)
+    ####################################################################################################################
+
+    The `release` action releases a cache reservation taken with the `reserve` action, given either the
+    `reservation` object or its `key`. The lock-wait metrics of the current process are returned in `lock_metrics`.
+
+        """
+        reservation = i.get('reservation')
+        if not reservation:
+            if not i.get('key'):
+                return {'return': 1,
+                        'error': 'Either reservation or key is required to release a cache reservation'}
+            reservation = CacheReservation(self.repos_path, i['key'])
+        reservation.release()
+
+        return {'return': 0, 'lock_metrics': dict(lock_metrics)}
+
+    def lookup(self, i):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: lookup (Python API only)
+    ####################################################################################################################
+
+    The `lookup` action resolves the cache created for a deterministic cache key without searching the index.
+    The key is either given directly or computed from the tags and the env which determined the cache
+    (`cache_key_env`), the same way as in the `add` action.
+
+    Example usage:
+
+    r = mlc.access({'action': 'lookup', 'target': 'cache', 'key': key})
+    r = mlc.access({'action': 'lookup', 'target': 'cache', 'tags': 'get,python', 'cache_key_env': {...}})
+
+    The result `list` contains the cache item or is empty if there is no valid cache for the key.
+
+    On a local miss, the remote cache configured by `MLC_CACHE_REMOTE` (a shared folder or an http(s) URL) is
+    consulted, unless `remote` is False. A remote hit is downloaded, verified and added to the local repo.
+
+        """
+        key = i.get('key')
+        if not key:
+            if not i.get('tags'):
+                return {'return': 1,
+                        'error': 'Either key or tags are required to look up a cache'}
+            res = utils.get_cache_key(i['tags'], i.get('cache_key_env'))
+            if res['return'] > 0:
+                return res
+            key = res['key']
+
+        entry = None
+        for candidate in reversed(
+                cache_keys.load_entries(self.repos_path, key)):
+            if os.path.isdir(candidate['path']):
+                entry = candidate
+                break
+            logger.debug(
+                f"Removing stale cache key {key} for {candidate['path']}")
+            cache_keys.remove_key(self.repos_path, key, candidate['path'])
+
+        if not entry:
+            if i.get('remote', True) and remote_cache.get_remote_cache():
+                with CacheReservation(self.repos_path, key):
+                    # the cache may have been fetched or created while
+                    # waiting
+                    entry = cache_keys.load_key(self.repos_path, key)
+                    if not entry:
+                        fetched = self._fetch_remote_cache(key)
+                        if fetched:
+                            return {'return': 0, 'key': key,
+                                    'list': [fetched], 'remote': True}
+            if not entry or not os.path.isdir(entry['path']):
+                return {'return': 0, 'key': key, 'list': []}
+
+        path = entry['path']
+
+        repo = next((r for r in self.repos if path.startswith(
+            os.path.join(r.path, ""))), None)
+        if repo is None and any(path.startswith(os.path.join(root, "")) for root in
+                                cache_placement.get_extra_cache_roots(self.repos_path)):
+            # as in the index, the cache folders outside the repos (tmpfs,
+            # MLC_CACHE_ROOTS) belong to the local repo
+            repo = next((r for r in self.repos
+                         if r.meta and r.meta.get('alias') == "local"), None)
+        item = Item(path, repo)
+
+        expiration_time = (item.meta or {}).get('cache_expiration')
+        if expiration_time is not None and expiration_time < time.time():
+            return {'return': 0, 'key': key, 'list': []}
+
+        return {'return': 0, 'key': key, 'list': [item]}
+
+    def migrate(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: migrate
+    ####################################################################################################################
+
+    The `migrate` action moves all the cache entries to the given directory layout:
+
+    - `flat`: `cache/<item>` (default)
+    - `sharded`: `cache/<uid[0:2]>/<uid[2:4]>/<item>`, which keeps directory operations fast with a very large
+      number of cache entries
+
+    The chosen layout is also used for the caches created afterwards. The paths of the moved entries are updated
+    in the index with a single index write and in the metas and cached states of all the cache entries.
+
+    Syntax:
+
+    mlc migrate cache --layout=sharded
+
+        """
+        layout = run_args.get('layout')
+        if layout not in cache_layout.LAYOUTS:
+            return {'return': 1,
+                    'error': f"Please specify the target layout using --layout={'|'.join(cache_layout.LAYOUTS)}"}
+
+        index = self.get_index()
+        moved = {}
+        cache_roots = set()
+
+        for entry in index.indices['cache']:
+            repo = entry['repo']
+            cache_root = os.path.join(repo.path, "cache")
+            old_path = entry['path']
+            if not old_path.startswith(os.path.join(cache_root, "")):
+                continue
+            cache_roots.add(cache_root)
+
+            new_parent = cache_layout.get_item_parent(
+                cache_root, entry['uid'], layout)
+            new_path = os.path.join(new_parent, os.path.basename(old_path))
+            if new_path == old_path or not os.path.isdir(old_path):
+                continue
+            if os.path.exists(new_path):
+                logger.warning(
+                    f"Skipping {old_path} as {new_path} already exists")
+                continue
+
+            os.makedirs(new_parent, exist_ok=True)
+            os.rename(old_path, new_path)
+            moved[old_path] = new_path
+            entry['path'] = new_path
+
+            for meta_name in ["meta.yaml", "meta.json"]:
+                old_key = os.path.join(old_path, meta_name)
+                if old_key in index.modified_times:
+                    index.modified_times[os.path.join(
+                        new_path, meta_name)] = index.modified_times.pop(old_key)
+
+        # single index write for all the moved entries
+        if moved:
+            index.save()
+
+        for cache_root in cache_roots:
+            cache_layout.set_layout(cache_root, layout)
+            # remove the shard folders left empty
+            for name in os.listdir(cache_root):
+                shard = os.path.join(cache_root, name)
+                if not os.path.isdir(
+                        shard) or not cache_layout.is_shard_dir(name, shard):
+                    continue
+                for sub_name in os.listdir(shard):
+                    sub_shard = os.path.join(shard, sub_name)
+                    if os.path.isdir(sub_shard) and not os.listdir(sub_shard):
+                        os.rmdir(sub_shard)
+                if not os.listdir(shard):
+                    os.rmdir(shard)
+
+        if moved:
+            # the cached states and metas refer to files inside the moved
+            # entries (and to dependent caches) by absolute paths
+            rewrite = cache_layout.make_path_rewriter(cache_roots, moved)
+            files = []
+            for entry in index.indices['cache']:
+                for name in ["meta.json", "meta.yaml",
+                             "mlc-cached-state.json"]:
+                    files.append(os.path.join(entry['path'], name))
+            with ThreadPoolExecutor() as executor:
+                results = list(executor.map(
+                    lambda f: utils.rewrite_file_strings(f, rewrite), files))
+            for r in results:
+                if r['return'] > 0:
+                    logger.warning(r['error'])
+
+            new_paths = set(moved.values())
+            for entry in index.indices['cache']:
+                if entry['path'] not in new_paths:
+                    continue
+                meta = Item(entry['path'], entry['repo']).meta or {}
+                if meta.get('cache_key'):
+                    cache_keys.save_key(
+                        self.repos_path, meta['cache_key'], entry['path'], entry['uid'])
+
+        logger.info(
+            f"Moved {len(moved)} cache item(s) to the {layout} layout")
+
+        return {'return': 0, 'moved': moved}
+
+    def gc(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: gc
+    ####################################################################################################################
+
+    The `gc` action deletes the cache entries left in the `.trash` folders of the MLC repos folder and of the cache
+    folders listed in `MLC_CACHE_ROOTS`, e.g. after an interrupted or detached `mlc rm cache`. The contents are
+    deleted in parallel.
+
+    It also removes the tmp caches placed on tmpfs whose creating process is no longer running.
+
+    Syntax:
+
+    mlc gc [cache]
+
+    Example Command:
+
+    mlc gc
+
+        """
+        count = 0
+        for trash_path in trash.get_trash_paths(self.repos_path):
+            deleted = trash.empty_trash(trash_path)
+            if deleted:
+                logger.info(
+                    f"Deleted {deleted} removed item(s) from {trash_path}")
+            count += deleted
+
+        orphaned = cache_placement.get_orphaned_tmp_caches(self.repos_path)
+        for path in orphaned:
+            self._remove_tmp_cache(path)
+            cache_placement.forget_tmp_cache(path)
+        if orphaned:
+            logger.info(f"Deleted {len(orphaned)} tmp cache item(s) on tmpfs")
+
+        return {'return': 0, 'deleted': count, 'deleted_tmp': len(orphaned)}
+
+    def export(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: export
+    ####################################################################################################################
+
+    The `export` action packs cache entries and their metadata into a single bundle which can be imported on other
+    nodes using `mlc import cache`.
+
+    The compression is selected from the bundle extension (.tar.zst, .tar.gz, .tar.xz, .tar.bz2 or .tar). zstd
+    bundles are compressed using all the CPUs.
+
+    Syntax:
+
+    mlc export cache [--tags=<list_of_tags_used_to_run_the_particular_script>] -o <bundle>
+
+    Example Command:
+
+    mlc export cache --tags=get,dataset -o datasets.tar.zst
+
+        """
+        output = run_args.get('output')
+        if not output or output is True:
+            return {'return': 1,
+                    'error': 'Bundle path not given. Use -o <bundle> or --output=<bundle>'}
+
+        self.action_type = "cache"
+        if run_args.get('tags'):
+            res = self.search({'tags': run_args['tags']})
+        else:
+            res = self.search({"fetch_all": True})
+        if res['return'] > 0:
+            return res
+
+        entries = []
+        for item in res['list']:
+            if not item.meta or not os.path.isdir(item.path):
+                continue
+            entries.append({
+                'uid': item.meta['uid'],
+                'alias': item.meta.get('alias'),
+                'tags': item.meta.get('tags', []),
+                'path': item.path,
+                'cache_root': cache_placement.find_cache_root(
+                    item.path, self.repos_path, item.repo.path)
+            })
+
+        if not entries:
+            return {'return': 1, 'error': 'No cache entries found to export'}
+
+        r = cache_bundle.export_bundle(entries, output)
+        if r['return'] > 0:
+            return r
+
+        logger.info(f"Exported {r['count']} cache item(s) to {output}")
+        return {'return': 0, 'count': r['count'], 'path': output}
+
+    def import_(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: import
+    ####################################################################################################################
+
+    The `import` action adds the cache entries of a bundle created by `mlc export cache` to the local repo. The
+    absolute paths recorded on the exporting node are rewritten to the local paths and all the imported entries are
+    added to the index at once. Entries whose uid is already present are skipped.
+
+    Syntax:
+
+    mlc import cache <bundle>
+
+    Example Command:
+
+    mlc import cache datasets.tar.zst
+
+        """
+        bundle = run_args.get('input', run_args.get('details'))
+        if not bundle:
+            return {'return': 1, 'error': 'Bundle path not given'}
+
+        res = self._get_local_repo()
+        if res['return'] > 0:
+            return res
+
+        r = cache_bundle.import_bundle(
+            bundle, self.repos_path, res['repo'], self.get_index())
+        if r['return'] > 0:
+            return r
+        items = r['list']
+
+        logger.info(f"Imported {len(items)} cache item(s) from {bundle}")
+        return {'return': 0, 'list': items, 'skipped': r['skipped']}
+
+    def push(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Cache
+    Action: push
+    ####################################################################################################################
+
+    The `push` action uploads cache entries to the remote cache configured by `MLC_CACHE_REMOTE` (a shared folder
+    or an http(s) URL serving GET and PUT), keyed by their deterministic cache key. Other nodes then fetch them on
+    a local miss instead of recreating them. Entries created without a cache key are skipped.
+
+    Syntax:
+
+    mlc push cache [--tags=<list_of_tags_used_to_run_the_particular_script>] [--remote=<url_or_path>]
+
+    Example Command:
+
+    mlc push cache --tags=get,dataset,igbh
+
+        """
+        remote = remote_cache.get_remote_cache(run_args.get('remote'))
+        if not remote:
+            return {'return': 1,
+                    'error': 'No remote cache configured. Set MLC_CACHE_REMOTE or use --remote'}
+
+        self.action_type = "cache"
+        if run_args.get('tags'):
+            res = self.search({'tags': run_args['tags']})
+        else:
+            res = self.search({"fetch_all": True})
+        if res['return'] > 0:
+            return res
+
+        pushed = []
+        for item in res['list']:
+            if not item.meta or not item.meta.get('cache_key'):
+                logger.debug(f"Skipping {item.path} without a cache key")
+                continue
+            r = remote_cache.push(remote, item.meta['cache_key'], {
+                'uid': item.meta['uid'],
+                'alias': item.meta.get('alias'),
+                'tags': item.meta.get('tags', []),
+                'path': item.path,
+                'cache_root': cache_placement.find_cache_root(
+                    item.path, self.repos_path, item.repo.path)
+            }, self.repos_path)
+            if r['return'] > 0:
+                return r
+            pushed.append(item)
+
+        logger.info(f"Pushed {len(pushed)} cache item(s) to {remote}")
+        return {'return': 0, 'list': pushed}
@@ -0,0 +1,319 @@
+import os
+import io
+import json
+import shutil
+import tarfile
+import uuid
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+from . import cache_keys
+from . import cache_layout
+from .item import Item
+from .logger import logger
+
+
+# A cache bundle is a (compressed) tar archive holding a manifest followed by
+# the exported cache entries stored as entries/<uid>/. The manifest records
+# where every entry lived on the exporting node so that absolute paths can be
+# rewritten on import.
+MANIFEST_NAME = "mlc-bundle.json"
+BUNDLE_VERSION = 1
+
+_compressions = [
+    ((".tar.zst", ".tzst", ".zst"), "zst"),
+    ((".tar.gz", ".tgz"), "gz"),
+    ((".tar.xz", ".txz"), "xz"),
+    ((".tar.bz2", ".tbz2"), "bz2"),
+    ((".tar",), "")
+]
+
+
+def get_compression(path):
+    """
+    Return the compression of a bundle from its file name ("" for a plain tar)
+    or None if the extension is not supported.
+    """
+    name = path.lower()
+    for suffixes, compression in _compressions:
+        if name.endswith(suffixes):
+            return compression
+    return None
+
+
+def _zstd_backend():
+    """
+    Return "module" if the zstandard package is installed, "binary" if only
+    the zstd command is available and None otherwise.
+    """
+    try:
+        import zstandard  # noqa: F401
+        return "module"
+    except ImportError:
+        pass
+    if shutil.which("zstd"):
+        return "binary"
+    return None
+
+
+@contextmanager
+def _open_tar_write(path, compression):
+    if compression != "zst":
+        with tarfile.open(path, f"w:{compression}") as tar:
+            yield tar
+        return
+
+    if _zstd_backend() == "module":
+        import zstandard
+        # threads=-1 uses one compression thread per CPU
+        cctx = zstandard.ZstdCompressor(threads=-1)
+        with open(path, "wb") as f, cctx.stream_writer(f) as stream, \
+                tarfile.open(fileobj=stream, mode="w|") as tar:
+            yield tar
+        return
+
+    process = subprocess.Popen(
+        ["zstd", "-T0", "-q", "-f", "-o", path], stdin=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdin, mode="w|") as tar:
+            yield tar
+    finally:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise IOError(f"zstd failed to write {path}")
+
+
+@contextmanager
+def _open_tar_read(path, compression):
+    if compression != "zst":
+        with tarfile.open(path, "r|*") as tar:
+            yield tar
+        return
+
+    if _zstd_backend() == "module":
+        import zstandard
+        dctx = zstandard.ZstdDecompressor()
+        with open(path, "rb") as f, dctx.stream_reader(f) as stream, \
+                tarfile.open(fileobj=stream, mode="r|") as tar:
+            yield tar
+        return
+
+    process = subprocess.Popen(
+        ["zstd", "-d", "-c", "-q", path], stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdout, mode="r|") as tar:
+            yield tar
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise IOError(f"zstd failed to read {path}")
+
+
+def _check_compression(path):
+    compression = get_compression(path)
+    if compression is None:
+        return {'return': 1,
+                'error': f"Unsupported bundle format {path}. Use .tar.zst, .tar.gz, .tar.xz, .tar.bz2 or .tar"}
+    if compression == "zst" and not _zstd_backend():
+        return {'return': 1,
+                'error': "zstd compression requires the zstandard python package (pip install zstandard) or the zstd command"}
+    return {'return': 0, 'compression': compression}
+
+
+def export_bundle(entries, output):
+    """
+    Stream cache entries and their metadata into a bundle.
+
+    Args:
+        entries (list): Dicts with uid, alias, tags, path and cache_root
+                        (the cache folder containing the entry).
+        output (str): Path of the bundle. The compression is chosen from the
+                      extension; .tar.zst is compressed with all CPUs.
+
+    Returns:
+        dict: return code and the number of exported entries.
+    """
+    r = _check_compression(output)
+    if r['return'] > 0:
+        return r
+
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "entries": [{
+            "uid": e["uid"],
+            "alias": e.get("alias"),
+            "tags": e.get("tags", []),
+            "folder": os.path.basename(e["path"]),
+            "source_path": e["path"],
+            "source_cache_root": e["cache_root"]
+        } for e in entries]
+    }
+
+    output_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(output_dir, exist_ok=True)
+
+    with _open_tar_write(output, r['compression']) as tar:
+        # the manifest goes first so that import can plan while streaming
+        data = json.dumps(manifest, indent=2).encode("utf-8")
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+        for e in entries:
+            logger.debug(f"Exporting {e['path']}")
+            tar.add(e["path"], arcname=f"entries/{e['uid']}")
+
+    return {'return': 0, 'count': len(entries)}
+
+
+def _is_safe_member(member):
+    name = member.name
+    if os.path.isabs(name) or ".." in name.replace("\\", "/").split("/"):
+        return False
+    if member.isdev():
+        return False
+    return name == MANIFEST_NAME or name.startswith("entries/")
+
+
+def _is_valid_entry(entry):
+    """
+    Check that the uid and folder of a manifest entry can not point outside
+    of the staging and cache folders.
+    """
+    uid = entry.get('uid')
+    folder = entry.get('folder')
+    if not isinstance(uid, str) or not utils.is_uid(uid):
+        return False
+    return isinstance(folder, str) and folder not in ["", ".", ".."] and \
+        folder == os.path.basename(folder) and "\\" not in folder
+
+
+def extract_bundle(bundle, staging_path):
+    """
+    Extract a bundle into a staging folder.
+
+    Returns:
+        dict: return code and the bundle manifest. The entries are extracted
+              to <staging_path>/entries/<uid>.
+    """
+    r = _check_compression(bundle)
+    if r['return'] > 0:
+        return r
+    if not os.path.isfile(bundle):
+        return {'return': 1, 'error': f"Bundle {bundle} not found"}
+
+    os.makedirs(staging_path, exist_ok=True)
+    manifest = None
+    extract_args = {}
+    if hasattr(tarfile, "tar_filter"):
+        extract_args['filter'] = "tar"
+
+    with _open_tar_read(bundle, r['compression']) as tar:
+        for member in tar:
+            if not _is_safe_member(member):
+                logger.warning(f"Skipping unsafe bundle member {member.name}")
+                continue
+            if member.name == MANIFEST_NAME:
+                manifest = json.loads(
+                    tar.extractfile(member).read().decode("utf-8"))
+                continue
+            tar.extract(member, staging_path, **extract_args)
+
+    if not manifest or manifest.get("version") != BUNDLE_VERSION:
+        return {'return': 1,
+                'error': f"{bundle} is not a valid MLC cache bundle"}
+
+    return {'return': 0, 'manifest': manifest}
+
+
+def import_bundle(bundle, repos_path, repo, index):
+    """
+    Add the cache entries of a bundle to the cache folder of a repo.
+
+    The bundle is extracted into a staging folder next to the cache, the
+    entries are moved into place and their paths rewritten in parallel, and
+    all of them are added to the index with a single write. Entries whose uid
+    is already known are skipped.
+
+    Returns:
+        dict: return code, the imported items (list) and the skipped uids.
+    """
+    cache_root = os.path.join(repo.path, "cache")
+    layout = cache_layout.get_layout(cache_root)
+
+    # the staging folder is on the same filesystem as the cache so that the
+    # extracted entries can be renamed into place
+    staging_path = os.path.join(repos_path, ".staging", uuid.uuid4().hex[:8])
+    try:
+        r = extract_bundle(bundle, staging_path)
+        if r['return'] > 0:
+            return r
+        manifest = r['manifest']
+
+        invalid = [entry for entry in manifest['entries']
+                   if not isinstance(entry, dict) or not _is_valid_entry(entry)]
+        if invalid:
+            return {'return': 1,
+                    'error': f"{bundle} has invalid cache entries in its manifest: {invalid}"}
+
+        known_uids = {entry['uid'] for entry in index.indices['cache']}
+
+        moved = {}
+        source_roots = set()
+        planned = []
+        skipped = []
+        for entry in manifest['entries']:
+            uid = entry['uid']
+            src = os.path.join(staging_path, "entries", uid)
+            new_path = os.path.join(cache_layout.get_item_parent(
+                cache_root, uid, layout), entry['folder'])
+            if uid in known_uids or os.path.exists(new_path):
+                logger.warning(
+                    f"Skipping cache {entry['folder']} ({uid}) as it already exists")
+                skipped.append(uid)
+                continue
+            if not os.path.isdir(src):
+                logger.warning(
+                    f"Skipping cache {entry['folder']} ({uid}) missing in the bundle")
+                skipped.append(uid)
+                continue
+            moved[entry['source_path']] = new_path
+            source_roots.add(entry['source_cache_root'])
+            planned.append((src, new_path))
+
+        rewrite = cache_layout.make_path_rewriter(source_roots, moved)
+
+        def install(paths):
+            src, new_path = paths
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.rename(src, new_path)
+            errors = []
+            for name in ["meta.json", "meta.yaml", "mlc-cached-state.json"]:
+                r = utils.rewrite_file_strings(
+                    os.path.join(new_path, name), rewrite)
+                if r['return'] > 0:
+                    errors.append(r['error'])
+            return errors
+
+        with ThreadPoolExecutor() as executor:
+            for errors in executor.map(install, planned):
+                for error in errors:
+                    logger.warning(error)
+
+        items = [Item(new_path, repo) for _, new_path in planned]
+        items = [item for item in items if item.meta]
+
+        # single index write for all the imported entries
+        index.add_items([(item.meta, item.path, repo)
+                        for item in items], "cache")
+
+        for item in items:
+            if item.meta.get('cache_key'):
+                cache_keys.save_key(
+                    repos_path, item.meta['cache_key'], item.path, item.meta['uid'])
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    return {'return': 0, 'list': items, 'skipped': skipped}
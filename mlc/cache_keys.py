@@ -0,0 +1,84 @@
+import os
+import json
+from filelock import FileLock
+
+from .logger import logger
+
+
+# Direct cache key -> cache path map. Every key is a small json file under a
+# sharded folder, so that resolving a key needs a single file read instead of a
+# search through the cache index. Caches created with the same tags and env
+# share a key, so a key file holds all of their entries, the newest last.
+
+
+def get_key_file(repos_path, key):
+    return os.path.join(repos_path, ".cache_keys", key[:2], key + ".json")
+
+
+def _write_entries(key_file, entries):
+    if not entries:
+        try:
+            os.remove(key_file)
+        except FileNotFoundError:
+            pass
+        return
+    tmp_file = f"{key_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump({"entries": entries}, f)
+    os.replace(tmp_file, key_file)
+
+
+def save_key(repos_path, key, path, uid):
+    """
+    Record a cache entry created for a cache key. The entries of the key
+    whose folder is gone (e.g. moved by a migration) are dropped.
+    """
+    key_file = get_key_file(repos_path, key)
+    os.makedirs(os.path.dirname(key_file), exist_ok=True)
+    with FileLock(key_file + ".lock"):
+        entries = [e for e in load_entries(repos_path, key)
+                   if e.get("path") != path and os.path.isdir(e.get("path", ""))]
+        _write_entries(key_file, entries + [{"path": path, "uid": uid}])
+
+
+def load_entries(repos_path, key):
+    """
+    Return the recorded {"path", "uid"} entries of a cache key, the newest
+    last.
+    """
+    try:
+        with open(get_key_file(repos_path, key), "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (json.JSONDecodeError, IOError) as e:
+        logger.warning(f"Failed to read cache key {key}: {e}")
+        return []
+    if isinstance(data, dict) and "entries" in data:
+        return data["entries"]
+    # a single entry, as written by older versions
+    return [data] if isinstance(data, dict) and data.get("path") else []
+
+
+def load_key(repos_path, key):
+    """
+    Return the newest recorded {"path", "uid"} of a cache key or None.
+    """
+    entries = load_entries(repos_path, key)
+    return entries[-1] if entries else None
+
+
+def remove_key(repos_path, key, path=None):
+    """
+    Forget a cache key. If path is given, only the entry of that path is
+    removed and the key still resolves to the other caches created for it.
+    """
+    key_file = get_key_file(repos_path, key)
+    if not os.path.exists(key_file):
+        return
+    with FileLock(key_file + ".lock"):
+        entries = load_entries(repos_path, key)
+        remaining = [e for e in entries if e.get("path") != path] \
+            if path else []
+        if len(remaining) != len(entries):
+            _write_entries(key_file, remaining)
@@ -0,0 +1,132 @@
+import os
+import re
+
+from .logger import logger
+
+
+# Cache entries are stored either flat (cache/<item>) or sharded by the first
+# four hex digits of their uid (cache/ab/cd/<item>), which keeps directories
+# small when there are a very large number of caches.
+LAYOUTS = ["flat", "sharded"]
+
+# The layout chosen by `mlc migrate cache` is persisted in the cache folder so
+# that newly created caches follow it
+LAYOUT_FILE = ".mlc-layout"
+
+_shard_pattern = re.compile(r"^[0-9a-f]{2}$")
+
+
+def get_layout(cache_root):
+    """
+    Return the layout used for new caches: the MLC_CACHE_LAYOUT env variable
+    if set, otherwise the layout recorded in the cache folder (default: flat).
+    """
+    layout = os.environ.get('MLC_CACHE_LAYOUT', '').strip().lower()
+    if not layout:
+        layout_file = os.path.join(cache_root, LAYOUT_FILE)
+        if os.path.isfile(layout_file):
+            with open(layout_file, "r") as f:
+                layout = f.read().strip()
+    if layout not in LAYOUTS:
+        if layout:
+            logger.warning(
+                f"Unknown cache layout {layout}, using the flat layout")
+        layout = "flat"
+    return layout
+
+
+def set_layout(cache_root, layout):
+    os.makedirs(cache_root, exist_ok=True)
+    with open(os.path.join(cache_root, LAYOUT_FILE), "w") as f:
+        f.write(layout)
+
+
+def get_item_parent(cache_root, uid, layout):
+    """
+    Return the folder in which the cache entry with the given uid is created.
+    """
+    if layout == "sharded":
+        return os.path.join(cache_root, uid[:2], uid[2:4])
+    return cache_root
+
+
+def is_shard_dir(name, path):
+    return bool(_shard_pattern.match(name)) and not os.path.isfile(
+        os.path.join(path, "meta.yaml")) and not os.path.isfile(
+        os.path.join(path, "meta.json"))
+
+
+def iter_item_dirs(cache_root):
+    """
+    Yield (folder_name, path) of the cache entries found in both the flat and
+    the sharded layout.
+    """
+    for name in os.listdir(cache_root):
+        path = os.path.join(cache_root, name)
+        # skip the folders used by MLC itself (.trash, .owners)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        if not is_shard_dir(name, path):
+            yield name, path
+            continue
+        for sub_name in os.listdir(path):
+            sub_path = os.path.join(path, sub_name)
+            if not os.path.isdir(sub_path):
+                continue
+            if not is_shard_dir(sub_name, sub_path):
+                continue
+            for item_name in os.listdir(sub_path):
+                item_path = os.path.join(sub_path, item_name)
+                if os.path.isdir(item_path):
+                    yield item_name, item_path
+
+
+_component = r"""[^/\\:;,"'\s]+"""
+_path_pattern = re.compile(
+    rf"({_component})(?:[/\\]({_component})[/\\]({_component}))?")
+
+
+def make_path_rewriter(cache_roots, moved):
+    """
+    Return a function replacing the paths of moved cache entries (and of the
+    files inside them) in a string.
+
+    Args:
+        cache_roots (list): Cache folders containing the moved entries.
+        moved (dict): Old entry path -> new entry path.
+    """
+    # stored paths may use either separator on Windows
+    prefixes = []
+    for root in cache_roots:
+        for prefix in [os.path.join(root, ""),
+                       os.path.join(root, "").replace(os.sep, "/")]:
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    moved = {os.path.normpath(old): new for old, new in moved.items()}
+
+    def rewrite(value):
+        for prefix in prefixes:
+            start = 0
+            while True:
+                idx = value.find(prefix, start)
+                if idx < 0:
+                    break
+                begin = idx + len(prefix)
+                m = _path_pattern.match(value, begin)
+                end = new = None
+                if m:
+                    for group in [1, 3]:
+                        if not m.group(group):
+                            continue
+                        path = os.path.normpath(value[idx:m.end(group)])
+                        if path in moved:
+                            end, new = m.end(group), moved[path]
+                            break
+                if end is None:
+                    start = begin
+                    continue
+                value = value[:idx] + new + value[end:]
+                start = idx + len(new)
+        return value
+
+    return rewrite
@@ -0,0 +1,281 @@
+import os
+import atexit
+import fnmatch
+import hashlib
+import shutil
+import threading
+from filelock import FileLock
+
+from .logger import logger
+
+
+# Caches tagged `tmp` hold short-lived intermediate artifacts. They are placed
+# on a tmpfs root (MLC_CACHE_TMP_ROOT, /dev/shm/mlc-cache by default) when it
+# has enough free space (MLC_CACHE_TMP_MIN_FREE bytes, 1 GiB by default), and
+# are removed when the process which created them exits or by `mlc gc`.
+DEFAULT_TMP_ROOT = "/dev/shm/mlc-cache"
+DEFAULT_TMP_MIN_FREE = 1024 * 1024 * 1024
+
+# Every tmp entry has an owner file holding the pid of the creating process,
+# so that `mlc gc` only removes the entries of processes which are gone
+OWNERS_DIR = ".owners"
+
+_created = []
+_created_guard = threading.Lock()
+_atexit_registered = False
+
+
+def get_tmp_root(repos_path):
+    """
+    Return the tmpfs folder for the tmp caches of a repos folder or None if
+    tmpfs placement is disabled (MLC_CACHE_TMP_ROOT=none) or unavailable.
+    """
+    root = os.environ.get('MLC_CACHE_TMP_ROOT', '').strip()
+    if root.lower() in ["none", "no", "off", "false"]:
+        return None
+    if not root:
+        if not os.path.isdir(os.path.dirname(DEFAULT_TMP_ROOT)):
+            return None
+        root = DEFAULT_TMP_ROOT
+    # several MLC installations may share the tmpfs
+    digest = hashlib.sha256(os.path.realpath(
+        repos_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(root, digest)
+
+
+def get_tmp_min_free():
+    value = os.environ.get('MLC_CACHE_TMP_MIN_FREE', '').strip()
+    try:
+        return int(value) if value else DEFAULT_TMP_MIN_FREE
+    except ValueError:
+        logger.warning(f"Invalid MLC_CACHE_TMP_MIN_FREE {value}, ignoring")
+        return DEFAULT_TMP_MIN_FREE
+
+
+# New caches of the local repo can be spread over several cache folders, e.g.
+# one per NVMe drive, listed in MLC_CACHE_ROOTS. MLC_CACHE_PLACEMENT selects
+# the folder of a new cache: most_free (default) or round_robin. Caches whose
+# tags match a pattern of MLC_CACHE_PIN ("<tag patterns>=<folder>;...", e.g.
+# "dataset-*=/nvme1/mlc-cache") always go to the pinned folder.
+PLACEMENT_STRATEGIES = ["most_free", "round_robin"]
+
+
+def _split_list(value):
+    items = []
+    for part in value.split(os.pathsep):
+        items += [item.strip() for item in part.split(",") if item.strip()]
+    return items
+
+
+def get_cache_roots():
+    """
+    Return the cache folders listed in MLC_CACHE_ROOTS.
+    """
+    return [os.path.expanduser(root) for root in _split_list(
+        os.environ.get('MLC_CACHE_ROOTS', ''))]
+
+
+def get_pins():
+    """
+    Return the (tag patterns, folder) rules of MLC_CACHE_PIN.
+    """
+    pins = []
+    for rule in os.environ.get('MLC_CACHE_PIN', '').split(";"):
+        if not rule.strip():
+            continue
+        if "=" not in rule:
+            logger.warning(f"Invalid MLC_CACHE_PIN rule {rule}, ignoring")
+            continue
+        patterns, root = rule.split("=", 1)
+        patterns = [p.strip() for p in patterns.split(",") if p.strip()]
+        if patterns and root.strip():
+            pins.append((patterns, os.path.expanduser(root.strip())))
+    return pins
+
+
+def get_extra_cache_roots(repos_path):
+    """
+    Return the cache folders outside the repos which belong to the local repo.
+    """
+    roots = []
+    tmp_root = get_tmp_root(repos_path)
+    if tmp_root:
+        roots.append(tmp_root)
+    roots += get_cache_roots() + [root for _, root in get_pins()]
+
+    extra_roots = []
+    for root in roots:
+        if os.path.isdir(root) and root not in extra_roots:
+            extra_roots.append(root)
+    return extra_roots
+
+
+def find_cache_root(path, repos_path, repo_path):
+    """
+    Return the cache folder containing a cache entry.
+    """
+    for root in [os.path.join(repo_path, "cache")] + \
+            get_extra_cache_roots(repos_path):
+        if path.startswith(os.path.join(root, "")):
+            return root
+    return os.path.dirname(path)
+
+
+def _next_round_robin(repos_path, count):
+    """
+    Return the next index of the round-robin placement, shared by all the
+    processes using the repos folder.
+    """
+    counter_file = os.path.join(repos_path, ".cache_roots_counter")
+    with FileLock(counter_file + ".lock"):
+        try:
+            with open(counter_file, "r") as f:
+                counter = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            counter = 0
+        with open(counter_file, "w") as f:
+            f.write(str(counter + 1))
+    return counter % count
+
+
+def select_cache_root(repos_path, tags, default_root):
+    """
+    Return the cache folder in which a new cache with the given tags is created.
+    """
+    for patterns, root in get_pins():
+        if all(any(fnmatch.fnmatchcase(tag, pattern) for tag in tags)
+               for pattern in patterns):
+            os.makedirs(root, exist_ok=True)
+            return root
+
+    roots = get_cache_roots()
+    if not roots:
+        return default_root
+
+    strategy = os.environ.get(
+        'MLC_CACHE_PLACEMENT', 'most_free').strip().lower()
+    if strategy not in PLACEMENT_STRATEGIES:
+        logger.warning(
+            f"Unknown cache placement {strategy}, using most_free")
+        strategy = "most_free"
+
+    if strategy == "round_robin":
+        root = roots[_next_round_robin(repos_path, len(roots))]
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    best_root, best_free = None, -1
+    for root in roots:
+        try:
+            os.makedirs(root, exist_ok=True)
+            free = shutil.disk_usage(root).free
+        except OSError as e:
+            logger.warning(f"Skipping the cache folder {root}: {e}")
+            continue
+        if free > best_free:
+            best_root, best_free = root, free
+    return best_root or default_root
+
+
+def place_tmp_cache(repos_path):
+    """
+    Return the folder in which a new tmp cache is created or None if it should
+    be created in the repo (no tmpfs or not enough free space).
+    """
+    tmp_root = get_tmp_root(repos_path)
+    if not tmp_root:
+        return None
+    try:
+        os.makedirs(tmp_root, exist_ok=True)
+        free = shutil.disk_usage(tmp_root).free
+    except OSError as e:
+        logger.debug(f"Cannot use {tmp_root} for tmp caches: {e}")
+        return None
+    if free < get_tmp_min_free():
+        logger.debug(
+            f"Not enough free space in {tmp_root} ({free} bytes), creating the tmp cache on disk")
+        return None
+    return tmp_root
+
+
+def _owner_file(tmp_root, name):
+    return os.path.join(tmp_root, OWNERS_DIR, name)
+
+
+def register_tmp_cache(path, cleanup):
+    """
+    Record a tmp cache created by this process on tmpfs, before its folder is
+    created. cleanup(path) is called for it when the process exits.
+    """
+    global _atexit_registered
+    tmp_root = os.path.dirname(path)
+    os.makedirs(os.path.join(tmp_root, OWNERS_DIR), exist_ok=True)
+    with open(_owner_file(tmp_root, os.path.basename(path)), "w") as f:
+        f.write(str(os.getpid()))
+
+    with _created_guard:
+        _created.append((path, cleanup))
+        if not _atexit_registered:
+            atexit.register(cleanup_tmp_caches)
+            _atexit_registered = True
+
+
+def cleanup_tmp_caches():
+    """
+    Remove the tmp caches created by this process.
+    """
+    with _created_guard:
+        created = list(_created)
+        del _created[:]
+    for path, cleanup in created:
+        try:
+            cleanup(path)
+        except Exception as e:
+            logger.warning(f"Failed to remove the tmp cache {path}: {e}")
+        forget_tmp_cache(path)
+
+
+def _is_alive(pid):
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def get_orphaned_tmp_caches(repos_path):
+    """
+    Return the tmp caches on tmpfs whose creating process is no longer running.
+    A folder without an owner file is orphaned, as the owner file of a tmp
+    cache is written before its folder is created.
+    """
+    tmp_root = get_tmp_root(repos_path)
+    if not tmp_root or not os.path.isdir(tmp_root):
+        return []
+
+    orphaned = []
+    for name in os.listdir(tmp_root):
+        path = os.path.join(tmp_root, name)
+        # skip the owners and the trash folders
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        try:
+            with open(_owner_file(tmp_root, name), "r") as f:
+                pid = int(f.read().strip())
+        except (OSError, ValueError):
+            pid = None
+        if pid is None or not _is_alive(pid):
+            orphaned.append(path)
+    return orphaned
+
+
+def forget_tmp_cache(path):
+    try:
+        os.remove(_owner_file(os.path.dirname(path), os.path.basename(path)))
+    except OSError:
+        pass
@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+from filelock import FileLock, Timeout
+
+from .logger import logger
+
+
+# Lock objects are shared per key inside a process so that a process holding a
+# reservation can create the cache entry (Action.add) without deadlocking on
+# its own lock
+_locks = {}
+_locks_guard = threading.Lock()
+
+# Lock-wait metrics of the current process
+lock_metrics = {
+    "reservations": 0,
+    "contended": 0,
+    "total_wait_time": 0.0,
+    "max_wait_time": 0.0
+}
+
+
+def get_lock_file(repos_path, key):
+    return os.path.join(repos_path, ".locks", "cache", key[:2], key + ".lock")
+
+
+def _get_lock(lock_file):
+    with _locks_guard:
+        lock = _locks.get(lock_file)
+        if lock is None:
+            os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+            lock = FileLock(lock_file)
+            _locks[lock_file] = lock
+        return lock
+
+
+class CacheReservation:
+    """
+    Exclusive per-key lock used to create a cache entry only once when many
+    processes need the same cache at the same time (single-flight).
+
+    The first process acquires the lock, creates and populates the cache and
+    releases the lock. The other processes block in acquire() and find the
+    created cache once they get the lock.
+
+    Usage:
+        with CacheReservation(repos_path, key) as reservation:
+            ...search the cache and create it if missing...
+    """
+
+    def __init__(self, repos_path, key, timeout=-1):
+        self.key = key
+        self.lock_file = get_lock_file(repos_path, key)
+        self.timeout = timeout
+        self.wait_time = 0.0
+        self._lock = _get_lock(self.lock_file)
+
+    @property
+    def is_locked(self):
+        return self._lock.is_locked
+
+    def acquire(self):
+        """
+        Take the lock, waiting for at most the timeout of the reservation.
+
+        Raises:
+            filelock.Timeout: If the lock is still held by another process
+                              after the timeout (wait_time is set).
+        """
+        start = time.time()
+        try:
+            self._lock.acquire(timeout=0)
+        except Timeout:
+            logger.info(
+                f"Waiting for another process creating the cache with key {self.key}...")
+            lock_metrics["contended"] += 1
+            try:
+                self._lock.acquire(timeout=self.timeout)
+            except Timeout:
+                self.wait_time = time.time() - start
+                raise
+
+        self.wait_time = time.time() - start
+        lock_metrics["reservations"] += 1
+        lock_metrics["total_wait_time"] += self.wait_time
+        lock_metrics["max_wait_time"] = max(
+            lock_metrics["max_wait_time"], self.wait_time)
+        logger.debug(
+            f"Cache reservation {self.key} acquired after {self.wait_time:.3f}s")
+        return self
+
+    def get_timeout_error(self):
+        return {'return': 1,
+                'error': f"Timed out after {self.wait_time:.1f}s waiting for another process creating the cache with key {self.key}"}
+
+    def release(self):
+        if self._lock.is_locked:
+            self._lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
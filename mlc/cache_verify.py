@@ -0,0 +1,184 @@
+import os
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+from .blob_store import SKIPPED_FILES
+from .logger import logger
+
+
+# The digests of the payload files of every verified cache are kept in
+# <repos_path>/.cache_checksums/<uid>.json, keyed by the path of the file
+# inside the cache. A file whose (inode, size, mtime) did not change since it
+# was hashed is not read again unless a full verification is requested.
+CHECKSUMS_DIR = ".cache_checksums"
+
+
+def _checksums_file(repos_path, uid):
+    return os.path.join(repos_path, CHECKSUMS_DIR, f"{uid}.json")
+
+
+def _load_checksums(checksums_file):
+    try:
+        with open(checksums_file, "r") as f:
+            checksums = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable checksums {checksums_file}: {e}")
+        return None
+    return checksums if isinstance(checksums, dict) else None
+
+
+def _save_checksums(checksums_file, checksums):
+    os.makedirs(os.path.dirname(checksums_file), exist_ok=True)
+    tmp_file = f"{checksums_file}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(checksums, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, checksums_file)
+
+
+def _list_files(entry_path):
+    """
+    Return (relative path, stat) of the payload files of a cache entry.
+    """
+    files = []
+    for root, dirs, filenames in os.walk(entry_path):
+        for filename in filenames:
+            if root == entry_path and filename in SKIPPED_FILES:
+                continue
+            file_path = os.path.join(root, filename)
+            try:
+                st = os.lstat(file_path)
+            except OSError:
+                continue
+            if os.path.islink(file_path):
+                continue
+            files.append((os.path.relpath(file_path, entry_path), st))
+    return files
+
+
+def _file_stat(st):
+    return {"ino": st.st_ino, "size": st.st_size, "mtime": st.st_mtime_ns}
+
+
+def _digests(checksums):
+    return {rel_path: known.get("sha256")
+            for rel_path, known in checksums.items()}
+
+
+def verify_entries(repos_path, entries, full=False, update=False,
+                   max_workers=None):
+    """
+    Verify the payload files of cache entries against their stored digests.
+
+    The files of all the entries are hashed by a single thread pool. The first
+    verification of an entry records its digests.
+
+    Args:
+        repos_path (str): Path of the MLC repos folder.
+        entries (list): List of (uid, path) tuples of the cache entries.
+        full (bool): Hash all the files, even those whose (inode, size, mtime)
+                     match the stored digest.
+        update (bool): Record the digests of the current content instead of
+                       reporting the modified and missing files, e.g. after
+                       a cache was legitimately rewritten. Implies full.
+        max_workers (int, optional): Number of hashing threads.
+
+    Returns:
+        dict: return code and, in 'list', one result per entry with its uid,
+              path, status (ok, recorded, updated or corrupted), the corrupted and
+              missing files and the number of hashed and skipped files.
+    """
+    plans = []
+    to_hash = []
+    for uid, entry_path in entries:
+        checksums_file = _checksums_file(repos_path, uid)
+        stored = _load_checksums(checksums_file)
+        files = _list_files(entry_path)
+        plan = {"uid": uid, "path": entry_path, "file": checksums_file,
+                "stored": stored or {}, "recorded": stored is None,
+                "files": files, "skipped": []}
+        for rel_path, st in files:
+            known = plan["stored"].get(rel_path)
+            if not (full or update) and known and all(
+                    known.get(key) == value for key, value in _file_stat(st).items()):
+                plan["skipped"].append(rel_path)
+            else:
+                to_hash.append(os.path.join(entry_path, rel_path))
+        plans.append(plan)
+
+    def hash_file(file_path):
+        try:
+            return utils.get_file_hash(file_path)
+        except OSError as e:
+            logger.warning(f"Failed to read {file_path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = dict(zip(to_hash, executor.map(hash_file, to_hash)))
+
+    results = []
+    for plan in plans:
+        checksums = {}
+        corrupted = []
+        skipped = set(plan["skipped"])
+        for rel_path, st in plan["files"]:
+            known = plan["stored"].get(rel_path)
+            if rel_path in skipped:
+                checksums[rel_path] = known
+                continue
+            digest = digests[os.path.join(plan["path"], rel_path)]
+            if digest is None or (not update and known and
+                                  known.get("sha256") != digest):
+                corrupted.append(rel_path)
+                if known:
+                    # keep the good digest so that re-runs still report it
+                    checksums[rel_path] = known
+                continue
+            checksums[rel_path] = {**_file_stat(st), "sha256": digest}
+
+        present = {rel_path for rel_path, _ in plan["files"]}
+        missing = sorted(rel_path for rel_path in plan["stored"]
+                         if rel_path not in present)
+        if update:
+            # the removed files are dropped from the recorded digests
+            missing = []
+        for rel_path in missing:
+            checksums[rel_path] = plan["stored"][rel_path]
+
+        if corrupted or missing:
+            status = "corrupted"
+        elif plan["recorded"]:
+            status = "recorded"
+        elif update and _digests(checksums) != _digests(plan["stored"]):
+            status = "updated"
+        else:
+            status = "ok"
+
+        if checksums != plan["stored"] or plan["recorded"]:
+            _save_checksums(plan["file"], checksums)
+
+        results.append({
+            "uid": plan["uid"],
+            "path": plan["path"],
+            "status": status,
+            "corrupted": sorted(corrupted),
+            "missing": missing,
+            "hashed": len(plan["files"]) - len(skipped),
+            "skipped": len(skipped)
+        })
+
+    return {'return': 0, 'list': results}
+
+
+def forget(repos_path, uids):
+    """
+    Remove the stored digests of the given cache entries.
+    """
+    for uid in uids:
+        try:
+            os.remove(_checksums_file(repos_path, uid))
+        except OSError:
+            pass
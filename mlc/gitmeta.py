@@ -0,0 +1,217 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import logger
+
+
+# Git metadata (HEAD, branch, commit) is read directly from the .git folder,
+# which is much cheaper than spawning git, e.g. when reporting the state of all
+# the repos on an error. Only the dirty-state checks run git.
+MAX_SYMREF_DEPTH = 5
+
+
+def find_git_dir(path):
+    """
+    Return (git_dir, common_dir) of a checkout or None if it is not a git
+    repo. For a worktree, .git is a file pointing to its git dir and the refs
+    live in the common dir of the main repo.
+    """
+    dot_git = os.path.join(path, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git, dot_git
+    if not os.path.isfile(dot_git):
+        return None
+
+    try:
+        with open(dot_git, "r") as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+    git_dir = os.path.normpath(os.path.join(
+        path, content[len("gitdir:"):].strip()))
+
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r") as f:
+            common_dir = os.path.normpath(
+                os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        pass
+    return git_dir, common_dir
+
+
+def _read_packed_refs(common_dir):
+    refs = {}
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), "r") as f:
+            for line in f:
+                line = line.strip()
+                # comments and peeled tags (^<sha>)
+                if not line or line.startswith(("#", "^")):
+                    continue
+                parts = line.split(" ", 1)
+                if len(parts) == 2:
+                    refs[parts[1]] = parts[0]
+    except OSError:
+        pass
+    return refs
+
+
+def resolve_ref(git_dir, common_dir, ref):
+    """
+    Return the commit a ref (e.g. refs/heads/main) points to or None.
+    """
+    packed = None
+    for _ in range(MAX_SYMREF_DEPTH):
+        value = None
+        # per-worktree refs are in the git dir, the shared ones in the common
+        # dir
+        for base in [git_dir, common_dir]:
+            try:
+                with open(os.path.join(base, *ref.split("/")), "r") as f:
+                    value = f.read().strip()
+                break
+            except OSError:
+                continue
+        if value is None:
+            if packed is None:
+                packed = _read_packed_refs(common_dir)
+            return packed.get(ref)
+        if not value.startswith("ref:"):
+            return value
+        ref = value[len("ref:"):].strip()
+    return None
+
+
+def read_head(path):
+    """
+    Read the HEAD of a checkout.
+
+    Returns:
+        dict: 'branch' (None for a detached HEAD) and 'commit' (None for a
+              branch without commits), or None if it is not a git repo.
+    """
+    dirs = find_git_dir(path)
+    if not dirs:
+        return None
+    git_dir, common_dir = dirs
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r") as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+
+    if head.startswith("ref:"):
+        ref = head[len("ref:"):].strip()
+        branch = ref[len("refs/heads/"):] if ref.startswith(
+            "refs/heads/") else ref
+        return {'branch': branch,
+                'commit': resolve_ref(git_dir, common_dir, ref)}
+    return {'branch': None, 'commit': head}
+
+
+def is_sparse(path):
+    """
+    Return True if a checkout has a sparse-checkout pattern file.
+    """
+    dirs = find_git_dir(path)
+    return bool(dirs) and os.path.isfile(
+        os.path.join(dirs[0], "info", "sparse-checkout"))
+
+
+def get_local_changes(path, timeout=None, untracked=False):
+    """
+    Return the tracked files with local changes (git status --porcelain
+    output, untracked files excluded unless untracked is set) or None if git
+    failed or timed out.
+    """
+    untracked_files = 'normal' if untracked else 'no'
+    try:
+        r = subprocess.run(['git', '-C', path, 'status', '--porcelain', f'--untracked-files={untracked_files}'],
+                           capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"git status failed in {path}: {e}")
+        return None
+    if r.returncode != 0:
+        return None
+    return r.stdout
+
+
+def get_branch_status(path, timeout=None, fetch=False):
+    """
+    Return the local changes and the upstream state of a checkout with a
+    single git status call, None if git failed or timed out.
+
+    Args:
+        fetch (bool): Fetch from the remote first, to compare with its current
+                      state instead of the last fetched one.
+
+    Returns:
+        dict: dirty (tracked files only), upstream (None if the branch has
+              none), ahead and behind (commits, None without upstream).
+    """
+    if fetch:
+        try:
+            subprocess.run(['git', '-C', path, 'fetch', '--quiet'],
+                           capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.debug(f"git fetch failed in {path}: {e}")
+    try:
+        r = subprocess.run(['git', '-C', path, 'status', '--porcelain=v2', '--branch', '--untracked-files=no'],
+                           capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"git status failed in {path}: {e}")
+        return None
+    if r.returncode != 0:
+        return None
+
+    status = {'dirty': False, 'upstream': None, 'ahead': None, 'behind': None}
+    for line in r.stdout.splitlines():
+        if line.startswith("# branch.upstream "):
+            status['upstream'] = line.split(" ", 2)[2]
+        elif line.startswith("# branch.ab "):
+            ahead, behind = line.split()[2:4]
+            status['ahead'] = int(ahead)
+            status['behind'] = -int(behind)
+        elif line and not line.startswith("#"):
+            status['dirty'] = True
+    return status
+
+
+def get_repos_status(paths, check_dirty=True,
+                     timeout=10, max_workers=None, fetch=False):
+    """
+    Return the git state of several checkouts. HEAD is read from the .git
+    folders and the git status calls run in parallel with a timeout.
+
+    Returns:
+        list: Dicts with path, branch ("HEAD" when detached), commit, short
+              (abbreviated commit), dirty, upstream, ahead and behind (None if
+              unknown), for the paths which are git repos, in the given order.
+    """
+    results = []
+    for path in paths:
+        head = read_head(path)
+        if not head:
+            continue
+        commit = head['commit'] or ""
+        results.append({'path': path,
+                        'branch': head['branch'] or "HEAD",
+                        'commit': commit,
+                        'short': commit[:7],
+                        'dirty': None,
+                        'upstream': None,
+                        'ahead': None,
+                        'behind': None})
+
+    if check_dirty and results:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            statuses = executor.map(
+                lambda r: get_branch_status(r['path'], timeout, fetch), results)
+            for result, status in zip(results, statuses):
+                if status is not None:
+                    result.update(status)
+    return results
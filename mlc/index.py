@@ -1,14 +1,22 @@
 from .logger import logger
+from . import utils
 import os
 import json
 import yaml
 from .repo import Repo
 from datetime import datetime
 from .meta_schema import validate_meta
+from . import cache_layout
+from . import cache_placement
+from . import index_artifact
+from . import gitmeta
 from contextlib import contextmanager
 from filelock import FileLock, Timeout
 
 
+CACHED_STATE_FILE = "mlc-cached-state.json"
+
+
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Repo):
@@ -31,6 +39,13 @@ class Index:
         """
         self.repos_path = repos_path
         self.repos = repos
+        # paths inside repos_path are stored relative to it, so that the repos
+        # folder can be moved or mounted elsewhere without a reindex
+        self._repos_path_prefixes = []
+        for base in [repos_path, os.path.abspath(
+                repos_path), os.path.realpath(repos_path)]:
+            if base not in self._repos_path_prefixes:
+                self._repos_path_prefixes.append(base)
 
         logger.debug(f"Repos path for Index: {self.repos_path}")
         self.index_files = {
@@ -42,9 +57,58 @@ class Index:
         self.modified_times_file = os.path.join(
             repos_path, "modified_times.json")
         self.modified_times = self._load_modified_times()
+        self.cache_sizes_file = os.path.join(repos_path, "cache_sizes.json")
+        self.cache_sizes = None  # loaded lazily by get_cache_sizes
+        self.env_index_file = os.path.join(
+            repos_path, "index_cache_env.json")
+        self.env_index = self._load_env_index()
+        self._env_index_changed = False
+        self._env_reverse = None
+        # paths of the removed caches which other caches depend on
+        self.tombstones_file = os.path.join(
+            repos_path, "index_cache_tombstones.json")
+        self.tombstones = self._load_tombstones()
+        # index entries of the inactive checkouts of repos (git worktrees)
+        self.alternates_file = os.path.join(
+            repos_path, "index_alternates.json")
+        # repos whose index is trusted while their HEAD does not move
+        self.repo_state_file = os.path.join(
+            repos_path, "index_repo_state.json")
+        self.repo_state = self._load_repo_state()
+        self._repo_state_changed = False
+        # validation errors of the meta files which could not be indexed
+        self.meta_errors_file = os.path.join(
+            repos_path, "index_meta_errors.json")
+        self.meta_errors = self._load_meta_errors()
+        self._meta_errors_changed = False
+        self._tombstones_changed = False
+        self._cache_graph = None  # reverse dependency graph, built lazily
+        self._invalid_caches = None
         self._load_existing_index()
         self.build_index()
 
+    def _to_stored_path(self, path):
+        """
+        Return the form of a path saved in the index files: relative to
+        repos_path if it is inside it, absolute otherwise.
+        """
+        if not isinstance(path, str) or not os.path.isabs(path):
+            return path
+        for base in self._repos_path_prefixes:
+            if path == base:
+                return "."
+            if path.startswith(os.path.join(base, "")):
+                return os.path.relpath(path, base)
+        return path
+
+    def _to_abs_path(self, path):
+        """
+        Resolve a path loaded from the index files against repos_path.
+        """
+        if not isinstance(path, str) or os.path.isabs(path):
+            return path
+        return os.path.normpath(os.path.join(self.repos_path, path))
+
     def _get_stored_mtime(self, key):
         """
         Helper method to safely extract mtime from stored data.
@@ -67,7 +131,8 @@ class Index:
                 if os.path.exists(self.modified_times_file):
                     # logger.info(f"Loading modified times from {self.modified_times_file}")
                     with open(self.modified_times_file, "r") as f:
-                        return json.load(f)
+                        return {self._to_abs_path(key): value
+                                for key, value in json.load(f).items()}
                 else:
                     return {}
 
@@ -109,7 +174,8 @@ class Index:
 
                 # logger.debug(f"Saving modified times to {self.modified_times_file}")
                 with open(self.modified_times_file, "w") as f:
-                    json.dump(self.modified_times, f, indent=4)
+                    json.dump({self._to_stored_path(key): value
+                               for key, value in self.modified_times.items()}, f, indent=4)
 
         except Timeout:
             logger.warning(
@@ -118,34 +184,140 @@ class Index:
         except Exception as e:
             logger.error(f"Error saving modified times: {e}")
 
+    def _load_cache_sizes(self):
+        """
+        Load the stored disk usage of cache entries.
+        """
+        lock_file = self.cache_sizes_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                if os.path.exists(self.cache_sizes_file):
+                    with open(self.cache_sizes_file, "r") as f:
+                        return {self._to_abs_path(key): value
+                                for key, value in json.load(f).items()}
+        except Timeout:
+            logger.warning(f"Timeout acquiring lock {lock_file}")
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Failed to load cache sizes: {e}")
+        return {}
+
+    def _save_cache_sizes(self):
+        """
+        Save the disk usage of cache entries in cache_sizes json file.
+        """
+        lock_file = self.cache_sizes_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                with open(self.cache_sizes_file, "w") as f:
+                    json.dump({self._to_stored_path(key): value
+                               for key, value in self.cache_sizes.items()}, f, indent=4)
+        except Timeout:
+            logger.warning(
+                f"Timeout acquiring lock {lock_file}, skipping cache sizes save")
+        except Exception as e:
+            logger.error(f"Error saving cache sizes: {e}")
+
+    def get_cache_sizes(self, paths, force=False):
+        """
+        Return the disk usage of the given cache entries.
+
+        Sizes are computed once with a parallel directory walk and stored in
+        cache_sizes.json. An entry is walked again only when the mtime of its
+        directory changes or when force is set.
+
+        Args:
+            paths (list): Paths of the cache entries.
+            force (bool): Recompute the sizes of all the given entries.
+
+        Returns:
+            dict: Mapping of path to {"size", "files", "mtime"}.
+        """
+        if self.cache_sizes is None:
+            self.cache_sizes = self._load_cache_sizes()
+
+        changed = False
+        result = {}
+        for path in paths:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            stored = self.cache_sizes.get(path)
+            if not force and stored and stored.get("mtime") == mtime:
+                result[path] = stored
+                continue
+
+            r = utils.get_dir_size(path)
+            if r['return'] > 0:
+                logger.warning(r['error'])
+                continue
+            self.cache_sizes[path] = {
+                "size": r['size'],
+                "files": r['files'],
+                "mtime": mtime
+            }
+            result[path] = self.cache_sizes[path]
+            changed = True
+
+        # forget entries which are no longer part of the cache index
+        known_paths = {item["path"] for item in self.indices["cache"]}
+        for path in list(self.cache_sizes):
+            if path not in known_paths:
+                del self.cache_sizes[path]
+                changed = True
+
+        if changed:
+            self._save_cache_sizes()
+
+        return result
+
     def _load_existing_index(self):
         """
         Load previously saved index to allow incremental updates.
         """
-        for folder_type, file_path in self.index_files.items():
-            lock_file = file_path + ".lock"
-            try:
-                with self._file_lock_with_incremental_timeout(lock_file):
-                    # logger.debug(f"Lock acquired at {lock_file} for Loading Index for {folder_type}")
-
-                    if os.path.exists(file_path):
-                        # logger.info(f"Loading existing index for {folder_type}")
-                        with open(file_path, "r") as f:
-                            self.indices[folder_type] = json.load(f)
-                        # Convert repo dicts back into Repo objects
-                        for item in self.indices[folder_type]:
-                            if isinstance(item.get("repo"), dict):
-                                item["repo"] = Repo(**item["repo"])
-                    else:
-                        self.indices[folder_type] = []
+        for folder_type in self.index_files:
+            self.reload_index(folder_type)
 
-            except Timeout:
-                logger.error(f"Timeout acquiring lock {lock_file}")
-                self.indices[folder_type] = []
+    def reload_index(self, folder_type):
+        """
+        Load the saved index of a folder type from disk, e.g. to see the items
+        added by other processes since this index was loaded.
+        """
+        if folder_type == "cache":
+            self._cache_graph = None
+            self._invalid_caches = None
+        file_path = self.index_files[folder_type]
+        lock_file = file_path + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                # logger.debug(f"Lock acquired at {lock_file} for Loading Index for {folder_type}")
+
+                if os.path.exists(file_path):
+                    # logger.info(f"Loading existing index for {folder_type}")
+                    with open(file_path, "r") as f:
+                        self.indices[folder_type] = json.load(f)
+                    # Resolve the stored paths and convert repo dicts back
+                    # into Repo objects
+                    for item in self.indices[folder_type]:
+                        self._from_stored_entry(item)
+                else:
+                    self.indices[folder_type] = []
 
-            except (json.JSONDecodeError, IOError, KeyError, TypeError) as e:
-                logger.warning(f"Failed to load index for {folder_type}: {e}")
-                self.indices[folder_type] = []   # fall back to empty index
+        except Timeout:
+            logger.error(f"Timeout acquiring lock {lock_file}")
+            self.indices[folder_type] = []
+
+        except (json.JSONDecodeError, IOError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to load index for {folder_type}: {e}")
+            self.indices[folder_type] = []   # fall back to empty index
+
+    def save(self):
+        """
+        Write the indices and the modified times to disk, e.g. after entries
+        were updated in place.
+        """
+        self._save_modified_times()
+        self._save_indices()
 
     def add(self, meta, folder_type, path, repo):
         if not repo:
@@ -159,15 +331,57 @@ class Index:
         index = self.get_index(folder_type, unique_id)
 
         if index == -1:
-            self.indices[folder_type].append({
+            entry = {
                 "uid": unique_id,
                 "tags": tags,
                 "alias": alias,
                 "path": path,
                 "repo": repo
-            })
+            }
+            if folder_type == "cache":
+                entry.update(self._get_cache_fields(meta, unique_id, path))
+            self.indices[folder_type].append(entry)
             self._save_indices()
 
+    def add_items(self, items, folder_type):
+        """
+        Add several items to the index with a single index write.
+
+        Args:
+            items (list): List of (meta, path, repo) tuples of the new items.
+            folder_type (str): Type of the items (script, cache or experiment).
+        """
+        if not items:
+            return
+
+        known_uids = {item["uid"] for item in self.indices[folder_type]}
+        for meta, path, repo in items:
+            if meta['uid'] in known_uids:
+                continue
+            known_uids.add(meta['uid'])
+            entry = {
+                "uid": meta['uid'],
+                "tags": meta.get('tags', []),
+                "alias": meta.get('alias'),
+                "path": path,
+                "repo": repo
+            }
+            if folder_type == "cache":
+                entry.update(self._get_cache_fields(meta, meta['uid'], path))
+            self.indices[folder_type].append(entry)
+            for meta_name in ["meta.yaml", "meta.json"]:
+                config_path = os.path.join(path, meta_name)
+                if os.path.isfile(config_path):
+                    mtime = self.get_item_mtime(config_path, folder_type)
+                    self.modified_times[config_path] = {
+                        "mtime": mtime,
+                        "date_time": datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+                    }
+                    break
+
+        self._save_indices()
+        self._save_modified_times()
+
     def get_index(self, folder_type, uid):
         for index in range(len(self.indices[folder_type])):
             if self.indices[folder_type][index]["uid"] == uid:
@@ -183,13 +397,16 @@ class Index:
             self.add(meta, folder_type, path, repo)
             logger.debug(f"Index update failed, new index created for {uid}")
         else:
-            self.indices[folder_type][index] = {
+            entry = {
                 "uid": uid,
                 "tags": tags,
                 "alias": alias,
                 "path": path,
                 "repo": repo
             }
+            if folder_type == "cache":
+                entry.update(self._get_cache_fields(meta, uid, path))
+            self.indices[folder_type][index] = entry
         self._save_indices()
 
     def rm(self, meta, folder_type, path):
@@ -199,16 +416,298 @@ class Index:
             logger.warning(
                 f"Index is not having the {folder_type} item {path}")
         else:
+            if folder_type == "cache":
+                self._add_tombstones(
+                    [self.indices[folder_type][index]["path"]])
             del (self.indices[folder_type][index])
         self._save_indices()
 
-    def get_item_mtime(self, file):
+    def rm_items(self, metas, folder_type):
+        """
+        Remove several items from the index with a single index write.
+
+        Args:
+            metas (list): Metas (with uid) of the removed items.
+            folder_type (str): Type of the items (script, cache or experiment).
+        """
+        uids = {meta['uid'] for meta in metas if meta and meta.get('uid')}
+        if not uids:
+            return
+
+        removed_paths = [item["path"] for item in self.indices[folder_type]
+                         if item["uid"] in uids]
+        if folder_type == "cache":
+            self._add_tombstones(removed_paths)
+        self.indices[folder_type] = [
+            item for item in self.indices[folder_type]
+            if item["uid"] not in uids
+        ]
+        for path in removed_paths:
+            for meta_name in ["meta.yaml", "meta.json"]:
+                self.modified_times.pop(os.path.join(path, meta_name), None)
+
+        self._save_indices()
+        self._save_modified_times()
+
+    def get_item_mtime(self, file, folder_type=None):
         latest = 0
         t = os.path.getmtime(file)
         if t > latest:
             latest = t
+        if folder_type == "cache":
+            # the cached state (and its version) is written after the meta
+            state_file = os.path.join(
+                os.path.dirname(file), CACHED_STATE_FILE)
+            if os.path.isfile(state_file):
+                latest = max(latest, os.path.getmtime(state_file))
         return latest
 
+    def _index_cached_state(self, uid, path):
+        """
+        Read the cached state of a cache entry once for the index: record its
+        new_env in the env index and return the index fields of its version
+        (version and version_key, see utils.version_to_tuple).
+        """
+        state_file = os.path.join(path, CACHED_STATE_FILE)
+        state = {}
+        if os.path.isfile(state_file):
+            try:
+                with open(state_file, "r") as f:
+                    state = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.debug(f"Failed to read {state_file}: {e}")
+            if not isinstance(state, dict):
+                state = {}
+
+        if self.env_index is not None:
+            new_env = state.get("new_env")
+            env = {}
+            if isinstance(new_env, dict):
+                env = {key: str(value) for key, value in new_env.items()
+                       if isinstance(value, (str, int, float, bool))}
+            if self.env_index.get(uid, {}) != env:
+                if env:
+                    self.env_index[uid] = env
+                else:
+                    self.env_index.pop(uid, None)
+                self._env_index_changed = True
+
+        version = state.get("version")
+        if not version or not isinstance(version, str):
+            return {}
+        return {"version": version,
+                "version_key": utils.version_to_tuple(version)}
+
+    def _load_env_index(self):
+        """
+        Load the index of the new_env of the cached states (uid -> env), unless
+        disabled with MLC_CACHE_ENV_INDEX=no.
+        """
+        if os.environ.get('MLC_CACHE_ENV_INDEX', '').strip().lower() in [
+                "no", "off", "false", "0"]:
+            return None
+        lock_file = self.env_index_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                if os.path.exists(self.env_index_file):
+                    with open(self.env_index_file, "r") as f:
+                        return json.load(f)
+        except Timeout:
+            logger.warning(f"Timeout acquiring lock {lock_file}")
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Failed to load the cache env index: {e}")
+        return {}
+
+    def _save_env_index(self):
+        if self.env_index is None:
+            return
+        # drop the env of the removed caches
+        uids = {item["uid"] for item in self.indices["cache"]}
+        for uid in list(self.env_index):
+            if uid not in uids:
+                del self.env_index[uid]
+                self._env_index_changed = True
+        if not self._env_index_changed and os.path.exists(
+                self.env_index_file):
+            return
+
+        lock_file = self.env_index_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                with open(self.env_index_file, "w") as f:
+                    json.dump(self.env_index, f, indent=4)
+            self._env_index_changed = False
+            self._env_reverse = None
+        except Timeout:
+            logger.warning(
+                f"Timeout acquiring lock {lock_file}, skipping cache env index save")
+        except Exception as e:
+            logger.error(f"Error saving the cache env index: {e}")
+
+    def find_cache_by_env(self, env):
+        """
+        Return the uids of the caches whose cached new_env contains all the given
+        key/value pairs, or None if the env index is disabled.
+        """
+        if self.env_index is None:
+            return None
+        if self._env_reverse is None or self._env_index_changed:
+            # key -> value -> uids
+            reverse = {}
+            for uid, cache_env in self.env_index.items():
+                for key, value in cache_env.items():
+                    reverse.setdefault(key, {}).setdefault(
+                        value, set()).add(uid)
+            self._env_reverse = reverse
+
+        uids = None
+        for key, value in env.items():
+            matches = self._env_reverse.get(key, {}).get(str(value), set())
+            uids = matches if uids is None else uids & matches
+        return uids if uids is not None else set()
+
+    def _get_cache_fields(self, meta, uid, path):
+        """
+        Return the extra index fields of a cache entry: its cached version and
+        the paths of the caches it depends on (deps).
+        """
+        fields = self._index_cached_state(uid, path)
+
+        deps = []
+        dep = meta.get('dependent_cached_path')
+        if isinstance(dep, str) and dep:
+            deps.append(dep)
+        dep_paths = meta.get('dependent_cached_paths', [])
+        if isinstance(dep_paths, str):
+            dep_paths = dep_paths.split(",")
+        deps += [d for d in dep_paths if isinstance(d, str) and d]
+        deps = [os.path.normpath(d) for d in deps]
+        if deps:
+            fields["deps"] = sorted(set(deps))
+        return fields
+
+    def _load_tombstones(self):
+        lock_file = self.tombstones_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                if os.path.exists(self.tombstones_file):
+                    with open(self.tombstones_file, "r") as f:
+                        return {self._to_abs_path(path)
+                                for path in json.load(f)}
+        except Timeout:
+            logger.warning(f"Timeout acquiring lock {lock_file}")
+        except (json.JSONDecodeError, IOError, TypeError) as e:
+            logger.warning(f"Failed to load the cache tombstones: {e}")
+        return set()
+
+    def _add_tombstones(self, paths):
+        paths = {os.path.normpath(path) for path in paths}
+        if not paths.issubset(self.tombstones):
+            self.tombstones |= paths
+            self._tombstones_changed = True
+
+    def _save_tombstones(self):
+        # the dependency graph changes with every index write
+        self._cache_graph = None
+        self._invalid_caches = None
+        if not self.tombstones and not self._tombstones_changed:
+            return
+
+        # a tombstone is only needed while some cache depends on it
+        cache_paths = {item["path"] for item in self.indices["cache"]}
+        graph = self._get_cache_graph()
+        for path in list(self.tombstones):
+            if path in cache_paths or path not in graph:
+                self.tombstones.discard(path)
+                self._tombstones_changed = True
+        if not self._tombstones_changed:
+            return
+
+        lock_file = self.tombstones_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                with open(self.tombstones_file, "w") as f:
+                    json.dump(sorted(self._to_stored_path(path)
+                                     for path in self.tombstones), f, indent=4)
+            self._tombstones_changed = False
+        except Timeout:
+            logger.warning(
+                f"Timeout acquiring lock {lock_file}, skipping cache tombstones save")
+        except Exception as e:
+            logger.error(f"Error saving the cache tombstones: {e}")
+
+    @staticmethod
+    def _find_owner(path, owners):
+        """
+        Return the path in owners which is path itself or its closest parent.
+        """
+        path = os.path.normpath(path)
+        while True:
+            if path in owners:
+                return path
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    def _get_cache_graph(self):
+        """
+        Return the reverse dependency graph of the caches: the path of a cache
+        (or of a removed cache) -> the index entries of the caches depending on it.
+        """
+        if self._cache_graph is None:
+            owners = {item["path"]
+                      for item in self.indices["cache"]} | self.tombstones
+            graph = {}
+            for item in self.indices["cache"]:
+                for dep in item.get("deps", []):
+                    owner = self._find_owner(dep, owners)
+                    if owner and owner != item["path"]:
+                        graph.setdefault(owner, []).append(item)
+            self._cache_graph = graph
+        return self._cache_graph
+
+    def get_cache_dependents(self, paths):
+        """
+        Return the index entries of the caches which depend, directly or
+        transitively, on the caches at the given paths.
+        """
+        graph = self._get_cache_graph()
+        seen = {os.path.normpath(path) for path in paths}
+        pending = list(seen)
+        dependents = []
+        while pending:
+            for item in graph.get(pending.pop(), []):
+                if item["path"] not in seen:
+                    seen.add(item["path"])
+                    pending.append(item["path"])
+                    dependents.append(item)
+        return dependents
+
+    def get_invalid_cache_paths(self):
+        """
+        Return the paths of the caches which depend, directly or transitively,
+        on a removed cache. The set is computed once per index change so that
+        searches do not check the dependencies on disk.
+        """
+        if self._invalid_caches is None:
+            self._invalid_caches = {
+                item["path"] for item in self.get_cache_dependents(self.tombstones)}
+        return self._invalid_caches
+
+    def _iter_item_dirs(self, folder_path, folder_type):
+        """
+        Yield (folder_name, path) of the item folders inside a script, cache or
+        experiment folder. Cache folders may use the sharded layout.
+        """
+        if folder_type == "cache":
+            yield from cache_layout.iter_item_dirs(folder_path)
+            return
+        for automation_dir in os.listdir(folder_path):
+            automation_path = os.path.join(folder_path, automation_dir)
+            if os.path.isdir(automation_path):
+                yield automation_dir, automation_path
+
     def _index_single_repo(self, repo, repos_changed=False,
                            current_item_keys=None):
         repo_path = repo.path
@@ -217,15 +716,22 @@ class Index:
 
         changed = False
 
-        for folder_type in ["script", "cache", "experiment"]:
-            folder_path = os.path.join(repo_path, folder_type)
+        folders = [(folder_type, os.path.join(repo_path, folder_type))
+                   for folder_type in ["script", "cache", "experiment"]]
+        if repo.meta and repo.meta.get('alias') == "local":
+            # caches placed outside the repo (tmp caches on tmpfs and the
+            # folders of MLC_CACHE_ROOTS)
+            repo_cache = os.path.normpath(os.path.join(repo_path, "cache"))
+            folders += [("cache", root) for root in
+                        cache_placement.get_extra_cache_roots(self.repos_path)
+                        if os.path.normpath(root) != repo_cache]
+
+        for folder_type, folder_path in folders:
             if not os.path.isdir(folder_path):
                 continue
 
-            for automation_dir in os.listdir(folder_path):
-                automation_path = os.path.join(folder_path, automation_dir)
-                if not os.path.isdir(automation_path):
-                    continue
+            for automation_dir, automation_path in self._iter_item_dirs(
+                    folder_path, folder_type):
 
                 yaml_path = os.path.join(automation_path, "meta.yaml")
                 json_path = os.path.join(automation_path, "meta.json")
@@ -259,7 +765,7 @@ class Index:
                     continue
                 if current_item_keys is not None:
                     current_item_keys.add(config_path)
-                mtime = self.get_item_mtime(config_path)
+                mtime = self.get_item_mtime(config_path, folder_type)
                 old_mtime = self._get_stored_mtime(config_path)
 
                 # skip if unchanged
@@ -306,8 +812,24 @@ class Index:
             self.indices = {k: [] for k in self.index_files.keys()}
             force_rebuild = True
 
+        if not os.path.exists(self.meta_errors_file):
+            # the validation errors were not recorded by older versions: the
+            # metas which are not in the index (failed metas) are processed
+            # again, and the file is written even if there is no error
+            indexed = {os.path.normpath(item["path"])
+                       for items in self.indices.values() for item in items}
+            for key in [k for k in self.modified_times
+                        if os.path.normpath(os.path.dirname(k)) not in indexed]:
+                del self.modified_times[key]
+            self._meta_errors_changed = True
+
         # index each repo
         for repo in self.repos:
+            if not force_rebuild and self._is_pinned(repo):
+                # the stored entries of an immutable repo are kept as they are
+                current_item_keys.update(
+                    key for key in self.modified_times if _is_inside(key, repo.path))
+                continue
             repo_changed = self._index_single_repo(
                 repo, force_rebuild, current_item_keys)
             if repo_changed:
@@ -320,6 +842,7 @@ class Index:
             logger.warning(f"Detected deleted item: {key}")
             logger.debug(f"Removing index entry for folder: {folder_key}")
             del self.modified_times[key]
+            self._set_meta_errors(key, None)
             self._remove_index_entry(folder_key)
             changed = True
         if deleted_keys:
@@ -331,11 +854,16 @@ class Index:
                 "Changes detected, saving updated index and modified times.")
             self._save_modified_times()
             self._save_indices()
+        self._save_repo_state()
+        self._save_meta_errors()
 
     def _remove_index_entry(self, key):
         logger.debug(f"Removing index entry for path: {key}")
         # Normalize paths for comparison
         normalized_key = os.path.normpath(key)
+        if any(os.path.normpath(item["path"]) == normalized_key
+               for item in self.indices["cache"]):
+            self._add_tombstones([normalized_key])
         for ft in self.indices:
             original_count = len(self.indices[ft])
             self.indices[ft] = [
@@ -375,6 +903,7 @@ class Index:
             logger.debug(f"No meta file in {folder_path}, skipping")
             return
 
+        meta_errors = None
         try:
             # Determine the file type based on the extension
             if config_file.endswith(".yaml") or config_file.endswith(".yml"):
@@ -391,11 +920,13 @@ class Index:
             if not isinstance(data, dict):
                 logger.warning(
                     f"Skipping {config_file}: Invalid or empty meta")
+                meta_errors = ["Invalid or empty meta"]
                 return
             # Extract necessary fields
             unique_id = data.get("uid")
             if not unique_id:
                 logger.warning(f"Skipping {config_file}: missing uid")
+                meta_errors = ["Missing uid"]
                 return
             tags = data.get("tags", [])
             alias = data.get("alias", None)
@@ -408,6 +939,7 @@ class Index:
                 for w in warnings:
                     logger.debug(f"Meta validation warning: {w}")
                 if errors:
+                    meta_errors = errors
                     raise ValueError(
                         f"Meta validation failed for {config_file}. Fix the above error(s) and try again.")
 
@@ -418,16 +950,56 @@ class Index:
             # exists
             self._delete_index_entries(folder_type, "uid", unique_id)
 
-            self.indices[folder_type].append({
+            entry = {
                 "uid": unique_id,
                 "tags": tags,
                 "alias": alias,
                 "path": folder_path,
                 "repo": repo
-            })
+            }
+            if folder_type == "cache":
+                entry.update(self._get_cache_fields(
+                    data, unique_id, folder_path))
+            self.indices[folder_type].append(entry)
 
         except Exception as e:
             logger.error(f"Error processing {config_file}: {e}")
+            meta_errors = meta_errors or [str(e)]
+
+        finally:
+            self._set_meta_errors(config_file, meta_errors)
+
+    def _from_stored_entry(self, item):
+        """
+        Resolve the stored paths of an index entry and convert its repo dict
+        back into a Repo object, in place.
+        """
+        item["path"] = self._to_abs_path(item["path"])
+        if item.get("deps"):
+            item["deps"] = [self._to_abs_path(dep) for dep in item["deps"]]
+        if item.get("version_key"):
+            # json turns the version tuples into lists
+            item["version_key"] = tuple(
+                tuple(part) for part in item["version_key"])
+        if isinstance(item.get("repo"), dict):
+            repo = item["repo"]
+            repo["path"] = self._to_abs_path(repo["path"])
+            item["repo"] = Repo(**repo)
+        return item
+
+    def _to_stored_entry(self, item):
+        stored = dict(item)
+        stored["path"] = self._to_stored_path(item["path"])
+        if item.get("deps"):
+            stored["deps"] = [self._to_stored_path(dep)
+                              for dep in item["deps"]]
+        repo = item.get("repo")
+        if isinstance(repo, Repo):
+            stored["repo"] = {
+                "path": self._to_stored_path(repo.path),
+                "meta": repo.meta
+            }
+        return stored
 
     def _save_indices(self):
         """
@@ -446,7 +1018,9 @@ class Index:
 
                     with open(output_file, "w") as f:
                         json.dump(
-                            index_data, f, indent=4, cls=CustomJSONEncoder)
+                            [self._to_stored_entry(item)
+                             for item in index_data],
+                            f, indent=4, cls=CustomJSONEncoder)
                     # logger.debug(f"Shared index for {folder_type} saved to {output_file}.")
 
             except Timeout:
@@ -456,16 +1030,114 @@ class Index:
                 logger.error(
                     f"Error saving shared index for {folder_type}: {e}")
 
+        self._save_env_index()
+        self._save_tombstones()
+        self._save_meta_errors()
+
     def add_repo(self, repo):
         """
         Incrementally index a newly registered repository.
         """
-        changed = self._index_single_repo(repo, repos_changed=True)
+        loaded = self._load_repo_artifact(repo)
+        # with an artifact, only the items it does not hold (e.g. caches) are
+        # parsed
+        changed = self._index_single_repo(
+            repo, repos_changed=not loaded) or loaded
 
         if changed:
             self._save_indices()
             self._save_modified_times()
 
+    def _load_repo_artifact(self, repo):
+        """
+        Index the scripts and experiments of a clean checkout from the index
+        artifact of its commit, if there is one (see index_artifact).
+
+        Returns:
+            bool: True if the artifact was loaded.
+        """
+        artifacts_dir = index_artifact.get_artifacts_dir()
+        repo_uid = (repo.meta or {}).get('uid')
+        if not artifacts_dir or not repo_uid:
+            return False
+        commit = index_artifact.get_clean_commit(repo.path)
+        if not commit:
+            return False
+        artifact = index_artifact.load_artifact(
+            artifacts_dir, repo_uid, commit)
+        if not artifact:
+            return False
+
+        loaded = []
+        try:
+            for folder_type in index_artifact.FOLDER_TYPES:
+                for item in artifact["indices"].get(folder_type, []):
+                    path = os.path.join(repo.path, *item["path"].split("/"))
+                    config_path = os.path.join(path, item["config"])
+                    loaded.append((folder_type, config_path, {
+                        "uid": item["uid"],
+                        "tags": item["tags"],
+                        "alias": item["alias"],
+                        "path": path,
+                        "repo": repo
+                    }, self.get_item_mtime(config_path, folder_type)))
+        except (OSError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(
+                f"Ignoring the index artifact of {repo.path} at {commit}: {e}")
+            return False
+
+        for folder_type, config_path, entry, mtime in loaded:
+            self._delete_index_entries(folder_type, "path", entry["path"])
+            self._delete_index_entries(folder_type, "uid", entry["uid"])
+            self.indices[folder_type].append(entry)
+            self.modified_times[config_path] = {
+                "mtime": mtime,
+                "date_time": datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M:%S")
+            }
+        logger.debug(
+            f"Loaded {len(loaded)} index entries of {repo.path} from its artifact at {commit}")
+        return True
+
+    def save_repo_artifacts(self, artifacts_dir):
+        """
+        Write the index artifacts of the clean git checkouts of the registered
+        repos which do not have one yet.
+
+        Returns:
+            list: Paths of the written artifacts.
+        """
+        written = []
+        for repo in self.repos:
+            repo_uid = (repo.meta or {}).get('uid')
+            commit = index_artifact.get_clean_commit(
+                repo.path) if repo_uid else None
+            if not commit:
+                logger.debug(
+                    f"Skipping the index artifact of {repo.path}: not a clean git checkout")
+                continue
+            if os.path.exists(index_artifact.get_artifact_path(
+                    artifacts_dir, repo_uid, commit)):
+                continue
+
+            indices = {}
+            for folder_type in index_artifact.FOLDER_TYPES:
+                indices[folder_type] = []
+                for item in self.indices[folder_type]:
+                    if not _is_inside(item["path"], repo.path):
+                        continue
+                    config = "meta.yaml" if os.path.isfile(os.path.join(
+                        item["path"], "meta.yaml")) else "meta.json"
+                    indices[folder_type].append({
+                        "uid": item["uid"],
+                        "tags": item["tags"],
+                        "alias": item["alias"],
+                        "path": os.path.relpath(item["path"], repo.path).replace(os.sep, "/"),
+                        "config": config
+                    })
+            written.append(index_artifact.save_artifact(
+                artifacts_dir, repo_uid, commit, indices))
+        return written
+
     def remove_repo_from_index(self, repo_path):
         """
         Remove all index entries and modified times belonging to a repo.
@@ -480,7 +1152,7 @@ class Index:
             before = len(self.indices[folder_type])
             self.indices[folder_type] = [
                 item for item in self.indices[folder_type]
-                if not item["path"].startswith(repo_path)
+                if not _is_inside(item["path"], repo_path)
             ]
             if len(self.indices[folder_type]) != before:
                 changed = True
@@ -488,13 +1160,210 @@ class Index:
         # remove modified times
         keys_to_delete = [
             k for k in self.modified_times
-            if k.startswith(repo_path)
+            if _is_inside(k, repo_path)
         ]
 
         for k in keys_to_delete:
             del self.modified_times[k]
             changed = True
 
+        if self.repo_state.pop(repo_path, None):
+            self._repo_state_changed = True
+            self._save_repo_state()
+
+        for key in [k for k in self.meta_errors if _is_inside(k, repo_path)]:
+            self._set_meta_errors(key, None)
+
         if changed:
             self._save_indices()
             self._save_modified_times()
+
+    def _load_repo_state(self):
+        lock_file = self.repo_state_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                if os.path.exists(self.repo_state_file):
+                    with open(self.repo_state_file, "r") as f:
+                        return {self._to_abs_path(key): value
+                                for key, value in json.load(f).items()}
+        except Timeout:
+            logger.warning(f"Timeout acquiring lock {lock_file}")
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Failed to load the state of the repos: {e}")
+        return {}
+
+    def _save_repo_state(self):
+        if not self._repo_state_changed:
+            return
+        lock_file = self.repo_state_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                with open(self.repo_state_file, "w") as f:
+                    json.dump({self._to_stored_path(key): value
+                               for key, value in self.repo_state.items()}, f, indent=4)
+            self._repo_state_changed = False
+        except Timeout:
+            logger.warning(
+                f"Timeout acquiring lock {lock_file}, skipping the state of the repos save")
+        except Exception as e:
+            logger.error(f"Error saving the state of the repos: {e}")
+
+    def set_repo_immutable(self, repo_path, head):
+        """
+        Mark a repo as immutable at a commit: build_index then keeps its stored
+        entries without checking its meta files until its HEAD changes.
+        """
+        self.repo_state[repo_path] = {"immutable": True, "head": head}
+        self._repo_state_changed = True
+        self._save_repo_state()
+
+    def _is_pinned(self, repo):
+        """
+        Return True if a repo is immutable and its HEAD (a single file read for
+        a detached HEAD) is still at the commit it was marked at.
+        """
+        state = self.repo_state.get(repo.path)
+        if not state or not state.get("immutable"):
+            return False
+        head = gitmeta.read_head(repo.path)
+        if head and head["commit"] == state.get("head"):
+            return True
+        logger.debug(
+            f"HEAD of the immutable repo {repo.path} changed, checking it for changes again")
+        del self.repo_state[repo.path]
+        self._repo_state_changed = True
+        return False
+
+    def _load_meta_errors(self):
+        lock_file = self.meta_errors_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                if os.path.exists(self.meta_errors_file):
+                    with open(self.meta_errors_file, "r") as f:
+                        return {self._to_abs_path(key): value
+                                for key, value in json.load(f).items()}
+        except Timeout:
+            logger.warning(f"Timeout acquiring lock {lock_file}")
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Failed to load the meta errors: {e}")
+        return {}
+
+    def _save_meta_errors(self):
+        if not self._meta_errors_changed:
+            return
+        lock_file = self.meta_errors_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                with open(self.meta_errors_file, "w") as f:
+                    json.dump({self._to_stored_path(key): value
+                               for key, value in self.meta_errors.items()}, f, indent=4)
+            self._meta_errors_changed = False
+        except Timeout:
+            logger.warning(
+                f"Timeout acquiring lock {lock_file}, skipping the meta errors save")
+        except Exception as e:
+            logger.error(f"Error saving the meta errors: {e}")
+
+    def _set_meta_errors(self, config_file, errors):
+        if errors:
+            if self.meta_errors.get(config_file) != errors:
+                self.meta_errors[config_file] = errors
+                self._meta_errors_changed = True
+        elif self.meta_errors.pop(config_file, None) is not None:
+            self._meta_errors_changed = True
+
+    def get_meta_errors(self, folder=None):
+        """
+        Return the validation errors of the meta files (inside a folder, e.g. a
+        repo) found when they were indexed, by meta file path. Only changed
+        meta files are validated again.
+        """
+        return {path: errors for path, errors in self.meta_errors.items()
+                if folder is None or _is_inside(path, folder)}
+
+    def _load_alternates(self):
+        lock_file = self.alternates_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                if os.path.exists(self.alternates_file):
+                    with open(self.alternates_file, "r") as f:
+                        return json.load(f)
+        except Timeout:
+            logger.warning(f"Timeout acquiring lock {lock_file}")
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Failed to load the index of the alternates: {e}")
+        return {}
+
+    def _save_alternates(self, alternates):
+        lock_file = self.alternates_file + ".lock"
+        try:
+            with self._file_lock_with_incremental_timeout(lock_file):
+                with open(self.alternates_file, "w") as f:
+                    json.dump(alternates, f, indent=4, cls=CustomJSONEncoder)
+        except Timeout:
+            logger.warning(
+                f"Timeout acquiring lock {lock_file}, skipping the index of the alternates save")
+        except Exception as e:
+            logger.error(f"Error saving the index of the alternates: {e}")
+
+    def switch_repo(self, old_path, repo):
+        """
+        Replace a registered repo by another checkout of it (e.g. a git
+        worktree of another branch) without a full reindex.
+
+        The index entries of the old checkout are put aside, and those put
+        aside when the new checkout was last active are restored, so that only
+        the items which changed since then are read again.
+
+        Args:
+            old_path (str): Path of the checkout which is no longer registered.
+            repo (Repo): The checkout registered instead.
+        """
+        alternates = self._load_alternates()
+
+        stash = {"indices": {}, "modified_times": {}}
+        for folder_type in self.indices:
+            stash["indices"][folder_type] = [
+                self._to_stored_entry(item) for item in self.indices[folder_type]
+                if _is_inside(item["path"], old_path)]
+            self.indices[folder_type] = [
+                item for item in self.indices[folder_type]
+                if not _is_inside(item["path"], old_path)]
+        for key in [k for k in self.modified_times if _is_inside(k, old_path)]:
+            stash["modified_times"][self._to_stored_path(
+                key)] = self.modified_times.pop(key)
+        alternates[self._to_stored_path(old_path)] = stash
+
+        restored = alternates.pop(self._to_stored_path(repo.path), None)
+        if restored:
+            for folder_type, entries in restored.get("indices", {}).items():
+                if folder_type not in self.indices:
+                    continue
+                for entry in entries:
+                    entry = self._from_stored_entry(entry)
+                    entry["repo"] = repo
+                    self.indices[folder_type].append(entry)
+            for key, value in restored.get("modified_times", {}).items():
+                self.modified_times[self._to_abs_path(key)] = value
+            logger.debug(
+                f"Restored the index entries of {repo.path}, checking for changes")
+
+        current_item_keys = set()
+        self._index_single_repo(repo, current_item_keys=current_item_keys)
+        # items deleted from the checkout while it was inactive
+        for key in [k for k in self.modified_times if _is_inside(
+                k, repo.path) and k not in current_item_keys]:
+            del self.modified_times[key]
+            self._remove_index_entry(os.path.dirname(key))
+
+        self._save_indices()
+        self._save_modified_times()
+        self._save_alternates(alternates)
+
+
+def _is_inside(path, folder):
+    """
+    Return True if path is folder or inside it (a sibling like <folder>+branch
+    is not).
+    """
+    return path == folder or path.startswith(os.path.join(folder, ""))
@@ -0,0 +1,87 @@
+import os
+import json
+import uuid
+
+from . import gitmeta
+from .logger import logger
+
+
+# Index artifacts hold the script and experiment index entries of a repo at a
+# commit, with paths relative to the repo, in a shared folder
+# (MLC_INDEX_ARTIFACTS, e.g. on NFS or baked into a container image) as
+# <repo uid>-<commit>.json. `mlc reindex --artifacts` writes them, and
+# registering a clean checkout of the same commit on another machine loads its
+# entries instead of parsing all the metas. Caches are machine specific and
+# are never part of an artifact.
+ARTIFACT_VERSION = 1
+FOLDER_TYPES = ["script", "experiment"]
+
+
+def get_artifacts_dir(location=None):
+    """
+    Return the folder of the index artifacts (location or the
+    MLC_INDEX_ARTIFACTS env variable), None if not configured.
+    """
+    location = location or os.environ.get('MLC_INDEX_ARTIFACTS', '').strip()
+    return location or None
+
+
+def get_clean_commit(repo_path):
+    """
+    Return the commit of a checkout if its tree matches the commit (no local
+    changes, untracked files included, and not a sparse checkout), else None.
+    """
+    head = gitmeta.read_head(repo_path)
+    if not head or not head['commit'] or gitmeta.is_sparse(repo_path):
+        return None
+    changes = gitmeta.get_local_changes(repo_path, untracked=True)
+    if changes is None or changes.strip():
+        return None
+    return head['commit']
+
+
+def get_artifact_path(artifacts_dir, repo_uid, commit):
+    return os.path.join(artifacts_dir, f"{repo_uid}-{commit}.json")
+
+
+def load_artifact(artifacts_dir, repo_uid, commit):
+    artifact_path = get_artifact_path(artifacts_dir, repo_uid, commit)
+    try:
+        with open(artifact_path, "r") as f:
+            artifact = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(
+            f"Ignoring unreadable index artifact {artifact_path}: {e}")
+        return None
+    if not isinstance(artifact, dict) or artifact.get(
+            "version") != ARTIFACT_VERSION:
+        return None
+    return artifact
+
+
+def save_artifact(artifacts_dir, repo_uid, commit, indices):
+    """
+    Write the index artifact of a repo commit.
+
+    Args:
+        indices (dict): Entries of every folder type, with their uid, tags,
+                        alias, path relative to the repo ("/" separated) and
+                        meta file name.
+
+    Returns:
+        str: Path of the artifact.
+    """
+    artifact_path = get_artifact_path(artifacts_dir, repo_uid, commit)
+    os.makedirs(artifacts_dir, exist_ok=True)
+    tmp_file = f"{artifact_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump({"version": ARTIFACT_VERSION, "repo_uid": repo_uid,
+                       "commit": commit, "indices": indices}, f, indent=2)
+        os.replace(tmp_file, artifact_path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return artifact_path
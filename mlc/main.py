@@ -5,6 +5,7 @@ from pathlib import Path
 import inspect
 import shlex
 import unicodedata
+import keyword
 from . import utils
 
 from .action import Action, default_parent
@@ -97,33 +98,13 @@ def get_version_info():
 
 def _get_repo_hashes():
     """Get git info for all repos. Returns list of (alias, branch, hash, has_local_changes)."""
-    import subprocess
+    from . import gitmeta
     if default_parent is None:
         return []
-    results = []
-    for repo in default_parent.repos:
-        alias = os.path.basename(repo.path)
-        git_dir = os.path.join(repo.path, '.git')
-        if not os.path.isdir(git_dir):
-            continue
-        try:
-            commit = subprocess.check_output(
-                ["git", "-C", repo.path, "rev-parse", "--short", "HEAD"],
-                stderr=subprocess.DEVNULL, text=True
-            ).strip()
-            branch = subprocess.check_output(
-                ["git", "-C", repo.path, "rev-parse", "--abbrev-ref", "HEAD"],
-                stderr=subprocess.DEVNULL, text=True
-            ).strip()
-            # Only tracked file changes (ignore untracked files)
-            dirty = subprocess.check_output(
-                ["git", "-C", repo.path, "status", "--porcelain", "-uno"],
-                stderr=subprocess.DEVNULL, text=True
-            ).strip()
-            results.append((alias, branch, commit, bool(dirty)))
-        except Exception:
-            pass
-    return results
+    # HEAD is read from the .git folders, only the (tracked) local changes
+    # checks run git, in parallel and with a timeout
+    return [(os.path.basename(status['path']), status['branch'], status['short'], bool(status['dirty']))
+            for status in gitmeta.get_repos_status([repo.path for repo in default_parent.repos])]
 
 
 def _report_error(e):
@@ -348,7 +329,9 @@ def build_parser(pre_args):
 
     # General commands
     for action in ['run', 'pull', 'test', 'add', 'show', 'list',
-                   'find', 'search', 'rm', 'cp', 'mv', 'help', 'prune', 'mark-tmp']:
+                   'find', 'search', 'rm', 'cp', 'mv', 'help', 'prune', 'mark-tmp',
+                   'du', 'dedup', 'migrate', 'export', 'import', 'push',
+                   'verify', 'switch', 'status']:
         p = subparsers.add_parser(action, add_help=False)
         p.add_argument('target', choices=['repo', 'repos', 'script', 'cache'])
         p.add_argument(
@@ -376,6 +359,32 @@ def build_parser(pre_args):
         help='Details or identifier (optional)')
     reindex_parser.add_argument('extra', nargs=argparse.REMAINDER)
 
+    # Relocate command (target is optional)
+    relocate_parser = subparsers.add_parser('relocate', add_help=False)
+    relocate_parser.add_argument(
+        'target',
+        nargs='?',
+        choices=['repo', 'repos', 'cache', 'all'],
+        help='Target to relocate (optional, defaults to all)')
+    relocate_parser.add_argument(
+        'details',
+        nargs='?',
+        help='Details or identifier (optional)')
+    relocate_parser.add_argument('extra', nargs=argparse.REMAINDER)
+
+    # Garbage collection command (target is optional, defaults to cache)
+    gc_parser = subparsers.add_parser('gc', add_help=False)
+    gc_parser.add_argument(
+        'target',
+        nargs='?',
+        choices=['cache'],
+        help='Target to garbage collect (optional, defaults to cache)')
+    gc_parser.add_argument(
+        'details',
+        nargs='?',
+        help='Details or identifier (optional)')
+    gc_parser.add_argument('extra', nargs=argparse.REMAINDER)
+
     # Script-only
     for action in ['docker', 'docker-run', 'apptainer',
                    'experiment', 'remote-run', 'remote-experiment',
@@ -416,7 +425,8 @@ def build_run_args(args):
             [os.path.basename(sys.argv[0]), *sys.argv[1:]])
     run_args['mlc_run_cmd'] = mlc_run_cmd
 
-    if args.command in ['pull', 'rm', 'add', 'find'] and args.target == "repo":
+    if args.command in ['pull', 'rm', 'add', 'find',
+                        'switch', 'status'] and args.target == "repo":
         run_args['repo'] = args.details
 
     if args.command in ['docker', 'docker-run', 'apptainer', 'experiment',
@@ -426,8 +436,18 @@ def build_run_args(args):
         # target as in input
         args.target = "script"
 
+    if args.command == "export" and not run_args.get('output'):
+        extra = getattr(args, 'extra', [])
+        if '-o' in extra and extra.index('-o') + 1 < len(extra):
+            run_args['output'] = extra[extra.index('-o') + 1]
+            run_args.pop('o', None)
+
+    if args.command == "import" and args.details:
+        # the bundle path is given in place of the tags
+        run_args['input'] = args.details
+
     if args.details and not utils.is_uid(args.details) and not run_args.get(
-            "tags") and args.target in ["script", "cache"]:
+            "tags") and args.target in ["script", "cache"] and args.command != "import":
         run_args['tags'] = args.details
 
     if not run_args.get('details') and args.details:
@@ -495,8 +515,9 @@ def main():
     | Target  | Actions                                                   |
     |---------|-----------------------------------------------------------|
     | script  | run, find/search, rm, mv, cp, add, test, docker-run, show |
-    | cache   | find/search, rm, show, list, prune, mark-tmp              |
-    | repo    | pull, search, rm, list, find/search                       |
+    | cache   | find/search, rm, show, list, prune, mark-tmp, du, dedup,  |
+    |         | migrate, gc, export, import, push, verify                 |
+    | repo    | pull, search, rm, list, find/search, switch, status       |
 
     Example:
       mlc run script detect-os
@@ -532,10 +553,10 @@ def main():
         pre_args.action = pre_args.action.replace("-", "_")
 
     parser = build_parser(pre_args)
-    # Force full parsing for reindex command even without target, or if there
-    # are remaining args or target
+    # Force full parsing for reindex, gc and relocate commands even without
+    # target, or if there are remaining args or target
     args = parser.parse_args() if (
-        remaining_args or pre_args.target or pre_args.action == 'reindex') else pre_args
+        remaining_args or pre_args.target or pre_args.action in ['reindex', 'gc', 'relocate']) else pre_args
 
     if hasattr(args, 'command') and args.command:
         args.command = args.command.replace("-", "_")
@@ -573,6 +594,8 @@ def main():
         elif pre_args.action and pre_args.target:
             actions = get_action(pre_args.target, default_parent)
             action_name = pre_args.action.replace("-", "_")
+            if keyword.iskeyword(action_name):
+                action_name += "_"
             try:
                 method = getattr(actions, action_name)
                 help_text += actions.__doc__
@@ -596,6 +619,15 @@ def main():
             # Reindex all targets by using the base Action class
             args.target = "script"  # Use script as default to get access to the action
 
+    if hasattr(args, 'command') and args.command == "relocate":
+        if not getattr(args, 'target', None) or args.target == "all":
+            # relocate is implemented in the base Action class
+            args.target = "script"
+
+    if hasattr(args, 'command') and args.command == "gc":
+        if not getattr(args, 'target', None):
+            args.target = "cache"
+
     # Check if command attribute exists
     if not hasattr(args, 'command'):
         logging.error("Error: No command specified.")
@@ -606,14 +638,19 @@ def main():
 
     action = get_action(args.target, default_parent)
 
-    if not action or not hasattr(action, args.command):
+    # actions named after python keywords (e.g. import) are implemented as
+    # <name>_
+    method_name = args.command + \
+        "_" if keyword.iskeyword(args.command) else args.command
+
+    if not action or not hasattr(action, method_name):
         logging.error(
             "Error: '%s' is not supported for %s.",
             args.command,
             args.target)
         sys.exit(1)
 
-    method = getattr(action, args.command)
+    method = getattr(action, method_name)
     res = method(run_args)
     if res['return'] > 0:
         logging.error(res.get('error', f"Error in {action}"))
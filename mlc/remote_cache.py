@@ -0,0 +1,189 @@
+import os
+import shutil
+import uuid
+
+from . import utils
+from . import cache_bundle
+from .logger import logger
+
+
+# Remote caches store one single-entry bundle per deterministic cache key,
+# <key[:2]>/<key>.tar.gz, next to its sha256 digest (<key>.tar.gz.sha256).
+# The digest is written after the bundle, so a bundle is only visible once it
+# is complete.
+BUNDLE_SUFFIX = ".tar.gz"
+
+
+def _object_name(key):
+    return f"{key[:2]}/{key}{BUNDLE_SUFFIX}"
+
+
+class FileRemoteCache:
+    """
+    Remote cache on a shared filesystem (e.g. NFS).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return self.path
+
+    def _object_path(self, key):
+        return os.path.join(self.path, *_object_name(key).split("/"))
+
+    def get(self, key, output_file):
+        """
+        Download the bundle of a cache key.
+
+        Returns:
+            dict: return code, 'found' and the expected 'digest'.
+        """
+        object_path = self._object_path(key)
+        try:
+            with open(object_path + ".sha256", "r") as f:
+                digest = f.read().strip()
+            shutil.copyfile(object_path, output_file)
+        except FileNotFoundError:
+            return {'return': 0, 'found': False}
+        except OSError as e:
+            return {'return': 1,
+                    'error': f"Failed to read {object_path}: {e}"}
+        return {'return': 0, 'found': True, 'digest': digest}
+
+    def put(self, key, bundle_file, digest):
+        object_path = self._object_path(key)
+        tmp_suffix = f".{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            shutil.copyfile(bundle_file, object_path + tmp_suffix)
+            os.replace(object_path + tmp_suffix, object_path)
+            with open(object_path + ".sha256" + tmp_suffix, "w") as f:
+                f.write(digest)
+            os.replace(object_path + ".sha256" + tmp_suffix,
+                       object_path + ".sha256")
+        except OSError as e:
+            return {'return': 1,
+                    'error': f"Failed to write {object_path}: {e}"}
+        return {'return': 0}
+
+
+class HttpRemoteCache:
+    """
+    Remote cache served over HTTP: objects are fetched with GET and stored with
+    PUT, a missing object is answered with 404.
+    """
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def __str__(self):
+        return self.url
+
+    def _object_url(self, key):
+        return f"{self.url}/{_object_name(key)}"
+
+    def get(self, key, output_file):
+        import requests
+        object_url = self._object_url(key)
+        try:
+            r = requests.get(object_url + ".sha256", timeout=self.timeout)
+            if r.status_code == 404:
+                return {'return': 0, 'found': False}
+            r.raise_for_status()
+            digest = r.text.strip()
+
+            with requests.get(object_url, stream=True,
+                              timeout=self.timeout) as r:
+                if r.status_code == 404:
+                    return {'return': 0, 'found': False}
+                r.raise_for_status()
+                with open(output_file, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+        except requests.RequestException as e:
+            return {'return': 1,
+                    'error': f"Failed to download {object_url}: {e}"}
+        return {'return': 0, 'found': True, 'digest': digest}
+
+    def put(self, key, bundle_file, digest):
+        import requests
+        object_url = self._object_url(key)
+        try:
+            with open(bundle_file, "rb") as f:
+                r = requests.put(object_url, data=f, timeout=self.timeout)
+                r.raise_for_status()
+            r = requests.put(object_url + ".sha256", data=digest.encode(),
+                             timeout=self.timeout)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            return {'return': 1,
+                    'error': f"Failed to upload {object_url}: {e}"}
+        return {'return': 0}
+
+
+def get_remote_cache(location=None):
+    """
+    Return the remote cache configured by the MLC_CACHE_REMOTE env variable
+    (an http(s) URL or a shared folder) or None if not configured.
+    """
+    location = (location or os.environ.get('MLC_CACHE_REMOTE', '')).strip()
+    if not location:
+        return None
+    if location.startswith(("http://", "https://")):
+        return HttpRemoteCache(location)
+    if location.startswith("file://"):
+        location = location[len("file://"):]
+    return FileRemoteCache(location)
+
+
+def fetch(remote, key, repos_path, repo, index):
+    """
+    Download the cache entry of a key from a remote cache, verify its digest
+    and add it to the cache of the given repo.
+
+    Returns:
+        dict: return code and the imported items (list), empty on a miss.
+    """
+    staging_path = os.path.join(repos_path, ".staging")
+    os.makedirs(staging_path, exist_ok=True)
+    bundle_file = os.path.join(
+        staging_path, f"{key}-{uuid.uuid4().hex[:8]}{BUNDLE_SUFFIX}")
+    try:
+        r = remote.get(key, bundle_file)
+        if r['return'] > 0 or not r['found']:
+            return {**r, 'list': []}
+
+        digest = utils.get_file_hash(bundle_file)
+        if digest != r['digest']:
+            return {'return': 1,
+                    'error': f"Digest mismatch for the cache {key} downloaded from {remote}"}
+
+        logger.info(f"Fetched the cache {key} from {remote}")
+        return cache_bundle.import_bundle(bundle_file, repos_path, repo, index)
+    finally:
+        if os.path.exists(bundle_file):
+            os.remove(bundle_file)
+
+
+def push(remote, key, entry, repos_path):
+    """
+    Upload a cache entry to a remote cache as a single-entry bundle.
+
+    Args:
+        entry (dict): uid, alias, tags, path and cache_root of the entry, as
+                      for cache_bundle.export_bundle.
+    """
+    staging_path = os.path.join(repos_path, ".staging")
+    os.makedirs(staging_path, exist_ok=True)
+    bundle_file = os.path.join(
+        staging_path, f"{key}-{uuid.uuid4().hex[:8]}{BUNDLE_SUFFIX}")
+    try:
+        r = cache_bundle.export_bundle([entry], bundle_file)
+        if r['return'] > 0:
+            return r
+        return remote.put(key, bundle_file, utils.get_file_hash(bundle_file))
+    finally:
+        if os.path.exists(bundle_file):
+            os.remove(bundle_file)
@@ -3,13 +3,18 @@ import os
 import subprocess
 import re
 import yaml
-import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from . import utils
 from .logger import logger
 from urllib.parse import urlparse
 from .repo import Repo
+from .repo_registry import RepoRegistry, update_repos_file
 from .index import Index
+from . import repo_sparse
+from . import repo_mirror
+from . import repo_snapshot
+from . import gitmeta
 
 
 class RepoAction(Action):
@@ -24,6 +29,8 @@ class RepoAction(Action):
     3. pull
     4. list
     5. remove(rm)
+    6. switch
+    7. status
 
     Repositories in MLCFlow can be identified using any of the following methods:
 
@@ -122,7 +129,7 @@ class RepoAction(Action):
         return {'return': 0}
 
     def conflicting_repo(self, repo_meta):
-        for repo_object in self.repos:
+        for repo_object in RepoRegistry.get(self.repos_path).get_repos():
             if repo_object.meta.get('uid', '') == '':
                 return {
                     "return": 1, "error": f"UID is not present in file 'meta.yaml' in the repo path {repo_object.path}"}
@@ -135,7 +142,8 @@ class RepoAction(Action):
                             "conflicting_path": repo_object.path}
         return {"return": 0}
 
-    def register_repo(self, repo_path, repo_meta, ignore_on_conflict=False):
+    def register_repo(self, repo_path, repo_meta,
+                      ignore_on_conflict=False, pull_deps=True):
 
         # Check UID conflicts
         is_conflict = self.conflicting_repo(repo_meta)
@@ -148,6 +156,10 @@ class RepoAction(Action):
                 # logger.warning(is_conflict["error"])
                 logger.debug("No changes made to repos.json.")
                 return {"return": 0}
+            elif is_alternate(repo_path, is_conflict['conflicting_path']):
+                # another checkout (worktree) of the same repo
+                return self._switch_checkout(
+                    is_conflict['conflicting_path'], repo_path)
             else:
                 logger.warning(
                     f"The repo to be registered has conflict with the repo already in the path: {is_conflict['conflicting_path']}")
@@ -160,7 +172,7 @@ class RepoAction(Action):
                 logger.warning(
                     f"{is_conflict['conflicting_path']} is unregistered.")
 
-        if repo_meta.get('deps'):
+        if pull_deps and repo_meta.get('deps'):
             for dep in repo_meta['deps']:
                 self.pull_repo(
                     dep['url'],
@@ -170,25 +182,17 @@ class RepoAction(Action):
                         'is_alias_okay',
                         True))
 
-        # Get the path to the repos.json file in $HOME/MLC
-        repos_file_path = os.path.join(self.repos_path, 'repos.json')
-
-        with open(repos_file_path, 'r') as f:
-            repos_list = json.load(f)
-
-        if repo_path not in repos_list:
-            repos_list.append(repo_path)
+        def add_path(repos_list):
+            if repo_path in repos_list:
+                return None
             logger.info(f"Added new repo path: {repo_path}")
+            return repos_list + [repo_path]
 
-        with open(repos_file_path, 'w') as f:
-            json.dump(repos_list, f, indent=2)
-            logger.info(f"Updated repos.json at {repos_file_path}")
+        registry = RepoRegistry.get(self.repos_path)
+        registry.update(add_path)
 
         self.repos = self.load_repos_and_meta()
-        repo_obj = next(
-            (r for r in self.repos if r.path == repo_path),
-            None
-        )
+        repo_obj = registry.find_by_path(repo_path)
 
         if repo_obj:
             index = Action.get_index(self)
@@ -197,6 +201,35 @@ class RepoAction(Action):
 
         return {'return': 0}
 
+    def _switch_checkout(self, old_path, repo_path):
+        """
+        Register another checkout of a registered repo in its place, reusing
+        the index entries of the checkout when it was last active.
+        """
+        logger.info(f"Switching the repo from {old_path} to {repo_path}")
+        # the index is loaded before repos.json changes so that it is updated
+        # incrementally
+        index = Action.get_index(self)
+
+        def replace_path(repos_list):
+            repos_list = [repo_path if path == old_path else path
+                          for path in repos_list]
+            if repo_path not in repos_list:
+                repos_list.append(repo_path)
+            return repos_list
+
+        registry = RepoRegistry.get(self.repos_path)
+        registry.update(replace_path)
+
+        self.repos = self.load_repos_and_meta()
+        index.repos = self.repos
+        repo_obj = registry.find_by_path(repo_path)
+        if repo_obj:
+            index.switch_repo(old_path, repo_obj)
+            logger.debug("Index file has been updated")
+
+        return {'return': 0, 'switched_from': old_path}
+
     def unregister_repo(self, repo_path):
         repos_file_path = os.path.join(self.repos_path, 'repos.json')
 
@@ -221,8 +254,7 @@ class RepoAction(Action):
       [2025-02-19 15:32:18,352 main.py:1737 INFO] - Item path: /home/anandhu/MLC/repos/mlcommons@mlperf-automations
 
         """
-        # Get repos_list using the existing method
-        repos_list = self.load_repos_and_meta()
+        registry = RepoRegistry.get(self.repos_path)
         if (run_args.get('item', run_args.get('artifact'))):
             repo = run_args.get('item', run_args.get('artifact'))
         else:
@@ -271,19 +303,11 @@ class RepoAction(Action):
                 repo_name = repo
 
         # Check if repo_name exists in repos.json
-        matched_repo_path = None
-        for repo_obj in repos_list:
-            if repo_name and repo_name == os.path.basename(repo_obj.path):
-                matched_repo_path = repo_obj
-                break
-
-        # Search through self.repos for matching repos
-        lst = []
-        for i in self.repos:
-            if repo_uid and i.meta['uid'] == repo_uid:
-                lst.append(i)
-            elif repo_name == i.meta['alias']:
-                lst.append(i)
+        matched_repo_path = registry.find_by_folder(
+            repo_name) if repo_name else None
+
+        # Search the registered repos by uid and alias
+        lst = registry.find(uid=repo_uid, alias=repo_name)
 
         # After loop, check if any match was found
         if not lst and not matched_repo_path:
@@ -322,14 +346,11 @@ class RepoAction(Action):
             return {"return": 0, "value": os.path.basename(
                 url).replace(".git", "")}
 
-    def pull_repo(self, repo_url, branch=None, checkout=None, tag=None,
-                  pat=None, ssh=None, ignore_on_conflict=False, repo_path=None, force=False):
-
-        # Determine the checkout path from environment or default
-        repo_base_path = self.repos_path  # either the value will be from 'MLC_REPOS'
-        # Ensure the directory exists
-        os.makedirs(repo_base_path, exist_ok=True)
-
+    def _resolve_repo(self, repo_url, pat=None, ssh=None, repo_path=None):
+        """
+        Return the clone URL of a repo (user@repo is expanded to its GitHub URL)
+        and the folder it is pulled into.
+        """
         # Handle user@repo format (convert to standard GitHub URL)
         if re.match(r'^[\w-]+@[\w-]+$', repo_url):
             user, repo = repo_url.split('@')
@@ -347,163 +368,313 @@ class RepoAction(Action):
             else:
                 repo_url = res["url"]
 
-        # Extract the repo name from URL
-        repo_name = repo_url.split('/')[-1].replace('.git', '')
         res = self.github_url_to_user_repo_format(repo_url)
         if res["return"] > 0:
             return res
-        else:
-            repo_download_name = res["value"]
-            if not repo_path:
-                repo_path = os.path.join(repo_base_path, repo_download_name)
+        if not repo_path:
+            repo_path = os.path.join(self.repos_path, res["value"])
 
-        try:
-            # If the directory doesn't exist, clone it
-            if not os.path.exists(repo_path):
-                logger.info(f"Cloning repository {repo_url} to {repo_path}...")
-
-                # Build clone command without branch if not provided
-                clone_command = ['git', 'clone', repo_url, repo_path]
-                if branch:
-                    clone_command = [
-                        'git',
-                        'clone',
-                        '--branch',
-                        branch,
-                        repo_url,
-                        repo_path]
-
-                subprocess.run(clone_command, check=True)
+        return {'return': 0, 'url': repo_url, 'path': repo_path}
 
-            else:
-                logger.info(
-                    f"Repository {repo_name} already exists at {repo_path}. Checking for local changes...")
+    def _fetch_repo(self, repo_url, repo_path, branch=None, checkout=None, tag=None,
+                    force=False, output=None, depth=None, clone_filter=None, scripts=None,
+                    mirror=None, snapshot=None):
+        """
+        Clone a repo or pull its latest changes, and check out the requested
+        branch, commit or tag. The repo is not registered.
+
+        If output is a list, git output and progress messages are collected in
+        it instead of being written to the terminal, so that repos pulled
+        concurrently do not interleave their output.
+
+        depth and clone_filter (e.g. blob:none) make shallow and partial
+        clones. scripts (a tag expression, see repo_sparse.parse_tag_expr)
+        makes a sparse checkout of the matching script folders. New clones
+        borrow the objects of a local mirror if mirror or MLC_REPO_MIRRORS is
+        set (see repo_mirror), unless they are shallow or partial.
+
+        snapshot (a ref) downloads the tree of the repo at that ref instead of
+        cloning it (see repo_snapshot). An existing snapshot is updated to the
+        same ref when no snapshot is given.
+        """
+        # Extract the repo name from URL
+        repo_name = repo_url.split('/')[-1].replace('.git', '')
+        pull_command = ['git', '-C', repo_path, 'pull']
+        if depth:
+            pull_command += ['--depth', str(depth)]
 
-                # Check for local changes
-                status_command = [
+        def log(level, message):
+            if output is None:
+                getattr(logger, level)(message)
+            else:
+                output.append(message)
+
+        def run_git(command, check=True):
+            if output is None:
+                return subprocess.run(command, check=check)
+            r = subprocess.run(command, capture_output=True, text=True)
+            text = (r.stdout + r.stderr).rstrip()
+            if text:
+                output.append(text)
+            if check and r.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    r.returncode, command, r.stdout, r.stderr)
+            return r
+
+        if not snapshot and not os.path.exists(
+                os.path.join(repo_path, ".git")):
+            marker = repo_snapshot.read_marker(repo_path)
+            if marker:
+                # e.g. pull --all only knows the folder name of the repo
+                snapshot = marker.get('ref')
+                repo_url = marker.get('url') or repo_url
+        if snapshot:
+            return repo_snapshot.pull_snapshot(
+                self.repos_path, repo_url, repo_path, snapshot, log)
+
+        # If the directory doesn't exist, clone it
+        if not os.path.exists(repo_path):
+            log("info", f"Cloning repository {repo_url} to {repo_path}...")
+
+            # Build clone command without branch if not provided
+            clone_command = ['git', 'clone', repo_url, repo_path]
+            if branch:
+                clone_command = [
                     'git',
-                    '-C',
-                    repo_path,
-                    'status',
-                    '--porcelain',
-                    '--untracked-files=no']
-                local_changes = subprocess.run(
-                    status_command, capture_output=True, text=True)
-
-                if local_changes.stdout.strip():
-                    if not force:
-                        logger.warning(
-                            "There are local changes in the repository. Please commit or stash them before checking out.")
-                        print(local_changes.stdout.strip())
-                        return {
-                            "return": 0, "warning": f"Local changes detected in the already existing repository: {repo_path}, skipping the pull"}
+                    'clone',
+                    '--branch',
+                    branch,
+                    repo_url,
+                    repo_path]
+            if depth:
+                clone_command[2:2] = ['--depth', str(depth)]
+            if clone_filter:
+                clone_command[2:2] = [f'--filter={clone_filter}']
+            if scripts:
+                # only the top-level files until the scripts are selected
+                clone_command[2:2] = ['--sparse']
+            if repo_mirror.mirrors_enabled(mirror) and (depth or clone_filter):
+                # a full mirror would transfer more than the requested
+                # shallow or partial clone
+                logger.debug(
+                    "Not using the mirror for a shallow or partial clone")
+            elif repo_mirror.mirrors_enabled(mirror):
+                try:
+                    mirror_path = repo_mirror.update_mirror(
+                        self.repos_path, repo_url, run_git)
+                    clone_command[2:2] = [
+                        '--reference', mirror_path, '--dissociate']
+                except subprocess.CalledProcessError as e:
+                    # the command holds the credentials of the url
+                    log("warning",
+                        f"Failed to update the mirror of {utils.strip_url_credentials(repo_url)} "
+                        f"(git exited with {e.returncode}), cloning without it")
+
+            run_git(clone_command)
 
-                    logger.warning(
-                        "Local changes detected. Running force pull with temporary git stash.")
-                    stash_created = False
-                    try:
-                        stash_before = subprocess.run(
-                            ['git', '-C', repo_path, 'stash', 'list'],
-                            capture_output=True,
-                            text=True,
-                            check=True
-                        )
-                        stash_res = subprocess.run(
-                            ['git', '-C', repo_path, 'stash', 'push',
-                                '-m', 'mlc pull repo --force'],
-                            capture_output=True,
-                            text=True,
-                            check=True
-                        )
-                        stash_after = subprocess.run(
-                            ['git', '-C', repo_path, 'stash', 'list'],
-                            capture_output=True,
-                            text=True,
-                            check=True
-                        )
-                        stash_created = len(stash_after.stdout.splitlines()
-                                            ) > len(stash_before.stdout.splitlines())
-                    except subprocess.CalledProcessError as e:
-                        stash_error = (e.stderr or e.stdout or str(e)).strip()
+        else:
+            log("info",
+                f"Repository {repo_name} already exists at {repo_path}. Checking for local changes...")
+
+            # Check for local changes
+            local_changes = gitmeta.get_local_changes(repo_path) or ""
+
+            if local_changes.strip():
+                if not force:
+                    log("warning",
+                        "There are local changes in the repository. Please commit or stash them before checking out.")
+                    log("info", local_changes.strip())
+                    return {
+                        "return": 0, "warning": f"Local changes detected in the already existing repository: {repo_path}, skipping the pull"}
+
+                log("warning",
+                    "Local changes detected. Running force pull with temporary git stash.")
+                stash_created = False
+                try:
+                    stash_before = subprocess.run(
+                        ['git', '-C', repo_path, 'stash', 'list'],
+                        capture_output=True,
+                        text=True,
+                        check=True
+                    )
+                    stash_res = subprocess.run(
+                        ['git', '-C', repo_path, 'stash', 'push',
+                            '-m', 'mlc pull repo --force'],
+                        capture_output=True,
+                        text=True,
+                        check=True
+                    )
+                    stash_after = subprocess.run(
+                        ['git', '-C', repo_path, 'stash', 'list'],
+                        capture_output=True,
+                        text=True,
+                        check=True
+                    )
+                    stash_created = len(stash_after.stdout.splitlines()
+                                        ) > len(stash_before.stdout.splitlines())
+                except subprocess.CalledProcessError as e:
+                    stash_error = (e.stderr or e.stdout or str(e)).strip()
+                    return {
+                        "return": 1,
+                        "error": f"Force pull failed while stashing local changes in {repo_path}: {stash_error}"
+                    }
+
+                log("info",
+                    "Pulling latest changes...")
+                try:
+                    subprocess.run(
+                        pull_command,
+                        capture_output=True,
+                        text=True,
+                        check=True)
+                except subprocess.CalledProcessError as e:
+                    pull_error = (e.stderr or e.stdout or str(e)).strip()
+                    if stash_created:
                         return {
                             "return": 1,
-                            "error": f"Force pull failed while stashing local changes in {repo_path}: {stash_error}"
+                            "error": f"Force pull failed during git pull for {repo_path}. Local changes remain in stash. Please run `git -C {repo_path} stash apply` after resolving pull issues. Details: {pull_error}"
                         }
+                    return {
+                        "return": 1,
+                        "error": f"Force pull failed during git pull for {repo_path}: {pull_error}"
+                    }
+                log("info", "Repository successfully pulled.")
 
-                    logger.info(
-                        "Pulling latest changes...")
+                if stash_created:
                     try:
                         subprocess.run(
-                            ['git', '-C', repo_path, 'pull'],
+                            ['git', '-C', repo_path, 'stash', 'apply'],
                             capture_output=True,
                             text=True,
                             check=True)
-                    except subprocess.CalledProcessError as e:
-                        pull_error = (e.stderr or e.stdout or str(e)).strip()
-                        if stash_created:
-                            return {
-                                "return": 1,
-                                "error": f"Force pull failed during git pull for {repo_path}. Local changes remain in stash. Please run `git -C {repo_path} stash apply` after resolving pull issues. Details: {pull_error}"
-                            }
-                        return {
-                            "return": 1,
-                            "error": f"Force pull failed during git pull for {repo_path}: {pull_error}"
-                        }
-                    logger.info("Repository successfully pulled.")
-
-                    if stash_created:
+                        subprocess.run(
+                            ['git', '-C', repo_path, 'stash', 'drop'],
+                            capture_output=True,
+                            text=True,
+                            check=True)
+                        log("info",
+                            "Local changes restored successfully after force pull.")
+                    except subprocess.CalledProcessError as apply_error:
+                        apply_error_msg = (
+                            apply_error.stderr or apply_error.stdout or str(apply_error)).strip()
                         try:
                             subprocess.run(
-                                ['git', '-C', repo_path, 'stash', 'apply'],
-                                capture_output=True,
-                                text=True,
-                                check=True)
-                            subprocess.run(
-                                ['git', '-C', repo_path, 'stash', 'drop'],
+                                ['git', '-C', repo_path,
+                                    'reset', '--hard', 'HEAD'],
                                 capture_output=True,
                                 text=True,
                                 check=True)
-                            logger.info(
-                                "Local changes restored successfully after force pull.")
-                        except subprocess.CalledProcessError as apply_error:
-                            apply_error_msg = (
-                                apply_error.stderr or apply_error.stdout or str(apply_error)).strip()
-                            try:
-                                subprocess.run(
-                                    ['git', '-C', repo_path,
-                                        'reset', '--hard', 'HEAD'],
-                                    capture_output=True,
-                                    text=True,
-                                    check=True)
-                            except subprocess.CalledProcessError as reset_exception:
-                                reset_error_msg = (
-                                    reset_exception.stderr or reset_exception.stdout or str(reset_exception)).strip()
-                                return {
-                                    "return": 1,
-                                    "error": f"Stash apply conflicted and automatic rollback failed for {repo_path}: {reset_error_msg}. Original stash apply error: {apply_error_msg}"
-                                }
-                            logger.warning(
-                                f"Stash apply reported conflicts after pull. Reverted partial stash apply. "
-                                f"Please resolve manually with `git -C {repo_path} stash apply`.")
+                        except subprocess.CalledProcessError as reset_exception:
+                            reset_error_msg = (
+                                reset_exception.stderr or reset_exception.stdout or str(reset_exception)).strip()
                             return {
-                                "return": 0,
-                                "warning": f"Force pull succeeded for {repo_path}, but stash apply had conflicts. Partial apply was reverted. Please apply the stash manually."
+                                "return": 1,
+                                "error": f"Stash apply conflicted and automatic rollback failed for {repo_path}: {reset_error_msg}. Original stash apply error: {apply_error_msg}"
                             }
-                else:
-                    logger.info(
-                        "No local changes detected. Pulling latest changes...")
-                    subprocess.run(
-                        ['git', '-C', repo_path, 'pull'], check=True)
-                    logger.info("Repository successfully pulled.")
+                        log("warning",
+                            f"Stash apply reported conflicts after pull. Reverted partial stash apply. "
+                            f"Please resolve manually with `git -C {repo_path} stash apply`.")
+                        return {
+                            "return": 0,
+                            "warning": f"Force pull succeeded for {repo_path}, but stash apply had conflicts. Partial apply was reverted. Please apply the stash manually."
+                        }
+            else:
+                log("info",
+                    "No local changes detected. Pulling latest changes...")
+                run_git(pull_command)
+                log("info", "Repository successfully pulled.")
+
+        if tag:
+            checkout = "tags/" + tag
+
+        # Checkout to a specific branch or commit if --checkout is provided
+        if checkout or tag:
+            log("info", f"Checking out to {checkout} in {repo_path}...")
+            run_git(['git', '-C', repo_path, 'checkout', checkout])
+
+        if not scripts:
+            # a sparse repo selects its scripts again on every pull
+            r = subprocess.run(['git', '-C', repo_path, 'config', '--get', repo_sparse.CONFIG_KEY],
+                               capture_output=True, text=True)
+            scripts = r.stdout.strip()
+        if scripts:
+            # the meta files of all the scripts are checked out first to
+            # select the scripts
+            run_git(['git', '-C', repo_path, 'sparse-checkout', 'set', '--no-cone'] +
+                    repo_sparse.meta_patterns())
+            names = repo_sparse.select_scripts(repo_path, scripts)
+            if not names:
+                log("warning",
+                    f"No script in {repo_path} matches {scripts}")
+            else:
+                log("info",
+                    f"Checking out {len(names)} script(s) matching {scripts}")
+            run_git(['git', '-C', repo_path, 'sparse-checkout', 'set', '--no-cone'] +
+                    repo_sparse.script_patterns(names))
+            run_git(['git', '-C', repo_path, 'config',
+                    repo_sparse.CONFIG_KEY, scripts])
+
+        return {"return": 0}
+
+    def _load_pulled_meta(self, repo_path):
+        """
+        Return the meta of a pulled repo (with its path), None if it has no
+        meta.yaml.
+        """
+        meta_file_path = os.path.join(repo_path, 'meta.yaml')
+        if not os.path.exists(meta_file_path):
+            logger.warning(
+                f"meta.yaml not found in {repo_path}. Repo pulled but not registered in MLC repos. Skipping...")
+            return {"return": 0, "meta": None}
+
+        try:
+            with open(meta_file_path, 'r') as meta_file:
+                meta_data = yaml.safe_load(meta_file)
+                meta_data["path"] = repo_path
+        except yaml.YAMLError as e:
+            logger.error(f"Error loading YAML configuration: {e}")
+            return {"return": 1,
+                    "error": f"Syntax error in {meta_file_path}: {e}"}
 
-            if tag:
-                checkout = "tags/" + tag
+        return {"return": 0, "meta": meta_data}
 
-            # Checkout to a specific branch or commit if --checkout is provided
-            if checkout or tag:
-                logger.info(f"Checking out to {checkout} in {repo_path}...")
-                subprocess.run(
-                    ['git', '-C', repo_path, 'checkout', checkout], check=True)
+    def pull_repo(self, repo_url, branch=None, checkout=None, tag=None,
+                  pat=None, ssh=None, ignore_on_conflict=False, repo_path=None, force=False,
+                  depth=None, clone_filter=None, scripts=None, mirror=None, worktree=False,
+                  snapshot=None, immutable=False):
+
+        # Determine the checkout path from environment or default
+        repo_base_path = self.repos_path  # either the value will be from 'MLC_REPOS'
+        # Ensure the directory exists
+        os.makedirs(repo_base_path, exist_ok=True)
+
+        res = self._resolve_repo(repo_url, pat, ssh, repo_path)
+        if res["return"] > 0:
+            return res
+        repo_url = res['url']
+        repo_path = res['path']
+
+        try:
+            if worktree:
+                if not branch:
+                    return {'return': 1,
+                            'error': "--worktree requires --branch"}
+                if snapshot:
+                    return {'return': 1,
+                            'error': "--worktree and --snapshot can not be used together"}
+                res = self._fetch_worktree(
+                    repo_url, repo_path, branch, force,
+                    depth=depth, clone_filter=clone_filter, mirror=mirror)
+                if res['return'] > 0 or res.get('warning'):
+                    return res
+                repo_path = res['path']
+            else:
+                res = self._fetch_repo(
+                    repo_url, repo_path, branch, checkout, tag, force,
+                    depth=depth, clone_filter=clone_filter, scripts=scripts,
+                    mirror=mirror, snapshot=snapshot)
+                if res['return'] > 0 or res.get('warning'):
+                    return res
 
             # if not tag:
             #    subprocess.run(['git', '-C', repo_path, 'pull'], check=True)
@@ -512,25 +683,17 @@ class RepoAction(Action):
             logger.info("Registering the repo in repos.json")
 
             # check the meta file to obtain uids
-            meta_file_path = os.path.join(repo_path, 'meta.yaml')
-            if not os.path.exists(meta_file_path):
-                logger.warning(
-                    f"meta.yaml not found in {repo_path}. Repo pulled but not registered in MLC repos. Skipping...")
-                return {"return": 0}
+            res = self._load_pulled_meta(repo_path)
+            if res['return'] > 0 or not res['meta']:
+                return res
 
-            try:
-                with open(meta_file_path, 'r') as meta_file:
-                    meta_data = yaml.safe_load(meta_file)
-                    meta_data["path"] = repo_path
-            except yaml.YAMLError as e:
-                logger.error(f"Error loading YAML configuration: {e}")
-                return {"return": 1,
-                        "error": f"Syntax error in {meta_file_path}: {e}"}
-
-            r = self.register_repo(repo_path, meta_data, ignore_on_conflict)
+            r = self.register_repo(repo_path, res['meta'], ignore_on_conflict)
             if r['return'] > 0:
                 return r
 
+            if (tag or immutable) and not snapshot:
+                self._mark_immutable(repo_path)
+
             return {"return": 0}
 
         except subprocess.CalledProcessError as e:
@@ -539,6 +702,170 @@ class RepoAction(Action):
             return {'return': 1,
                     'error': f"Error pulling repository: {str(e)}"}
 
+    def _mark_immutable(self, repo_path):
+        """
+        Mark a pulled repo without local changes as immutable at its HEAD, so
+        that its meta files are not checked for changes until HEAD moves.
+        """
+        head = gitmeta.read_head(repo_path)
+        if not head or not head['commit']:
+            return
+        if gitmeta.get_local_changes(repo_path, untracked=True) != "":
+            logger.warning(
+                f"{repo_path} has local changes, it is not marked as immutable")
+            return
+        Action.get_index(self).set_repo_immutable(repo_path, head['commit'])
+        logger.info(
+            f"{repo_path} is immutable at {head['commit'][:7]}, its index is trusted until its HEAD changes")
+
+    def _fetch_worktree(self, repo_url, repo_path, branch, force=False,
+                        depth=None, clone_filter=None, mirror=None):
+        """
+        Check out a branch of a repo as a git worktree next to the repo
+        (<repo folder>+<branch>), sharing its object store. The repo is cloned
+        first if needed, and an existing worktree is pulled.
+
+        Returns:
+            dict: return code and the path of the worktree.
+        """
+        if not os.path.exists(repo_path):
+            res = self._fetch_repo(repo_url, repo_path, depth=depth,
+                                   clone_filter=clone_filter, mirror=mirror)
+            if res['return'] > 0:
+                return res
+
+        worktree_path = get_worktree_path(repo_path, branch)
+        if os.path.exists(worktree_path):
+            res = self._fetch_repo(repo_url, worktree_path, force=force)
+            return {**res, 'path': worktree_path}
+
+        logger.info(
+            f"Adding a worktree of {repo_path} for the branch {branch} at {worktree_path}...")
+        # an explicit refspec also works for single-branch (shallow) clones
+        subprocess.run(['git', '-C', repo_path, 'fetch', 'origin',
+                        f"+refs/heads/{branch}:refs/remotes/origin/{branch}"], check=True)
+        subprocess.run(['git', '-C', repo_path, 'worktree', 'add',
+                        worktree_path, branch], check=True)
+        return {'return': 0, 'path': worktree_path}
+
+    def pull_repos(self, repos, force=False, max_workers=None):
+        """
+        Pull several repos and their deps concurrently.
+
+        Git operations run in a thread pool, one wave per level of repo deps.
+        A dep shared by several repos is pulled once. The output of every repo
+        is printed as one block when its git operations finish, and the repos
+        are registered one after the other at the end, deps first.
+
+        Args:
+            repos (list): Dicts with the url of each repo and optionally its
+                          branch, checkout, tag, pat, ssh, repo_path,
+                          ignore_on_conflict, depth, filter, scripts,
+                          mirror, snapshot and immutable.
+            force (bool): Stash local changes of existing repos around the pull.
+            max_workers (int, optional): Number of concurrent git operations.
+
+        Returns:
+            dict: return code and the paths of the pulled repos (list).
+        """
+        os.makedirs(self.repos_path, exist_ok=True)
+        registered = {repo.path for repo in self.repos}
+
+        planned = set()
+        pulled = []  # (spec, meta) in the order the pulls finished
+        errors = []
+        warnings = []
+        wave = repos
+        while wave:
+            specs = []
+            for spec in wave:
+                res = self._resolve_repo(spec['url'], spec.get('pat'),
+                                         spec.get('ssh'), spec.get('repo_path'))
+                if res['return'] > 0:
+                    errors.append(f"{spec['url']}: {res['error']}")
+                    continue
+                if res['path'] in planned:
+                    continue  # shared dep
+                planned.add(res['path'])
+                specs.append({**spec, 'url': res['url'],
+                              'repo_path': res['path']})
+
+            next_wave = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+                for spec in specs:
+                    output = []
+                    future = executor.submit(
+                        self._fetch_repo, spec['url'], spec['repo_path'],
+                        branch=spec.get('branch'), checkout=spec.get('checkout'),
+                        tag=spec.get('tag'), force=force, output=output,
+                        depth=spec.get('depth'), clone_filter=spec.get('filter'),
+                        scripts=spec.get('scripts'), mirror=spec.get('mirror'),
+                        snapshot=spec.get('snapshot'))
+                    futures[future] = (spec, output)
+
+                for future in as_completed(futures):
+                    spec, output = futures[future]
+                    logger.info(f"{spec['repo_path']}:")
+                    for text in output:
+                        print(f"  {text}".replace("\n", "\n  "))
+                    try:
+                        res = future.result()
+                    except subprocess.CalledProcessError as e:
+                        res = {
+                            'return': 1,
+                            'error': f"Git command failed: {e}"}
+                    except Exception as e:
+                        # e.g. git missing or a lock timeout: the other repos
+                        # are still registered
+                        res = {'return': 1, 'error': str(e)}
+                    if res['return'] > 0:
+                        errors.append(f"{spec['repo_path']}: {res['error']}")
+                        continue
+                    if res.get('warning'):
+                        warnings.append(res['warning'])
+                        continue
+
+                    res = self._load_pulled_meta(spec['repo_path'])
+                    if res['return'] > 0:
+                        errors.append(f"{spec['repo_path']}: {res['error']}")
+                        continue
+                    if not res['meta']:
+                        continue
+                    meta = res['meta']
+                    pulled.append((spec, meta))
+
+                    # deps of a repo which is already registered are not
+                    # pulled again, as for a single pull
+                    if spec['repo_path'] not in registered:
+                        for dep in meta.get('deps', []):
+                            next_wave.append({
+                                'url': dep['url'],
+                                'branch': dep.get('branch'),
+                                'checkout': dep.get('checkout'),
+                                'ignore_on_conflict': dep.get('is_alias_okay', True)
+                            })
+            wave = next_wave
+
+        # registration updates repos.json and the index, so it is serialized
+        logger.info("Registering the repos in repos.json")
+        for spec, meta in reversed(pulled):
+            r = self.register_repo(spec['repo_path'], meta,
+                                   spec.get('ignore_on_conflict'), pull_deps=False)
+            if r['return'] > 0:
+                errors.append(f"{spec['repo_path']}: {r['error']}")
+            elif (spec.get('tag') or spec.get('immutable')) and not spec.get('snapshot'):
+                self._mark_immutable(spec['repo_path'])
+
+        paths = [spec['repo_path'] for spec, _ in pulled]
+        if errors:
+            return {'return': 1, 'list': paths,
+                    'error': f"Failed to pull {len(errors)} repo(s):\n" + "\n".join(errors)}
+        r = {'return': 0, 'list': paths}
+        if warnings:
+            r['warnings'] = warnings
+        return r
+
     def pull(self, run_args):
         """
     ####################################################################################################################
@@ -562,6 +889,32 @@ class RepoAction(Action):
     - `--tag <release_tag>`: Checks out a particular release tag.
     - `--pat <access_token>` or `--ssh`: Clones a private repository using a personal access token or SSH.
     - `--force`: For existing repositories with local tracked changes, stashes changes before pull and reapplies them after pull.
+    - `--all`: Pulls all the registered repositories (also the default when no repository is given).
+    - `--jobs <number>`: Number of repositories pulled concurrently when several repositories are pulled.
+    - `--depth <number>`: Makes a shallow clone (and keeps later pulls shallow) with the given history depth.
+    - `--filter blob:none`: Makes a partial clone, file contents are only downloaded when checked out.
+    - `--scripts <tag_expression>`: Checks out only the script folders matching the expression, the scripts they
+      depend on and the `automation` folder. Groups separated by `;` are alternatives, the comma-separated tags of a
+      group must all match (e.g. `get,python;detect-os`). The selection is applied again on later pulls.
+    - `--worktree`: With `--branch`, checks out the branch as a git worktree in its own folder
+      (`<repo folder>+<branch>`) sharing the object store of the repository, and makes it the active checkout of the
+      repository (see `mlc switch repo`).
+    - `--mirror`: Keeps a bare mirror of the repository in the `.mirrors` folder of the MLC repos directory and clones
+      new copies with `--reference <mirror> --dissociate`, so that only new objects are transferred. Setting
+      `MLC_REPO_MIRRORS=yes` enables it for all the clones.
+    - `--snapshot <ref>`: Downloads the tree of the repository at a branch, tag or commit as an archive instead of
+      cloning it (no git history). The archive URL is built from the `MLC_REPO_SNAPSHOT_URL` template with the
+      `{owner}`, `{name}` and `{ref}` fields (default: GitHub codeload). Archives are kept in the `.snapshots` folder of
+      the MLC repos directory by commit, and later pulls of the repository replace the snapshot with the new one of
+      the same ref.
+    - `--immutable`: Marks the repository as immutable at its current commit (done automatically with `--tag` when
+      there are no local changes): its scripts are not checked for changes when the index is updated, until the HEAD
+      of the repository changes.
+
+    Several repositories can be pulled at once by giving a comma-separated list, e.g.
+    `mlc pull repo mlcommons@mlperf-automations,mlcommons@inference`. Git operations then run concurrently,
+    shared repo dependencies are pulled once, the output of each repository is printed as one block and the
+    repositories are registered together at the end.
 
     Example Output:
 
@@ -586,15 +939,19 @@ class RepoAction(Action):
 
         """
         repo_url = run_args.get('repo', run_args.get('url', 'repo'))
-        if not repo_url or repo_url == "repo":
+        force = run_args.get('force')
+        jobs = int(run_args['jobs']) if run_args.get('jobs') else None
+        if run_args.get('all') or not repo_url or repo_url == "repo":
+            repos = []
             for repo_object in self.repos:
-                if os.path.exists(os.path.join(repo_object.path, ".git")) and os.access(
-                        repo_object.path, os.W_OK):
+                if (os.path.exists(os.path.join(repo_object.path, ".git")) or repo_snapshot.read_marker(
+                        repo_object.path)) and os.access(repo_object.path, os.W_OK):
                     repo_folder_name = os.path.basename(repo_object.path)
-                    res = self.pull_repo(
-                        repo_folder_name, repo_path=repo_object.path, force=run_args.get('force'))
-                    if res['return'] > 0:
-                        return res
+                    repos.append({'url': repo_folder_name,
+                                  'repo_path': repo_object.path})
+            res = self.pull_repos(repos, force=force, max_workers=jobs)
+            if res['return'] > 0:
+                return res
         else:
             branch = run_args.get('branch')
             checkout = run_args.get('checkout')
@@ -602,13 +959,36 @@ class RepoAction(Action):
 
             pat = run_args.get('pat')
             ssh = run_args.get('ssh')
-            force = run_args.get('force')
             ignore_on_conflict = run_args.get('ignore_on_conflict')
+            depth = run_args.get('depth')
+            clone_filter = run_args.get('filter')
+            scripts = run_args.get('scripts')
+            mirror = run_args.get('mirror')
+            worktree = run_args.get('worktree')
+            snapshot = run_args.get('snapshot')
+            immutable = run_args.get('immutable')
 
             if sum(bool(var) for var in [branch, checkout, tag]) > 1:
                 return {
                     "return": 1, "error": "Only one among the three flags(branch, checkout and tag) could be specified"}
 
+            repo_urls = [url.strip()
+                         for url in repo_url.split(",") if url.strip()]
+            if len(repo_urls) > 1:
+                if worktree:
+                    return {
+                        "return": 1, "error": "--worktree is supported for a single repo"}
+                res = self.pull_repos(
+                    [{'url': url, 'branch': branch, 'checkout': checkout, 'tag': tag,
+                      'pat': pat, 'ssh': ssh, 'ignore_on_conflict': ignore_on_conflict,
+                      'depth': depth, 'filter': clone_filter, 'scripts': scripts,
+                      'mirror': mirror, 'snapshot': snapshot, 'immutable': immutable}
+                     for url in repo_urls],
+                    force=force, max_workers=jobs)
+                if res['return'] > 0:
+                    return res
+                return {'return': 0}
+
             res = self.pull_repo(
                 repo_url,
                 branch,
@@ -617,12 +997,140 @@ class RepoAction(Action):
                 pat,
                 ssh,
                 ignore_on_conflict=ignore_on_conflict,
-                force=force)
+                force=force,
+                depth=depth,
+                clone_filter=clone_filter,
+                scripts=scripts,
+                mirror=mirror,
+                worktree=worktree,
+                snapshot=snapshot,
+                immutable=immutable)
             if res['return'] > 0:
                 return res
 
         return {'return': 0}
 
+    def switch(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Repo
+    Action: Switch
+    ####################################################################################################################
+
+    The `switch` action makes another checkout of a registered repository the active one: the worktree of a branch
+    created with `mlc pull repo <repo> --branch=<branch> --worktree`, or the main checkout if no branch is given.
+    The index entries of every checkout are kept aside while it is inactive, so switching back and forth only reads
+    the scripts which changed.
+
+    Example Command:
+
+    mlc switch repo mlcommons@mlperf-automations --branch=dev
+    mlc switch repo mlcommons@mlperf-automations
+
+        """
+        if not run_args.get('repo'):
+            return {"return": 1,
+                    "error": "The repository to be switched is not specified"}
+
+        r = self.find(run_args)
+        if r['return'] > 0:
+            return r
+        if len(r['list']) > 1:
+            return {
+                "return": 1, "error": "Please select a unique repo by repo alias or repo UID to switch"}
+        current_path = r['list'][0].path
+
+        main_path = get_main_worktree(current_path)
+        if not main_path:
+            return {'return': 1,
+                    'error': f"{current_path} is not a git repository"}
+        branch = run_args.get('branch')
+        repo_path = get_worktree_path(
+            main_path, branch) if branch else main_path
+        if not os.path.isdir(repo_path):
+            return {'return': 1,
+                    'error': f"No checkout of the branch {branch} at {repo_path}. Create it with `mlc pull repo {os.path.basename(main_path)} --branch={branch} --worktree`"}
+        if repo_path == current_path:
+            logger.info(f"{repo_path} is already the active checkout")
+            return {'return': 0}
+
+        res = self._load_pulled_meta(repo_path)
+        if res['return'] > 0 or not res['meta']:
+            return res
+        return self.register_repo(repo_path, res['meta'])
+
+    def status(self, run_args):
+        """
+    ####################################################################################################################
+    Target: Repo
+    Action: Status
+    ####################################################################################################################
+
+    The `status` action reports the state of the registered repositories (or of the given one): branch, commit,
+    tracked local changes, commits ahead/behind the upstream branch and the meta files which failed validation.
+
+    The git state is read from the `.git` folders, the git status calls run in parallel, and the meta validation
+    results are the ones recorded by the index, so only changed meta files are validated again. The upstream
+    comparison uses the last fetched state of the remote unless `--remote` is given.
+
+    Options:
+    - `--json`: Prints the report as JSON.
+    - `--remote`: Fetches from the remotes first.
+    - `--jobs <number>`: Number of repositories checked concurrently.
+
+    Example Command:
+
+    mlc status repo
+    mlc status repo mlcommons@mlperf-automations --remote --json
+
+        """
+        if run_args.get('repo'):
+            r = self.find(run_args)
+            if r['return'] > 0:
+                return r
+            repos = r['list']
+        else:
+            repos = RepoRegistry.get(self.repos_path).get_repos()
+
+        jobs = int(run_args['jobs']) if run_args.get('jobs') else None
+        remote = bool(run_args.get('remote'))
+        git_status = {s['path']: s for s in gitmeta.get_repos_status(
+            [repo.path for repo in repos], timeout=60 if remote else 10,
+            max_workers=jobs, fetch=remote)}
+        index = Action.get_index(self)
+
+        report = []
+        for repo in repos:
+            status = git_status.get(repo.path)
+            marker = None if status else repo_snapshot.read_marker(repo.path)
+            meta_errors = {os.path.relpath(path, repo.path): errors
+                           for path, errors in index.get_meta_errors(repo.path).items()}
+            missing = [key for key in ['uid', 'alias']
+                       if not (repo.meta or {}).get(key)]
+            if missing:
+                meta_errors['meta.yaml'] = [
+                    f"Missing {key}" for key in missing]
+            report.append({
+                'alias': (repo.meta or {}).get('alias'),
+                'path': repo.path,
+                'type': 'git' if status else 'snapshot' if marker else 'folder',
+                'branch': status['branch'] if status else (marker or {}).get('ref'),
+                'commit': status['commit'] if status else (marker or {}).get('commit'),
+                'dirty': status['dirty'] if status else None,
+                'upstream': status['upstream'] if status else None,
+                'ahead': status['ahead'] if status else None,
+                'behind': status['behind'] if status else None,
+                'immutable': bool(index.repo_state.get(repo.path, {}).get('immutable')),
+                'meta_errors': meta_errors
+            })
+
+        if run_args.get('json'):
+            utils.print_formatted_json(report, sort_keys=False)
+        else:
+            print_status_table(report)
+
+        return {'return': 0, 'list': report}
+
     def show(self, run_args):
         return self.list(run_args)
 
@@ -727,6 +1235,45 @@ class RepoAction(Action):
         return rm_repo(repo_path, repos_file_path, force_remove)
 
 
+def get_worktree_path(repo_path, branch):
+    """
+    Return the folder of the worktree of a branch of a repo.
+    """
+    return repo_path + "+" + re.sub(r"[^\w.-]", "-", branch)
+
+
+def _git_common_dir(path):
+    dirs = gitmeta.find_git_dir(path)
+    return os.path.realpath(dirs[1]) if dirs else None
+
+
+def get_main_worktree(path):
+    """
+    Return the main checkout of the repo of a checkout (the checkout itself if
+    it is not a worktree), None if it is not a git repo.
+    """
+    common_dir = _git_common_dir(path)
+    if not common_dir or os.path.basename(common_dir) != ".git":
+        return None
+    main_path = os.path.dirname(common_dir)
+    # keep the form of the path used in repos.json
+    candidate = os.path.join(os.path.dirname(
+        path), os.path.basename(main_path))
+    if os.path.realpath(candidate) == main_path:
+        return candidate
+    return main_path
+
+
+def is_alternate(path, other_path):
+    """
+    Return True if two folders are checkouts (worktrees) of the same git repo.
+    """
+    if not os.path.isdir(path) or not os.path.isdir(other_path):
+        return False
+    common_dir = _git_common_dir(path)
+    return common_dir is not None and common_dir == _git_common_dir(other_path)
+
+
 def rm_repo(repo_path, repos_file_path, force_remove):
     logger.info(
         "rm command has been called for repo. This would delete the repo folder and unregister the repo from repos.json")
@@ -738,20 +1285,12 @@ def rm_repo(repo_path, repos_file_path, force_remove):
     if os.path.isdir(repo_path) and os.path.samefile(
             mlc_repos_path, repo_parent_path):
         # Check for local changes
-        status_command = [
-            'git',
-            '-C',
-            repo_path,
-            'status',
-            '--porcelain',
-            '--untracked-files=no']
-        local_changes = subprocess.run(
-            status_command, capture_output=True, text=True)
-
-        if local_changes.stdout:
+        local_changes = gitmeta.get_local_changes(repo_path)
+
+        if local_changes:
             logger.warning(
                 "Local changes detected in repository. Changes are listed below:")
-            print(local_changes.stdout)
+            print(local_changes)
             confirm_remove = True if force_remove or (
                 input("Continue to remove repo?").lower()) in [
                 "yes", "y"] else False
@@ -781,16 +1320,54 @@ def rm_repo(repo_path, repos_file_path, force_remove):
 def unregister_repo(repo_path, repos_file_path):
     logger.info(f"Unregistering the repo in path {repo_path}")
 
-    with open(repos_file_path, 'r') as f:
-        repos_list = json.load(f)
+    removed = []
+
+    def remove_path(repos_list):
+        if repo_path not in repos_list:
+            return None
+        removed.append(repo_path)
+        return [path for path in repos_list if path != repo_path]
 
-    if repo_path in repos_list:
-        repos_list.remove(repo_path)
-        with open(repos_file_path, 'w') as f:
-            json.dump(repos_list, f, indent=2)
+    update_repos_file(repos_file_path, remove_path)
+    if removed:
         logger.info(f"Path: {repo_path} has been removed.")
     else:
         logger.info(
             f"Path: {repo_path} not found in {repos_file_path}. Nothing to be unregistered!")
 
     return {'return': 0}
+
+
+def print_status_table(report):
+    """
+    Print the repo status report of RepoAction.status as a table.
+    """
+    rows = [("REPO", "BRANCH", "COMMIT", "CHANGES", "UPSTREAM", "METAS")]
+    for entry in report:
+        if entry['type'] != 'git':
+            changes = entry['type']
+        elif entry['dirty'] is None:
+            changes = "unknown"
+        else:
+            changes = "modified" if entry['dirty'] else "clean"
+        if entry['immutable']:
+            changes += " (immutable)"
+        if entry['upstream'] and entry['ahead'] is not None:
+            upstream = f"+{entry['ahead']}/-{entry['behind']}"
+        else:
+            upstream = "-"
+        errors = sum(len(e) for e in entry['meta_errors'].values())
+        rows.append((os.path.basename(entry['path']), entry['branch'] or "-",
+                     (entry['commit'] or "-")[:7], changes, upstream,
+                     f"{errors} error(s)" if errors else "ok"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(value.ljust(width)
+              for value, width in zip(row, widths)).rstrip())
+
+    for entry in report:
+        for path, errors in entry['meta_errors'].items():
+            for error in errors:
+                logger.warning(
+                    f"{os.path.join(entry['path'], path)}: {error}")
@@ -0,0 +1,88 @@
+import os
+import re
+import base64
+import hashlib
+from urllib.parse import urlparse, unquote
+from filelock import FileLock
+
+from . import utils
+from .logger import logger
+
+
+# Bare mirrors of the pulled repos are kept in <repos_path>/.mirrors when
+# MLC_REPO_MIRRORS=yes (or --mirror is given). A new clone first brings the
+# mirror up to date with `git fetch` and then borrows its objects with
+# `git clone --reference <mirror> --dissociate`, so repeated clones on the same
+# host only transfer new objects while every clone stays self-contained.
+# Mirrors are shared by all the clones of a repo, so their remote URL never
+# holds credentials: those of the pulled URL (e.g. a PAT) are only passed to
+# the git command updating the mirror.
+MIRRORS_DIR = ".mirrors"
+
+
+def mirrors_enabled(flag=None):
+    if flag:
+        return True
+    return os.environ.get('MLC_REPO_MIRRORS', '').strip().lower() in [
+        "yes", "on", "true", "1"]
+
+
+def _mirror_key(url):
+    """
+    Return the identity of a repo URL, without credentials (e.g. a PAT).
+    """
+    url = utils.strip_url_credentials(url)
+    if url.endswith(".git"):
+        url = url[:-len(".git")]
+    return url.rstrip("/")
+
+
+def get_mirror_path(repos_path, url):
+    key = _mirror_key(url)
+    name = re.sub(r"[^\w@.-]", "_", key.split("/")[-1].split(":")[-1])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(repos_path, MIRRORS_DIR, f"{name}-{digest}.git")
+
+
+def _auth_options(url):
+    """
+    Return the git options sending the credentials of an http(s) URL as an
+    HTTP header, without storing them in the repo config.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ["http", "https"] or not parsed.username:
+        return []
+    credentials = f"{unquote(parsed.username)}:{unquote(parsed.password or '')}"
+    token = base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    return ['-c', f"http.extraHeader=Authorization: Basic {token}"]
+
+
+def update_mirror(repos_path, url, run_git):
+    """
+    Create the bare mirror of a repo or fetch its new objects.
+
+    Args:
+        run_git (callable): Runs a git command (list), raising
+                            subprocess.CalledProcessError on failure.
+
+    Returns:
+        str: Path of the mirror.
+    """
+    mirror_path = get_mirror_path(repos_path, url)
+    os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+    public_url = utils.strip_url_credentials(url)
+    auth = _auth_options(url)
+    # concurrent clones of the same repo share the mirror
+    with FileLock(mirror_path + ".lock"):
+        if os.path.isdir(mirror_path):
+            logger.debug(f"Updating the mirror {mirror_path}")
+            # mirrors created before may still hold credentials
+            run_git(['git', '-C', mirror_path, 'remote',
+                    'set-url', 'origin', public_url])
+            run_git(['git', *auth, '-C', mirror_path,
+                    'fetch', '--prune', '--quiet'])
+        else:
+            logger.debug(f"Creating the mirror {mirror_path}")
+            run_git(['git', *auth, 'clone', '--mirror',
+                    '--quiet', public_url, mirror_path])
+    return mirror_path
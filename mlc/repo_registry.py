@@ -0,0 +1,223 @@
+import os
+import json
+import uuid
+import threading
+import yaml
+from filelock import FileLock
+
+from .logger import logger
+from .repo import Repo
+
+
+# The registered repos (repos.json and the meta.yaml of every repo) are loaded
+# once per process and shared by all the actions. A registry is reloaded only
+# when repos.json changes on disk, and only the metas which changed are parsed
+# again. repos.json is updated under a lock by re-reading it, applying the
+# change and atomically replacing the file, so that concurrent updates (e.g.
+# two `mlc pull repo` running at once) are not lost.
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def update_repos_file(repos_file_path, update):
+    """
+    Update repos.json atomically.
+
+    Args:
+        repos_file_path (str): Path of repos.json.
+        update (callable): Called with the current list of repo paths; returns
+                           the new list or None to leave the file unchanged.
+
+    Returns:
+        list: The repo paths in repos.json after the update.
+    """
+    with FileLock(repos_file_path + ".lock"):
+        try:
+            with open(repos_file_path, 'r') as f:
+                repos_list = json.load(f)
+        except FileNotFoundError:
+            repos_list = []
+
+        new_list = update(list(repos_list))
+        if new_list is None or new_list == repos_list:
+            return repos_list
+
+        tmp_file = f"{repos_file_path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(new_list, f, indent=2)
+            os.replace(tmp_file, repos_file_path)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        logger.info(f"Updated repos.json at {repos_file_path}")
+        return new_list
+
+
+class RepoRegistry:
+    """
+    In-memory view of the registered repos with lookups by uid, alias, folder
+    name and path.
+    """
+    _registries = {}
+    _registries_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, repos_path):
+        """
+        Return the registry of a repos folder, shared within the process.
+        """
+        key = os.path.abspath(repos_path)
+        with cls._registries_lock:
+            registry = cls._registries.get(key)
+            if registry is None:
+                registry = cls._registries[key] = cls(repos_path)
+        return registry
+
+    def __init__(self, repos_path):
+        self.repos_path = repos_path
+        self.repos_file_path = os.path.join(repos_path, 'repos.json')
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._metas = {}  # meta.yaml path -> (stamp, meta)
+        self.repos = []
+        self.by_uid = {}
+        self.by_alias = {}
+        self.by_folder = {}
+        self.by_path = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._stamp = None
+
+    def get_repos(self):
+        """
+        Return the registered repos, reloading them if repos.json changed.
+        """
+        with self._lock:
+            if self._stamp is None or self._stamp != _file_stamp(
+                    self.repos_file_path):
+                self._load()
+            return list(self.repos)
+
+    def find(self, uid=None, alias=None):
+        """
+        Return the repos with the given uid or alias, in registration order.
+        """
+        self.get_repos()
+        found = []
+        if uid and uid in self.by_uid:
+            found.append(self.by_uid[uid])
+        for repo in self.by_alias.get(alias, []) if alias else []:
+            if repo not in found:
+                found.append(repo)
+        return sorted(found, key=self.repos.index)
+
+    def find_by_folder(self, name):
+        self.get_repos()
+        return self.by_folder.get(name)
+
+    def find_by_path(self, path):
+        self.get_repos()
+        return self.by_path.get(path)
+
+    def update(self, update):
+        """
+        Update repos.json atomically (see update_repos_file) and reload.
+        """
+        with self._lock:
+            paths = update_repos_file(self.repos_file_path, update)
+            self._stamp = None
+        return paths
+
+    def _load_meta(self, meta_yaml_path):
+        stamp = _file_stamp(meta_yaml_path)
+        cached = self._metas.get(meta_yaml_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        try:
+            with open(meta_yaml_path, 'r') as yaml_file:
+                meta = yaml.safe_load(yaml_file)
+        except yaml.YAMLError as e:
+            logger.error(f"Error loading YAML in {meta_yaml_path}: {e}")
+            return None
+        self._metas[meta_yaml_path] = (stamp, meta)
+        return meta
+
+    def _load(self):
+        stamp = _file_stamp(self.repos_file_path)
+        self.repos = []
+        try:
+            # Load and parse the JSON file containing the list of repository
+            # paths
+            with open(self.repos_file_path, 'r') as file:
+                repo_paths = json.load(file)  # Load the JSON file into a list
+        except json.JSONDecodeError as e:
+            logger.error(f"Error decoding JSON: {e}")
+            repo_paths = []
+        except FileNotFoundError:
+            logger.error(f"Error: File {self.repos_file_path} not found.")
+            repo_paths = []
+        except Exception as e:
+            logger.error(f"Error reading file: {e}")
+            repo_paths = []
+
+        # Iterate through the list of repository paths
+        for repo_path in repo_paths:
+            if not os.path.exists(repo_path):
+                # the repos folder may have been moved or mounted elsewhere
+                moved_path = os.path.join(
+                    self.repos_path, os.path.basename(repo_path.rstrip("/\\")))
+                if os.path.isfile(os.path.join(moved_path, "meta.yaml")):
+                    logger.warning(
+                        f"{repo_path} not found, using {moved_path}. Run `mlc relocate` to update the stored paths")
+                    repo_path = moved_path
+            if not os.path.exists(repo_path):
+                logger.warning(
+                    f"""Warning: {repo_path} not found. Considering it as a corrupt entry and deleting from repos.json...""")
+                from .repo_action import rm_repo
+                res = rm_repo(repo_path, self.repos_file_path, True)
+                if res["return"] > 0:
+                    logger.error(res['error'])
+                # repos.json was rewritten by this process
+                stamp = _file_stamp(self.repos_file_path)
+                continue
+
+            repo_path = repo_path.strip()  # Remove any extra whitespace or newlines
+
+            # Skip empty lines
+            if not repo_path:
+                continue
+
+            meta_yaml_path = os.path.join(repo_path, "meta.yaml")
+
+            # Check if meta.yaml exists
+            if not os.path.isfile(meta_yaml_path):
+                logger.warning(
+                    f"{meta_yaml_path} not found. Could be due to accidental deletion of meta.yaml. Try to stash the changes or reclone by doing `rm repo` and `pull repo`. Skipping...")
+                continue
+
+            meta = self._load_meta(meta_yaml_path)
+            if meta is None:
+                continue
+            # Create a Repo object and add it to the list
+            self.repos.append(Repo(path=repo_path, meta=meta))
+
+        self.by_uid = {}
+        self.by_alias = {}
+        self.by_folder = {}
+        self.by_path = {}
+        for repo in self.repos:
+            uid = repo.meta.get('uid')
+            if uid:
+                self.by_uid.setdefault(uid, repo)
+            self.by_alias.setdefault(repo.meta.get('alias'), []).append(repo)
+            self.by_folder.setdefault(os.path.basename(repo.path), repo)
+            self.by_path[repo.path] = repo
+        self._stamp = stamp
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import uuid
+import shutil
+import tarfile
+import subprocess
+from urllib.parse import urlparse, quote
+from filelock import FileLock
+
+from . import utils
+from .logger import logger
+
+
+# A repo pulled with --snapshot=<ref> is the extracted archive of its tree at
+# that ref, without git history, e.g. for CI and containers. The archive is
+# downloaded from MLC_REPO_SNAPSHOT_URL (GitHub codeload by default), a template
+# with the {owner}, {name} and {ref} fields of the repo, and kept in
+# <repos_path>/.snapshots by commit. The extracted tree holds a marker with the
+# url, ref and commit of the snapshot, so that later pulls of the repo download
+# the new snapshot of the same ref and swap it in place of the old one.
+SNAPSHOTS_DIR = ".snapshots"
+MARKER_FILE = ".mlc-snapshot.json"
+DEFAULT_URL_TEMPLATE = "https://codeload.github.com/{owner}/{name}/tar.gz/{ref}"
+
+
+def get_url_template():
+    return os.environ.get('MLC_REPO_SNAPSHOT_URL',
+                          '').strip() or DEFAULT_URL_TEMPLATE
+
+
+def read_marker(repo_path):
+    """
+    Return the snapshot marker of a repo folder, None if it is not a snapshot.
+    """
+    try:
+        with open(os.path.join(repo_path, MARKER_FILE), "r") as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return marker if isinstance(marker, dict) else None
+
+
+def get_snapshot_url(repo_url, ref, template=None):
+    path = urlparse(
+        repo_url).path if "://" in repo_url else repo_url.split(":")[-1]
+    parts = [p for p in path.rstrip("/").split("/") if p]
+    name = parts[-1][:-len(".git")
+                     ] if parts[-1].endswith(".git") else parts[-1]
+    owner = parts[-2] if len(parts) > 1 else ""
+    return (template or get_url_template()).format(
+        owner=owner, name=name, ref=quote(ref, safe="/"))
+
+
+def resolve_commit(repo_url, ref):
+    """
+    Return the commit of a ref of a remote repo (git ls-remote, which does not
+    fetch any object), None if it can not be resolved.
+    """
+    if re.fullmatch(r"[0-9a-f]{40}", ref):
+        return ref
+    try:
+        r = subprocess.run(['git', 'ls-remote', repo_url, ref],
+                           capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"git ls-remote failed for {repo_url}: {e}")
+        return None
+    if r.returncode != 0:
+        return None
+    refs = {}
+    for line in r.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            refs[parts[1]] = parts[0]
+    # the commit of an annotated tag is its peeled ref
+    for name in [f"refs/heads/{ref}", f"refs/tags/{ref}^{{}}",
+                 f"refs/tags/{ref}", ref]:
+        if name in refs:
+            return refs[name]
+    return None
+
+
+def _archive_commit(archive_file):
+    """
+    Return the commit recorded by git archive in the pax header of a tarball.
+    """
+    try:
+        with tarfile.open(archive_file, "r") as archive:
+            comment = archive.pax_headers.get("comment", "")
+    except (OSError, tarfile.TarError):
+        return None
+    return comment if re.fullmatch(r"[0-9a-f]{40}", comment) else None
+
+
+def _download(url, output_file, timeout=60):
+    import requests
+    tmp_file = f"{output_file}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as r:
+            r.raise_for_status()
+            with open(tmp_file, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+        os.replace(tmp_file, output_file)
+    except requests.RequestException as e:
+        return {'return': 1, 'error': f"Failed to download {url}: {e}"}
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return {'return': 0}
+
+
+def _swap(new_path, repo_path):
+    """
+    Put a folder in place of repo_path, which is only missing between two
+    renames.
+    """
+    if not os.path.exists(repo_path):
+        os.rename(new_path, repo_path)
+        return
+    old_path = f"{repo_path}.{uuid.uuid4().hex[:8]}.old"
+    os.rename(repo_path, old_path)
+    try:
+        os.rename(new_path, repo_path)
+    except OSError:
+        os.rename(old_path, repo_path)
+        raise
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def pull_snapshot(repos_path, repo_url, repo_path, ref, log=None):
+    """
+    Download and extract the snapshot of a repo at a ref, replacing the
+    previous snapshot in repo_path. Nothing is downloaded if the ref still
+    points to the commit of the current snapshot or if the archive of the
+    commit was downloaded before.
+
+    Args:
+        log (callable, optional): Called with a level and a message.
+
+    Returns:
+        dict: return code and the commit of the snapshot (None if unknown).
+    """
+    if log is None:
+        def log(level, message):
+            getattr(logger, level)(message)
+
+    marker = read_marker(repo_path)
+    if os.path.exists(repo_path) and marker is None:
+        return {'return': 1,
+                'error': f"{repo_path} exists and is not a snapshot. Remove it to pull a snapshot"}
+
+    snapshots_path = os.path.join(repos_path, SNAPSHOTS_DIR)
+    os.makedirs(snapshots_path, exist_ok=True)
+    name = os.path.basename(repo_path)
+    url = get_snapshot_url(repo_url, ref)
+
+    with FileLock(os.path.join(snapshots_path, name + ".lock")):
+        commit = resolve_commit(repo_url, ref)
+        if commit and marker and marker.get('commit') == commit:
+            log("info",
+                f"Snapshot {name} is up to date at {ref} ({commit[:7]})")
+            return {'return': 0, 'commit': commit}
+
+        archive_file = os.path.join(snapshots_path, f"{name}-{commit}.archive")
+        if not commit or not os.path.exists(archive_file):
+            log("info",
+                f"Downloading the snapshot of {repo_url} at {ref} from {url}...")
+            download_file = os.path.join(
+                snapshots_path, f"{name}.{uuid.uuid4().hex[:8]}.download")
+            res = _download(url, download_file)
+            if res['return'] > 0:
+                return res
+            if not commit:
+                commit = _archive_commit(download_file)
+            if commit:
+                os.replace(download_file, archive_file)
+            else:
+                # keyed by content if the commit is unknown
+                archive_file = os.path.join(
+                    snapshots_path, f"{name}-{utils.get_file_hash(download_file)[:40]}.archive")
+                os.replace(download_file, archive_file)
+        else:
+            log("info", f"Using the downloaded snapshot {archive_file}")
+
+        extract_path = f"{repo_path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            # archives hold the tree in a <name>-<ref> folder
+            utils.extract_file({'filename': archive_file, 'strip_folders': 1,
+                                'extract_to': extract_path})
+            with open(os.path.join(extract_path, MARKER_FILE), "w") as f:
+                json.dump({'url': utils.strip_url_credentials(repo_url), 'ref': ref, 'commit': commit,
+                           'archive': os.path.basename(archive_file)}, f, indent=2)
+            _swap(extract_path, repo_path)
+        except (OSError, ValueError, tarfile.TarError) as e:
+            # downloaded again by the next pull
+            os.remove(archive_file)
+            return {'return': 1,
+                    'error': f"Failed to extract {archive_file}: {e}"}
+        finally:
+            if os.path.exists(extract_path):
+                shutil.rmtree(extract_path, ignore_errors=True)
+
+    log("info", f"Snapshot {name} is at {ref}" +
+        (f" ({commit[:7]})" if commit else ""))
+    return {'return': 0, 'commit': commit}
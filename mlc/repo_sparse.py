@@ -0,0 +1,129 @@
+import os
+import json
+import yaml
+
+from .logger import logger
+
+
+# A repo pulled with --scripts=<tag-expr> is a sparse checkout holding the
+# top-level files, the automation folder and only the script folders matching
+# the expression together with the scripts they depend on. The expression is
+# kept in the git config of the repo (mlc.sparseScripts) so that later pulls
+# select the scripts again, e.g. to pick up new dependencies.
+CONFIG_KEY = "mlc.sparseScripts"
+
+# Script meta keys whose entries refer to other scripts by tags
+DEP_KEYS = ["deps", "prehook_deps", "posthook_deps", "post_deps"]
+
+
+def parse_tag_expr(expr):
+    """
+    Parse a script selection: groups separated by ";" or "|", each one a
+    comma-separated list of tags which must all match (-tag excludes a tag) or
+    a single script alias.
+
+    Returns:
+        list: (tags, excluded tags) of every group.
+    """
+    groups = []
+    for group in expr.replace("|", ";").split(";"):
+        tags = [tag.strip() for tag in group.split(",") if tag.strip()]
+        if tags:
+            groups.append(([t for t in tags if not t.startswith("-")],
+                           [t[1:] for t in tags if t.startswith("-")]))
+    return groups
+
+
+def _load_meta(script_path):
+    for name in ["meta.yaml", "meta.json"]:
+        meta_path = os.path.join(script_path, name)
+        if not os.path.isfile(meta_path):
+            continue
+        try:
+            with open(meta_path, "r") as f:
+                meta = yaml.safe_load(f) if name.endswith(
+                    ".yaml") else json.load(f)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            logger.warning(f"Failed to read {meta_path}: {e}")
+            return None
+        return meta if isinstance(meta, dict) else None
+    return None
+
+
+def _dep_tags(meta):
+    """
+    Yield the (non-variation) tags of the scripts a script depends on,
+    including the deps of its variations.
+    """
+    sections = [meta] + [v for v in (meta.get("variations") or {}).values()
+                         if isinstance(v, dict)]
+    for section in sections:
+        for key in DEP_KEYS:
+            deps = section.get(key) or []
+            if not isinstance(deps, list):
+                continue
+            for dep in deps:
+                if not isinstance(dep, dict) or not isinstance(
+                        dep.get("tags"), str):
+                    continue
+                tags = [t.strip() for t in dep["tags"].split(",")
+                        if t.strip() and not t.strip().startswith("_")]
+                if tags:
+                    yield tags
+
+
+def select_scripts(repo_path, expr):
+    """
+    Return the names of the script folders of a repo matching a script
+    selection, and of the scripts they depend on (transitively). Only the
+    meta files of the scripts need to be checked out.
+    """
+    script_root = os.path.join(repo_path, "script")
+    scripts = {}
+    if os.path.isdir(script_root):
+        for name in os.listdir(script_root):
+            meta = _load_meta(os.path.join(script_root, name))
+            if meta is not None:
+                scripts[name] = meta
+
+    def find(tags, excluded=()):
+        found = []
+        for name, meta in scripts.items():
+            script_tags = set(meta.get("tags") or [])
+            if len(tags) == 1 and not excluded and tags[0] in [
+                    name, meta.get("alias")]:
+                found.append(name)
+            elif set(tags).issubset(script_tags) and script_tags.isdisjoint(excluded):
+                found.append(name)
+        return found
+
+    selected = set()
+    pending = []
+    for tags, excluded in parse_tag_expr(expr):
+        pending += find(tags, excluded)
+    while pending:
+        name = pending.pop()
+        if name in selected:
+            continue
+        selected.add(name)
+        for tags in _dep_tags(scripts[name]):
+            pending += find(tags)
+    return sorted(selected)
+
+
+def meta_patterns():
+    """
+    Sparse-checkout patterns materializing only the meta files of the repo and
+    of its scripts.
+    """
+    return ["/meta.yaml", "/meta.json",
+            "/script/*/meta.yaml", "/script/*/meta.json"]
+
+
+def script_patterns(names):
+    """
+    Sparse-checkout patterns of the top-level files, the automation folder and
+    the given script folders.
+    """
+    return ["/*", "!/*/", "/automation/"] + \
+        [f"/script/{name}/" for name in names]
@@ -0,0 +1,108 @@
+import os
+import sys
+import shutil
+import uuid
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from . import cache_placement
+from .logger import logger
+
+
+# Removed items are first renamed into a trash folder, which is atomic and
+# fast, and deleted afterwards. A deletion interrupted midway is finished by
+# `mlc gc`.
+
+
+def get_trash_path(repos_path, item_path=None):
+    """
+    Return the trash folder for an item: the .trash folder of the extra cache
+    folder containing it (so that moving it to the trash is a rename on the
+    same device) or the .trash folder of the repos folder.
+    """
+    if item_path:
+        for root in cache_placement.get_extra_cache_roots(repos_path):
+            if item_path.startswith(os.path.join(root, "")):
+                return os.path.join(root, ".trash")
+    return os.path.join(repos_path, ".trash")
+
+
+def get_trash_paths(repos_path):
+    """
+    Return all the trash folders of a repos folder.
+    """
+    return [os.path.join(repos_path, ".trash")] + [
+        os.path.join(root, ".trash")
+        for root in cache_placement.get_extra_cache_roots(repos_path)]
+
+
+def move_to_trash(path, trash_path):
+    """
+    Atomically move a folder into the trash folder.
+
+    Returns:
+        str: The path inside the trash or None if the folder could not be
+             renamed (e.g. it is on another filesystem).
+    """
+    os.makedirs(trash_path, exist_ok=True)
+    trashed_path = os.path.join(
+        trash_path, f"{os.path.basename(path)}-{uuid.uuid4().hex[:8]}")
+    try:
+        os.rename(path, trashed_path)
+    except OSError as e:
+        logger.debug(f"Could not move {path} to trash: {e}")
+        return None
+    return trashed_path
+
+
+def _rmtree(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def empty_trash(trash_path, max_workers=None):
+    """
+    Delete the contents of the trash folder using a thread pool. The children of
+    every trashed folder are deleted in parallel, so that a single large cache
+    entry does not serialize the deletion.
+
+    Returns:
+        int: Number of trashed items deleted.
+    """
+    if not os.path.isdir(trash_path):
+        return 0
+
+    items = [os.path.join(trash_path, name)
+             for name in os.listdir(trash_path)]
+    children = []
+    for item in items:
+        if os.path.isdir(item) and not os.path.islink(item):
+            children += [os.path.join(item, name)
+                         for name in os.listdir(item)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_rmtree, children))
+        list(executor.map(_rmtree, items))
+
+    return len(items)
+
+
+def empty_trash_detached():
+    """
+    Delete the trash contents in a detached `mlc gc` process.
+    """
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    subprocess.Popen([sys.executable, "-m", "mlc.main", "gc", "cache"],
+                     stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL,
+                     **kwargs)
@@ -11,7 +11,9 @@ import uuid
 import shutil
 import tarfile
 import zipfile
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 logger = logging.getLogger("mlc")
 
 
@@ -108,6 +110,37 @@ def load_txt(file_name, check_if_exists=False, split=False,
         return {'return': 1, 'error': str(e)}
 
 
+def version_to_tuple(version_str):
+    """
+    Normalize a version string into a comparable tuple.
+
+    Numeric parts compare numerically and trailing zeros are ignored, so that
+    "3.10" > "3.9" and "1.0" == "1.0.0". Alphabetic parts (e.g. rc, beta) mark
+    pre-releases which are lower than the release: "1.0rc1" < "1.0".
+
+    Args:
+        version_str (str): The version string (e.g., "3.10.12").
+
+    Returns:
+        tuple: A tuple of (kind, value) parts. The result is JSON serializable
+               and stays comparable after a JSON round trip (as lists).
+    """
+    release = []
+    rest = []
+    for part in re.findall(r"\d+|[a-zA-Z]+", str(version_str)):
+        if part.isdigit():
+            (rest if rest else release).append((1, int(part)))
+        else:
+            rest.append((0, part.lower()))
+    # trailing zeros of the release part do not change the version
+    while release and release[-1] == (1, 0):
+        release.pop()
+    parts = release + rest
+    # end marker: above the pre-release parts, below the numeric parts
+    parts.append((0.5, ""))
+    return tuple(parts)
+
+
 def compare_versions(current_version, min_version):
     """
     Compare two semantic version strings.
@@ -121,19 +154,20 @@ def compare_versions(current_version, min_version):
              0 if current_version == min_version,
              1 if current_version > min_version.
     """
-    try:
-        # Use `packaging.version` to handle semantic version comparison
-        current = version.parse(current_version)
-        minimum = version.parse(min_version)
-
-        if current < minimum:
-            return -1
-        elif current > minimum:
-            return 1
-        else:
-            return 0
-    except Exception as e:
-        raise ValueError(f"Invalid version format: {e}")
+    if not isinstance(current_version, str) or not isinstance(
+            min_version, str):
+        raise ValueError(
+            f"Invalid version format: {current_version}, {min_version}")
+
+    current = version_to_tuple(current_version)
+    minimum = version_to_tuple(min_version)
+
+    if current < minimum:
+        return -1
+    elif current > minimum:
+        return 1
+    else:
+        return 0
 
 
 def run_system_cmd(i):
@@ -481,6 +515,18 @@ def is_valid_url(url):
     return re.match(pattern, url) is not None
 
 
+def strip_url_credentials(url):
+    """
+    Remove the user and password (e.g. a PAT) from a URL.
+    """
+    from urllib.parse import urlparse
+    parsed = urlparse(url)
+    if parsed.scheme and "@" in parsed.netloc:
+        return parsed._replace(
+            netloc=parsed.netloc.rsplit("@", 1)[-1]).geturl()
+    return url
+
+
 def sub_input(i, keys, reverse=False):
     """
     Extracts and returns values from the dictionary based on the provided keys.
@@ -708,9 +754,12 @@ def extract_file(options):
         options (dict): A dictionary with the following keys:
             - 'filename' (str): The path to the compressed file to extract.
             - 'strip_folders' (int, optional): The number of folder levels to strip. Default is 0.
+            - 'extract_to' (str, optional): The folder to extract to. Default is an "extracted"
+                                            folder next to the compressed file.
 
     Raises:
-        ValueError: If the file format is unsupported.
+        ValueError: If the file format is unsupported or a member would be
+                    extracted outside of the extraction folder.
         FileNotFoundError: If the specified file does not exist.
     """
     filename = options.get('filename')
@@ -719,8 +768,16 @@ def extract_file(options):
     if not filename or not os.path.exists(filename):
         raise FileNotFoundError(f"File not found: {filename}")
 
-    extract_to = os.path.join(os.path.dirname(filename), "extracted")
+    extract_to = options.get('extract_to') or os.path.join(
+        os.path.dirname(filename), "extracted")
     os.makedirs(extract_to, exist_ok=True)
+    root = os.path.abspath(extract_to)
+
+    def check_inside(path, member):
+        path = os.path.abspath(os.path.join(root, path))
+        if path != root and not path.startswith(os.path.join(root, "")):
+            raise ValueError(
+                f"Archive member {member} of {filename} is outside of the extraction folder")
 
     # Check file type and extract accordingly
     if zipfile.is_zipfile(filename):
@@ -734,6 +791,7 @@ def extract_file(options):
                     stripped_parts = parts[strip_folders:]
                     stripped_path = os.path.join(extract_to, *stripped_parts)
                     stripped_path = os.path.normpath(stripped_path)
+                    check_inside(stripped_path, member)
 
                     if member.endswith('/'):  # Directory
                         os.makedirs(stripped_path, exist_ok=True)
@@ -744,18 +802,233 @@ def extract_file(options):
                             shutil.copyfileobj(source, target)
 
     elif tarfile.is_tarfile(filename):
+        extract_args = {}
+        if hasattr(tarfile, "data_filter"):
+            # rejects absolute paths and links leaving the folder, special
+            # files and unsafe permissions
+            extract_args['filter'] = "data"
         with tarfile.open(filename, 'r') as archive:
-            members = archive.getmembers()
-            for member in members:
+            # members are extracted while the archive is read, in one pass
+            for member in archive:
+                name = member.name
                 if strip_folders:
                     # Tar files also use forward slashes internally
-                    parts = member.name.split('/')
-                    if len(parts) > strip_folders:
-                        # Join with OS-specific separator for extraction
-                        member.name = os.path.join(*parts[strip_folders:])
-                archive.extract(member, path=extract_to)
+                    parts = member.name.rstrip('/').split('/')
+                    if len(parts) <= strip_folders:
+                        continue  # a stripped folder
+                    # Join with OS-specific separator for extraction
+                    member.name = os.path.join(*parts[strip_folders:])
+                    if member.islnk():
+                        # hard link targets are relative to the archive root
+                        member.linkname = os.path.join(
+                            *member.linkname.split('/')[strip_folders:] or [''])
+                check_inside(member.name, name)
+                if member.issym():
+                    check_inside(os.path.join(os.path.dirname(
+                        member.name), member.linkname), name)
+                elif member.islnk():
+                    check_inside(member.linkname, name)
+                archive.extract(member, path=extract_to, **extract_args)
 
     else:
         raise ValueError(f"Unsupported file format: {filename}")
 
     print(f"Extraction complete. Files extracted to: {extract_to}")
+
+
+def get_dir_size(path, max_workers=None):
+    """
+    Computes the disk usage of a directory tree using a parallel scandir walk.
+
+    Every directory is scanned by a worker of a thread pool, so that large trees
+    (e.g. extracted datasets) on network or slow filesystems are walked much faster
+    than with a serial `os.walk`. Symbolic links are not followed and hard-linked
+    files are counted only once.
+
+    Args:
+        path (str): The directory to measure.
+        max_workers (int, optional): Number of scanning threads (default: min(32, 4 * cpu_count)).
+
+    Returns:
+        dict: A dictionary containing:
+            - return (int): 0 if successful, >0 if there was an error.
+            - error (str): Error message if return > 0.
+            - size (int): Total size of the files in bytes.
+            - files (int): Number of files found.
+    """
+    if not os.path.isdir(path):
+        return {'return': 1, 'error': f"Directory not found: {path}"}
+
+    if not max_workers:
+        max_workers = min(32, 4 * (os.cpu_count() or 1))
+
+    def scan(dir_path):
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if st.st_nlink > 1:
+                        files.append((st.st_dev, st.st_ino, st.st_size))
+                    else:
+                        files.append((None, None, st.st_size))
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {dir_path}: {e}")
+        return files, subdirs
+
+    total_size = 0
+    total_files = 0
+    seen_inodes = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(scan, path)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for dev, ino, size in files:
+                    if ino is not None:
+                        if (dev, ino) in seen_inodes:
+                            continue
+                        seen_inodes.add((dev, ino))
+                    total_size += size
+                    total_files += 1
+                for subdir in subdirs:
+                    pending.add(executor.submit(scan, subdir))
+
+    return {'return': 0, 'size': total_size, 'files': total_files}
+
+
+def human_readable_size(size):
+    """
+    Converts a size in bytes to a human readable string (e.g., 1.5 GiB).
+
+    Args:
+        size (int): Size in bytes.
+
+    Returns:
+        str: Human readable size.
+    """
+    for unit in ['B', 'KiB', 'MiB', 'GiB', 'TiB']:
+        if abs(size) < 1024 or unit == 'TiB':
+            if unit == 'B':
+                return f"{size} {unit}"
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+
+
+def get_file_hash(file_path, algorithm='sha256', chunk_size=1024 * 1024):
+    """
+    Computes the hash of a file by reading it in chunks.
+
+    Args:
+        file_path (str): The file to hash.
+        algorithm (str): Any algorithm supported by hashlib (default: sha256).
+        chunk_size (int): Number of bytes read at a time (default: 1 MiB).
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    h = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_cache_key(tags, env=None):
+    """
+    Computes a deterministic key for a cache entry from its tags and selected env.
+
+    Tags are normalized (stripped, deduplicated and sorted) so that the same set of
+    tags always gives the same key irrespective of their order.
+
+    Args:
+        tags (str or list): Comma-separated string or list of tags.
+        env (dict, optional): Env keys and values which determine the cache contents.
+
+    Returns:
+        dict: A dictionary containing:
+            - return (int): 0 if successful, >0 if there was an error.
+            - key (str): The sha256 hex digest identifying the cache.
+    """
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    if not isinstance(tags, list):
+        return {'return': 1, 'error': 'Tags must be a string or a list.'}
+
+    normalized_tags = sorted({str(t).strip() for t in tags if str(t).strip()})
+    normalized_env = {str(k): str(v) for k, v in (env or {}).items()}
+
+    data = json.dumps({"tags": normalized_tags, "env": normalized_env},
+                      sort_keys=True)
+    return {'return': 0, 'key': hashlib.sha256(
+        data.encode('utf-8')).hexdigest()}
+
+
+def rewrite_strings(data, rewrite):
+    """
+    Applies a function to every string inside nested dictionaries and lists.
+
+    Args:
+        data: The data to process (e.g., a loaded meta or cached state).
+        rewrite (function): Function mapping a string to its new value.
+
+    Returns:
+        tuple: The rewritten data and True if any string was changed.
+    """
+    if isinstance(data, str):
+        new_value = rewrite(data)
+        return new_value, new_value != data
+    if isinstance(data, dict):
+        changed = False
+        for key, value in data.items():
+            data[key], value_changed = rewrite_strings(value, rewrite)
+            changed = changed or value_changed
+        return data, changed
+    if isinstance(data, list):
+        changed = False
+        for index, value in enumerate(data):
+            data[index], value_changed = rewrite_strings(value, rewrite)
+            changed = changed or value_changed
+        return data, changed
+    return data, False
+
+
+def rewrite_file_strings(file_path, rewrite):
+    """
+    Applies a function to every string of a JSON or YAML file and saves the file
+    only if something changed.
+
+    Returns:
+        dict: return code and 'changed' (bool).
+    """
+    if not os.path.isfile(file_path):
+        return {'return': 0, 'changed': False}
+
+    if file_path.endswith((".yaml", ".yml")):
+        data = read_yaml(file_path)
+    else:
+        r = load_json(file_path)
+        if r['return'] > 0:
+            return r
+        data = r['meta']
+
+    data, changed = rewrite_strings(data, rewrite)
+    if not changed:
+        return {'return': 0, 'changed': False}
+
+    if file_path.endswith((".yaml", ".yml")):
+        r = save_yaml(file_path, data)
+    else:
+        r = save_json(file_path, data)
+    if r['return'] > 0:
+        return r
+    return {'return': 0, 'changed': True}
@@ -0,0 +1,31 @@
+import os
+import tempfile
+import unittest
+
+
+class MLCTestCase(unittest.TestCase):
+    """
+    Base class of the tests running in a temporary folder with their own MLC
+    repos folder. MLC_REPOS and the variables listed in env_keys are restored
+    after every test.
+    """
+    env_keys = []
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.previous_cwd = os.getcwd()
+        self.addCleanup(os.chdir, self.previous_cwd)
+        os.chdir(self.temp_dir.name)
+
+        self.previous_env = {key: os.environ.get(key)
+                             for key in ["MLC_REPOS"] + self.env_keys}
+        self.addCleanup(self._restore_env)
+        os.environ["MLC_REPOS"] = os.path.join(self.temp_dir.name, "repos")
+
+    def _restore_env(self):
+        for key, value in self.previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
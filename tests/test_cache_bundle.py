@@ -0,0 +1,118 @@
+import io
+import json
+import os
+import tarfile
+import unittest
+
+from mlc import cache_bundle
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheBundleTest(MLCTestCase):
+    def _node(self, name):
+        os.environ["MLC_REPOS"] = os.path.join(self.temp_dir.name, name)
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        return action, cache
+
+    def _add_cache(self, action, name, tags, state):
+        res = action.add({
+            "target_name": "cache",
+            "item": name,
+            "tags": tags
+        })
+        self.assertEqual(res["return"], 0)
+        path = res["path"]
+        os.makedirs(os.path.join(path, "data"))
+        with open(os.path.join(path, "data", "payload.bin"), "wb") as f:
+            f.write(b"x" * 1000)
+        with open(os.path.join(path, "mlc-cached-state.json"), "w") as f:
+            json.dump(state(path), f)
+        return path
+
+    def _export_import(self, bundle_name):
+        action, cache = self._node("node-a")
+        dep = self._add_cache(action, "dep", "get,dep", lambda p: {
+            "new_env": {"MLC_DEP_PATH": os.path.join(p, "data")}})
+        main = self._add_cache(action, "main", "get,main", lambda p: {
+            "new_env": {"MLC_MAIN_PATH": os.path.join(p, "data", "payload.bin")},
+            "dependent_cached_path": dep})
+
+        bundle = os.path.join(self.temp_dir.name, bundle_name)
+        res = cache.export({"tags": "get", "output": bundle})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(res["count"], 2)
+
+        action, cache = self._node("node-b")
+        res = cache.import_({"input": bundle})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["list"]), 2)
+
+        res = cache.search({"tags": "get,main"})
+        self.assertEqual(len(res["list"]), 1)
+        new_main = res["list"][0].path
+        new_dep = cache.search({"tags": "get,dep"})["list"][0].path
+        self.assertTrue(new_main.startswith(action.repos_path))
+        self.assertNotEqual(new_main, main)
+
+        with open(os.path.join(new_main, "mlc-cached-state.json")) as f:
+            state = json.load(f)
+        self.assertEqual(state["new_env"]["MLC_MAIN_PATH"],
+                         os.path.join(new_main, "data", "payload.bin"))
+        self.assertEqual(state["dependent_cached_path"], new_dep)
+        self.assertTrue(os.path.isfile(
+            os.path.join(new_main, "data", "payload.bin")))
+
+        # importing again skips the known entries
+        res = cache.import_({"input": bundle})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["list"]), 0)
+        self.assertEqual(len(res["skipped"]), 2)
+
+    def test_export_import_gzip(self):
+        self._export_import("bundle.tar.gz")
+
+    @unittest.skipUnless(cache_bundle._zstd_backend(), "zstd not available")
+    def test_export_import_zstd(self):
+        self._export_import("bundle.tar.zst")
+
+    def test_import_rejects_entries_outside_the_cache(self):
+        action, cache = self._node("node-b")
+        for uid, folder in [("0123456789abcdef", "../../escaped"),
+                            ("0123456789abcdef",
+                             os.path.join(self.temp_dir.name, "escaped")),
+                            ("../../../escaped", "escaped")]:
+            bundle = os.path.join(self.temp_dir.name, "malicious.tar.gz")
+            manifest = {"version": cache_bundle.BUNDLE_VERSION,
+                        "entries": [{"uid": uid, "folder": folder, "tags": ["get"],
+                                     "source_path": "/old/cache/" + folder,
+                                     "source_cache_root": "/old/cache"}]}
+            with tarfile.open(bundle, "w:gz") as tar:
+                data = json.dumps(manifest).encode("utf-8")
+                info = tarfile.TarInfo(cache_bundle.MANIFEST_NAME)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                info = tarfile.TarInfo("entries/0123456789abcdef/payload.bin")
+                info.size = 4
+                tar.addfile(info, io.BytesIO(b"data"))
+
+            res = cache.import_({"input": bundle})
+            self.assertEqual(res["return"], 1)
+            self.assertIn("invalid cache entries", res["error"])
+            self.assertFalse(os.path.exists(
+                os.path.join(self.temp_dir.name, "escaped")))
+        self.assertEqual(cache.search({"tags": "get"})["list"], [])
+
+    def test_unsupported_bundle_extension(self):
+        action, cache = self._node("node-a")
+        self._add_cache(action, "one", "get,one", lambda p: {})
+        res = cache.export({"output": "bundle.rar"})
+        self.assertEqual(res["return"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import unittest
+
+from mlc.action import Action
+from mlc.blob_store import BlobStore
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheDedupTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+        self.first = self._add_cache("first-cache", "get,model,first")
+        self.second = self._add_cache("second-cache", "get,model,second")
+
+    def _add_cache(self, name, tags):
+        res = self.action.add({
+            "target_name": "cache",
+            "item": name,
+            "tags": tags
+        })
+        self.assertEqual(res["return"], 0)
+        with open(os.path.join(res["path"], "model.bin"), "wb") as f:
+            f.write(b"checkpoint" * 100)
+        return res["path"]
+
+    def test_dedup_links_duplicates_and_rm_frees_last_reference(self):
+        res = self.cache.dedup({"min_size": 1})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(res["duplicates"], 1)
+
+        first_file = os.path.join(self.first, "model.bin")
+        second_file = os.path.join(self.second, "model.bin")
+        self.assertTrue(os.path.samefile(first_file, second_file))
+
+        # a second pass finds nothing new to deduplicate
+        res = self.cache.dedup({"min_size": 1})
+        self.assertEqual(res["duplicates"], 0)
+
+        blobs_path = os.path.join(os.environ["MLC_REPOS"], ".blobs")
+        blob_files = [f for d in os.listdir(blobs_path)
+                      if os.path.isdir(os.path.join(blobs_path, d))
+                      for f in os.listdir(os.path.join(blobs_path, d))]
+        self.assertEqual(len(blob_files), 1)
+
+        res = self.cache.rm({"tags": "get,model,first", "f": True})
+        self.assertEqual(res["return"], 0)
+        self.assertTrue(os.path.exists(second_file))
+        self.assertEqual(len(os.listdir(os.path.join(
+            blobs_path, blob_files[0][:2]))), 1)
+
+        res = self.cache.rm({"tags": "get,model,second", "f": True})
+        self.assertEqual(res["return"], 0)
+        # the emptied shard folder is removed with the blob
+        self.assertFalse(os.path.exists(
+            os.path.join(blobs_path, blob_files[0][:2])))
+
+    def test_reflink_dedup_counts_only_linked_files(self):
+        blob_store = BlobStore(os.environ["MLC_REPOS"])
+        probe = os.path.join(self.temp_dir.name, "probe")
+        with open(probe, "wb") as f:
+            f.write(b"probe")
+        reflinks = blob_store._link(
+            probe, probe + ".link", "reflink") == "reflink"
+
+        res = self.cache.dedup({"min_size": 1, "mode": "reflink"})
+        self.assertEqual(res["return"], 0)
+        if reflinks:
+            self.assertEqual((res["duplicates"], res["unlinked"]), (1, 0))
+            # reflinked files are recognized without a new link
+            res = self.cache.dedup({"min_size": 1, "mode": "reflink"})
+            self.assertEqual((res["duplicates"], res["saved_bytes"]), (0, 0))
+        else:
+            # nothing is copied into the blob store nor reported as saved
+            self.assertEqual((res["duplicates"], res["saved_bytes"]), (0, 0))
+            self.assertEqual(res["unlinked"], 2)
+            self.assertEqual(blob_store._load_refs(), {})
+            self.assertFalse(os.path.samefile(
+                os.path.join(self.first, "model.bin"),
+                os.path.join(self.second, "model.bin")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheDependencyTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        action = Action()
+        action.parent = None
+        # model <- dataset <- preprocessed, tool is independent
+        self.paths = {}
+        for name, meta in [
+                ("model", {}),
+                ("dataset", {"dependent_cached_path": "model"}),
+                ("preprocessed",
+                 {"dependent_cached_paths": "dataset/data.bin"}),
+                ("tool", {})]:
+            for key, dep in meta.items():
+                dep_name, _, rest = dep.partition("/")
+                meta[key] = os.path.join(self.paths[dep_name], rest) \
+                    if rest else self.paths[dep_name]
+            res = action.add({"target_name": "cache",
+                              "tags": f"get,{name}", "meta": meta})
+            self.assertEqual(res["return"], 0)
+            self.paths[name] = res["path"]
+
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+    def _find_all(self):
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        res = cache.search({"tags": "get"})
+        self.assertEqual(res["return"], 0)
+        return sorted(item.path for item in res["list"])
+
+    def test_dependents(self):
+        dependents = self.action.get_index().get_cache_dependents(
+            [self.paths["model"]])
+        self.assertEqual(sorted(entry["path"] for entry in dependents),
+                         sorted([self.paths["dataset"], self.paths["preprocessed"]]))
+
+    def test_removed_dependency_invalidates_dependents(self):
+        res = self.cache.rm({"tags": "get,model", "f": True})
+        self.assertEqual(res["return"], 0)
+        # the dependents are kept on disk but no longer found
+        self.assertTrue(os.path.isdir(self.paths["preprocessed"]))
+        self.assertEqual(self._find_all(), [self.paths["tool"]])
+
+        with open(os.path.join(os.environ["MLC_REPOS"],
+                               "index_cache_tombstones.json"), "r") as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+    def test_cascade(self):
+        res = self.cache.rm({"tags": "get,dataset", "f": True,
+                             "cascade": True})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["list"]), 2)
+        self.assertFalse(os.path.exists(self.paths["preprocessed"]))
+        self.assertEqual(self._find_all(),
+                         sorted([self.paths["model"], self.paths["tool"]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
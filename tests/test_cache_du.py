@@ -0,0 +1,52 @@
+import os
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheDuTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+        self.small = self._add_cache("small-cache", "get,small", 10)
+        self.large = self._add_cache("large-cache", "get,large", 1000)
+
+    def _add_cache(self, name, tags, payload_size):
+        res = self.action.add({
+            "target_name": "cache",
+            "item": name,
+            "tags": tags
+        })
+        self.assertEqual(res["return"], 0)
+        os.makedirs(os.path.join(res["path"], "data"))
+        with open(os.path.join(res["path"], "data", "payload.bin"), "wb") as f:
+            f.write(b"x" * payload_size)
+        return res["path"]
+
+    def test_du_sorts_by_size_and_reuses_stored_sizes(self):
+        res = self.cache.du({"sort": "size"})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual([e["path"] for e in res["list"]],
+                         [self.large, self.small])
+        large_size = res["list"][0]["size"]
+        self.assertGreaterEqual(large_size, 1000)
+
+        # Changing a nested file does not touch the entry folder mtime, so
+        # the stored size is reported without walking the entry again
+        with open(os.path.join(self.large, "data", "payload.bin"), "ab") as f:
+            f.write(b"y" * 500)
+        res = self.cache.du({"tags": "get,large"})
+        self.assertEqual(res["list"][0]["size"], large_size)
+
+        res = self.cache.du({"tags": "get,large", "force": True})
+        self.assertEqual(res["list"][0]["size"], large_size + 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheEnvIndexTest(MLCTestCase):
+    env_keys = ["MLC_CACHE_ENV_INDEX"]
+
+    def setUp(self):
+        super().setUp()
+        os.environ.pop("MLC_CACHE_ENV_INDEX", None)
+
+        action = Action()
+        action.parent = None
+        self.paths = {}
+        for name in ["imagenet", "coco"]:
+            res = action.add({"target_name": "cache",
+                              "tags": f"get,dataset,{name}"})
+            self.assertEqual(res["return"], 0)
+            with open(os.path.join(res["path"], "mlc-cached-state.json"), "w") as f:
+                json.dump({"new_env": {"MLC_DATASET_PATH": f"/data/{name}",
+                                       "MLC_DATASET_SIZE": 10}}, f)
+            with open(os.path.join(res["path"], "meta.json"), "r") as f:
+                uid = json.load(f)["uid"]
+            # the cached state is written after the cache is created
+            res = action.update({"target_name": "cache", "uid": uid,
+                                 "meta": {}})
+            self.assertEqual(res["return"], 0)
+            self.paths[name] = res["list"][0].path
+
+    def _find(self, env, tags=None):
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        i = {"env": env}
+        if tags:
+            i["tags"] = tags
+        res = cache.search(i)
+        self.assertEqual(res["return"], 0)
+        return sorted(item.path for item in res["list"])
+
+    def test_find_by_env(self):
+        self.assertEqual(self._find({"MLC_DATASET_PATH": "/data/imagenet"}),
+                         [self.paths["imagenet"]])
+        self.assertEqual(self._find({"MLC_DATASET_SIZE": "10"}, tags="dataset"),
+                         sorted(self.paths.values()))
+        self.assertEqual(self._find({"MLC_DATASET_PATH": "/data/coco"},
+                                    tags="imagenet"), [])
+
+    def test_env_index_is_saved(self):
+        env_index_file = os.path.join(
+            os.environ["MLC_REPOS"], "index_cache_env.json")
+        with open(env_index_file, "r") as f:
+            env_index = json.load(f)
+        self.assertEqual(
+            sorted(env["MLC_DATASET_PATH"] for env in env_index.values()),
+            ["/data/coco", "/data/imagenet"])
+
+    def test_find_without_env_index(self):
+        os.environ["MLC_CACHE_ENV_INDEX"] = "no"
+        self.assertEqual(self._find({"MLC_DATASET_PATH": "/data/coco"}),
+                         [self.paths["coco"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
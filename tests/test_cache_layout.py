@@ -0,0 +1,85 @@
+import json
+import os
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+from mlc import cache_layout
+
+from helpers import MLCTestCase
+
+
+class CacheLayoutTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_root = os.path.join(
+            os.environ["MLC_REPOS"], "local", "cache")
+
+    def _new_action(self):
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        return action, cache
+
+    def test_path_rewriter_matches_both_separators(self):
+        old = os.path.join(self.cache_root, "ab", "cd", "entry")
+        new = os.path.join(self.cache_root, "entry")
+        other = os.path.join(self.cache_root, "other")
+        rewrite = cache_layout.make_path_rewriter(
+            [self.cache_root], {old: new})
+        self.assertEqual(rewrite(os.path.join(old, "bin") + ";" + other),
+                         os.path.join(new, "bin") + ";" + other)
+        self.assertEqual(rewrite(old.replace(os.sep, "/") + "/bin"),
+                         new + "/bin")
+
+    def test_migrate_to_sharded_and_back(self):
+        action, cache = self._new_action()
+        dep = action.add({"target_name": "cache", "tags": "get,dep"})
+        top = action.add({"target_name": "cache", "tags": "get,top",
+                          "meta": {"dependent_cached_path": dep["path"]}})
+        with open(os.path.join(top["path"], "mlc-cached-state.json"), "w") as f:
+            json.dump({"new_env": {"MLC_TOP_BIN": os.path.join(
+                top["path"], "bin", "top")}}, f)
+
+        res = cache.migrate({"layout": "sharded"})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["moved"]), 2)
+        new_top = res["moved"][top["path"]]
+        new_dep = res["moved"][dep["path"]]
+        self.assertEqual(
+            os.path.relpath(
+                new_top,
+                self.cache_root).count(
+                os.sep),
+            2)
+
+        with open(os.path.join(new_top, "mlc-cached-state.json")) as f:
+            state = json.load(f)
+        self.assertEqual(state["new_env"]["MLC_TOP_BIN"],
+                         os.path.join(new_top, "bin", "top"))
+        with open(os.path.join(new_top, "meta.json")) as f:
+            self.assertEqual(json.load(f)["dependent_cached_path"], new_dep)
+
+        # a new process finds the migrated caches and creates new ones sharded
+        action, cache = self._new_action()
+        r = cache.search({"tags": "get,top"})
+        self.assertEqual([item.path for item in r["list"]], [new_top])
+        r = cache.lookup({"tags": "get,top"})
+        self.assertEqual([item.path for item in r["list"]], [new_top])
+        new = action.add({"target_name": "cache", "tags": "get,new"})
+        self.assertEqual(
+            os.path.relpath(
+                new["path"],
+                self.cache_root).count(
+                os.sep),
+            2)
+
+        res = cache.migrate({"layout": "flat"})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["moved"]), 3)
+        self.assertEqual(sorted(os.listdir(self.cache_root)), sorted(
+            [".mlc-layout"] + [os.path.basename(p) for p in res["moved"].values()]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheLookupTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+    def test_lookup_by_key_and_by_tags_and_env(self):
+        env = {"MLC_PYTHON_VERSION": "3.12"}
+        res = self.action.add({"target_name": "cache",
+                               "tags": "get,python",
+                               "cache_key_env": env})
+        self.assertEqual(res["return"], 0)
+        path = res["path"]
+        key = res["cache_key"]
+
+        r = self.cache.lookup({"key": key})
+        self.assertEqual([item.path for item in r["list"]], [path])
+        self.assertEqual(r["list"][0].meta["cache_key"], key)
+
+        r = self.cache.lookup({"tags": "python,get", "cache_key_env": env})
+        self.assertEqual([item.path for item in r["list"]], [path])
+
+        r = self.cache.lookup({"tags": "get,python",
+                               "cache_key_env": {"MLC_PYTHON_VERSION": "3.11"}})
+        self.assertEqual(r["list"], [])
+
+        res = self.cache.rm({"tags": "get,python", "f": True})
+        self.assertEqual(res["return"], 0)
+        r = self.cache.lookup({"key": key})
+        self.assertEqual(r["list"], [])
+
+    def test_caches_sharing_a_key(self):
+        meta = {"version": "1.0"}
+        first = self.action.add({"target_name": "cache", "tags": "get,python",
+                                 "meta": meta})
+        second = self.action.add({"target_name": "cache", "tags": "get,python",
+                                  "new_tags": "second"})
+        self.assertEqual(first["cache_key"], second["cache_key"])
+        self.assertEqual(meta, {"version": "1.0"})
+        key = first["cache_key"]
+
+        r = self.cache.lookup({"key": key})
+        self.assertEqual([item.path for item in r["list"]], [second["path"]])
+
+        # removing one of the caches keeps the key of the other one
+        res = self.cache.rm({"tags": "get,python,second", "f": True})
+        self.assertEqual(res["return"], 0)
+        r = self.cache.lookup({"key": key})
+        self.assertEqual([item.path for item in r["list"]], [first["path"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
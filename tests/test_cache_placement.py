@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from mlc import cache_placement
+from mlc.action import Action
+from mlc.blob_store import BlobStore
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class TmpCachePlacementTest(MLCTestCase):
+    env_keys = ["MLC_CACHE_TMP_ROOT", "MLC_CACHE_TMP_MIN_FREE"]
+
+    def setUp(self):
+        super().setUp()
+        os.environ["MLC_CACHE_TMP_ROOT"] = os.path.join(
+            self.temp_dir.name, "tmpfs")
+        os.environ["MLC_CACHE_TMP_MIN_FREE"] = "0"
+
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+        self.tmp_root = cache_placement.get_tmp_root(self.action.repos_path)
+
+    def _add_tmp_cache(self, name):
+        res = self.action.add({"target_name": "cache", "item": name,
+                               "tags": "get,intermediate,tmp"})
+        self.assertEqual(res["return"], 0)
+        return res["path"]
+
+    def test_tmp_cache_on_tmpfs_is_removed_at_exit(self):
+        path = self._add_tmp_cache("scratch")
+        self.assertEqual(os.path.dirname(path), self.tmp_root)
+
+        # a fresh index finds the entry outside the repo
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        res = cache.search({"tags": "get,intermediate"})
+        self.assertEqual([item.path for item in res["list"]], [path])
+
+        cache_placement.cleanup_tmp_caches()
+        self.assertFalse(os.path.exists(path))
+        self.action.get_index().reload_index("cache")
+        res = self.cache.search({"tags": "get,intermediate"})
+        self.assertEqual(res["list"], [])
+
+    def test_lookup_of_a_tmp_cache(self):
+        res = self.action.add({"target_name": "cache", "item": "scratch",
+                               "tags": "get,intermediate,tmp"})
+        self.assertEqual(res["return"], 0)
+        r = self.cache.lookup({"key": res["cache_key"]})
+        self.assertEqual([item.path for item in r["list"]], [res["path"]])
+        self.assertEqual(r["list"][0].repo.meta["alias"], "local")
+        cache_placement.cleanup_tmp_caches()
+
+    def test_tmp_cache_cleanup_releases_blobs(self):
+        kept = self.action.add({"target_name": "cache", "item": "kept",
+                                "tags": "get,intermediate"})["path"]
+        path = self._add_tmp_cache("scratch")
+        for folder in [kept, path]:
+            with open(os.path.join(folder, "data.bin"), "wb") as f:
+                f.write(b"data" * 100)
+        res = self.cache.dedup({"min_size": 1})
+        self.assertEqual(res["duplicates"], 1)
+        blob_store = BlobStore(self.action.repos_path)
+        self.assertEqual([len(uids) for uids in blob_store._load_refs().values()],
+                         [2])
+
+        cache_placement.cleanup_tmp_caches()
+        self.assertEqual([len(uids) for uids in blob_store._load_refs().values()],
+                         [1])
+
+    def test_gc_removes_orphaned_tmp_caches(self):
+        path = self._add_tmp_cache("orphan")
+        # pretend the creating process is gone
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        with open(os.path.join(self.tmp_root, cache_placement.OWNERS_DIR, "orphan"), "w") as f:
+            f.write(str(process.pid))
+
+        res = self.cache.gc({})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(res["deleted_tmp"], 1)
+        self.assertFalse(os.path.exists(path))
+        cache_placement.cleanup_tmp_caches()
+
+    def test_gc_keeps_the_trash_of_the_tmp_root(self):
+        path = self._add_tmp_cache("live")
+        trash_path = os.path.join(self.tmp_root, ".trash")
+        os.makedirs(os.path.join(trash_path, "removed-cache"))
+        with open(os.path.join(trash_path, "removed-cache", "data.bin"), "w") as f:
+            f.write("data")
+
+        res = self.cache.gc({})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual((res["deleted"], res["deleted_tmp"]), (1, 0))
+        self.assertTrue(os.path.isdir(trash_path))
+        self.assertTrue(os.path.isdir(path))
+        cache_placement.cleanup_tmp_caches()
+
+    def test_tmp_cache_on_disk_without_free_space(self):
+        os.environ["MLC_CACHE_TMP_MIN_FREE"] = str(1 << 62)
+        path = self._add_tmp_cache("on-disk")
+        self.assertTrue(path.startswith(self.action.repos_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
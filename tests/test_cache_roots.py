@@ -0,0 +1,81 @@
+import json
+import os
+import time
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheRootsTest(MLCTestCase):
+    env_keys = ["MLC_CACHE_ROOTS", "MLC_CACHE_PLACEMENT", "MLC_CACHE_PIN"]
+
+    def setUp(self):
+        super().setUp()
+        self.roots = [os.path.join(self.temp_dir.name, name)
+                      for name in ["nvme0", "nvme1"]]
+        os.environ["MLC_CACHE_ROOTS"] = os.pathsep.join(self.roots)
+        os.environ["MLC_CACHE_PLACEMENT"] = "round_robin"
+        os.environ.pop("MLC_CACHE_PIN", None)
+
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+    def _add_cache(self, name, tags):
+        res = self.action.add({"target_name": "cache", "item": name,
+                               "tags": tags})
+        self.assertEqual(res["return"], 0)
+        return res["path"]
+
+    def test_round_robin_and_single_logical_cache(self):
+        paths = [self._add_cache(f"rr-{n}", "get,rr") for n in range(4)]
+        self.assertEqual([os.path.dirname(p) for p in paths],
+                         self.roots + self.roots)
+
+        # a fresh index finds the caches of all the roots
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        res = cache.search({"tags": "get,rr"})
+        self.assertEqual(sorted(item.path for item in res["list"]),
+                         sorted(paths))
+
+        # prune covers all the roots
+        for path in paths[:2]:
+            meta_file = os.path.join(path, "meta.json")
+            with open(meta_file) as f:
+                meta = json.load(f)
+            meta["cache_expiration"] = time.time() - 1
+            with open(meta_file, "w") as f:
+                json.dump(meta, f)
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        res = cache.prune({})
+        self.assertEqual(res["return"], 0)
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+        res = cache.search({"tags": "get,rr"})
+        self.assertEqual(sorted(item.path for item in res["list"]),
+                         sorted(paths[2:]))
+
+    def test_pinned_tags(self):
+        os.environ["MLC_CACHE_PIN"] = f"dataset-*={self.roots[1]}"
+        for n in range(3):
+            path = self._add_cache(f"pinned-{n}", "get,dataset-imagenet")
+            self.assertEqual(os.path.dirname(path), self.roots[1])
+
+    def test_rm_uses_the_trash_of_the_root(self):
+        path = self._add_cache("removed", "get,removed")
+        res = self.cache.rm({"tags": "get,removed", "f": True})
+        self.assertEqual(res["return"], 0)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.isdir(
+            os.path.join(os.path.dirname(path), ".trash")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+from filelock import FileLock
+
+from mlc import utils
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+from mlc.cache_reservation import get_lock_file
+
+from helpers import MLCTestCase
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = textwrap.dedent("""
+    import time
+    from mlc.action import Action
+    from mlc.cache_action import CacheAction
+
+    action = Action()
+    cache = CacheAction(action)
+    action.parent = None
+
+    r = cache.reserve({'tags': 'get,dataset,shared'})
+    assert r['return'] == 0, r
+    if not r['list']:
+        res = action.add({'target_name': 'cache', 'tags': 'get,dataset,shared'})
+        assert res['return'] == 0, res
+        time.sleep(0.5)  # populate the cache
+        print('created')
+    else:
+        print('reused')
+    cache.release({'reservation': r['reservation']})
+""")
+
+
+class CacheSingleFlightTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        # initialize the repos folder and the index once
+        Action().get_index()
+
+    def test_concurrent_reservations_create_cache_once(self):
+        env = os.environ.copy()
+        existing_pythonpath = env.get("PYTHONPATH")
+        env["PYTHONPATH"] = REPO_ROOT if not existing_pythonpath else REPO_ROOT + \
+            os.pathsep + existing_pythonpath
+
+        workers = [subprocess.Popen([sys.executable, "-c", WORKER],
+                                    cwd=self.temp_dir.name, env=env,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True) for _ in range(4)]
+        outputs = []
+        for worker in workers:
+            stdout, stderr = worker.communicate(timeout=60)
+            self.assertEqual(worker.returncode, 0, msg=stderr)
+            outputs.append(stdout.strip())
+
+        self.assertEqual(outputs.count("created"), 1)
+        self.assertEqual(outputs.count("reused"), 3)
+
+        cache_path = os.path.join(os.environ["MLC_REPOS"], "local", "cache")
+        self.assertEqual(len(os.listdir(cache_path)), 1)
+
+    def test_single_flight_add_reuses_existing_cache(self):
+        action = Action()
+        action.parent = None
+        first = action.add({"target_name": "cache", "tags": "get,model",
+                            "single_flight": True})
+        self.assertEqual(first["return"], 0)
+        second = action.add({"target_name": "cache", "tags": "model,get",
+                             "single_flight": True})
+        self.assertEqual(second["return"], 0)
+        self.assertTrue(second.get("existing"))
+        self.assertEqual(first["path"], second["path"])
+
+    def test_single_flight_add_matches_the_cache_key(self):
+        action = Action()
+        action.parent = None
+        small = action.add({"target_name": "cache", "tags": "get,dataset",
+                            "cache_key_env": {"MLC_DATASET_SIZE": "500"},
+                            "single_flight": True})
+        self.assertEqual(small["return"], 0)
+        full = action.add({"target_name": "cache", "tags": "get,dataset",
+                           "cache_key_env": {"MLC_DATASET_SIZE": "50000"},
+                           "single_flight": True})
+        self.assertEqual(full["return"], 0)
+        self.assertFalse(full.get("existing"))
+        self.assertNotEqual(small["path"], full["path"])
+
+        again = action.add({"target_name": "cache", "tags": "get,dataset",
+                            "cache_key_env": {"MLC_DATASET_SIZE": "50000"},
+                            "single_flight": True})
+        self.assertTrue(again.get("existing"))
+        self.assertEqual(again["path"], full["path"])
+
+    def test_reservation_timeout_is_an_error(self):
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        key = utils.get_cache_key("get,model")["key"]
+        # another process holding the reservation
+        other = FileLock(get_lock_file(os.environ["MLC_REPOS"], key))
+        with other:
+            r = cache.reserve({"tags": "get,model", "timeout": 0.2})
+            self.assertEqual(r["return"], 1)
+            self.assertIn(key, r["error"])
+            r = action.add({"target_name": "cache", "tags": "get,model",
+                            "reservation_timeout": 0.2})
+            self.assertEqual(r["return"], 1)
+            self.assertIn(key, r["error"])
+        r = action.add({"target_name": "cache", "tags": "get,model",
+                        "reservation_timeout": 0.2})
+        self.assertEqual(r["return"], 0, r.get("error"))
+
+
+if __name__ == "__main__":
+    unittest.main()
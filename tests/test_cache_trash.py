@@ -0,0 +1,63 @@
+import os
+import unittest
+
+from mlc import trash
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheTrashTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+    def _add_cache(self, name, tags):
+        res = self.action.add({
+            "target_name": "cache",
+            "item": name,
+            "tags": tags
+        })
+        self.assertEqual(res["return"], 0)
+        os.makedirs(os.path.join(res["path"], "data", "nested"))
+        with open(os.path.join(res["path"], "data", "nested", "payload.bin"), "wb") as f:
+            f.write(b"x" * 100)
+        return res["path"]
+
+    def test_rm_moves_to_trash_and_updates_index_once(self):
+        paths = [self._add_cache(f"bulk-{n}", "get,bulk") for n in range(5)]
+        kept = self._add_cache("kept", "get,kept")
+
+        res = self.cache.rm({"tags": "get,bulk", "f": True, "all": True})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["list"]), 5)
+
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+        trash_path = trash.get_trash_path(self.action.repos_path)
+        self.assertEqual(os.listdir(trash_path), [])
+
+        res = self.cache.search({"tags": "get"})
+        self.assertEqual([item.path for item in res["list"]], [kept])
+        index = self.action.get_index()
+        for path in paths:
+            self.assertNotIn(os.path.join(path, "meta.json"),
+                             index.modified_times)
+
+    def test_gc_finishes_interrupted_deletion(self):
+        path = self._add_cache("interrupted", "get,interrupted")
+        trash_path = trash.get_trash_path(self.action.repos_path)
+        trashed_path = trash.move_to_trash(path, trash_path)
+        self.assertTrue(os.path.isdir(trashed_path))
+
+        res = self.cache.gc({})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(res["deleted"], 1)
+        self.assertEqual(os.listdir(trash_path), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class CacheVerifyTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+        res = self.action.add({"target_name": "cache",
+                               "tags": "get,dataset"})
+        self.assertEqual(res["return"], 0)
+        self.path = res["path"]
+        os.makedirs(os.path.join(self.path, "data"))
+        for name in ["a.bin", "b.bin"]:
+            with open(os.path.join(self.path, "data", name), "wb") as f:
+                f.write(os.urandom(4096))
+
+    def _verify(self, **options):
+        res = self.cache.verify(dict(tags="get,dataset", **options))
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["list"]), 1)
+        return res["list"][0]
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        self.assertEqual(self._verify()["status"], "recorded")
+        result = self._verify()
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual((result["hashed"], result["skipped"]), (0, 2))
+        self.assertEqual(self._verify(full=True)["hashed"], 2)
+
+    def test_corruption_is_reported(self):
+        self._verify()
+        file_a = os.path.join(self.path, "data", "a.bin")
+        st = os.stat(file_a)
+        # silent corruption keeping the size and mtime
+        with open(file_a, "r+b") as f:
+            f.write(b"\0" * 16)
+        os.utime(file_a, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(self._verify()["status"], "ok")
+        self.assertEqual(self._verify(full=True)["corrupted"],
+                         [os.path.join("data", "a.bin")])
+
+        os.remove(os.path.join(self.path, "data", "b.bin"))
+        result = self._verify(mark_tmp=True)
+        self.assertEqual(result["status"], "corrupted")
+        self.assertEqual(result["missing"], [os.path.join("data", "b.bin")])
+
+        action = Action()
+        action.parent = None
+        res = action.search({"target_name": "cache", "tags": "tmp"})
+        self.assertEqual([item.path for item in res["list"]], [self.path])
+
+    def test_update_records_the_rewritten_files(self):
+        self._verify()
+        with open(os.path.join(self.path, "data", "a.bin"), "wb") as f:
+            f.write(b"rewritten")
+        os.remove(os.path.join(self.path, "data", "b.bin"))
+        self.assertEqual(self._verify()["status"], "corrupted")
+
+        result = self._verify(update=True)
+        self.assertEqual(result["status"], "updated")
+        self.assertEqual((result["corrupted"], result["missing"]), ([], []))
+        self.assertEqual(self._verify()["status"], "ok")
+        self.assertEqual(self._verify(full=True)["status"], "ok")
+        self.assertEqual(self._verify(update=True)["status"], "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
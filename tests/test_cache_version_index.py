@@ -0,0 +1,62 @@
+import json
+import os
+import unittest
+
+from mlc import utils
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class VersionToTupleTest(unittest.TestCase):
+    def test_compare_versions(self):
+        self.assertEqual(utils.compare_versions("3.10.12", "3.9"), 1)
+        self.assertEqual(utils.compare_versions("1.0", "1.0.0"), 0)
+        self.assertEqual(utils.compare_versions("1.0rc1", "1.0"), -1)
+        self.assertEqual(utils.compare_versions("2.1.0-beta", "2.1.0"), -1)
+        self.assertEqual(utils.compare_versions("1.0.1", "1.0"), 1)
+
+
+class CacheVersionIndexTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        action = Action()
+        action.parent = None
+        self.paths = {}
+        for version in ["3.8.10", "3.10.12", "3.12.0"]:
+            res = action.add({"target_name": "cache",
+                              "tags": "get,python"})
+            self.assertEqual(res["return"], 0)
+            # the cached state is written after the cache is created
+            with open(os.path.join(res["path"], "mlc-cached-state.json"), "w") as f:
+                json.dump({"version": version}, f)
+            self.paths[version] = res["path"]
+
+        self.action = Action()
+        self.cache = CacheAction(self.action)
+        self.action.parent = None
+
+    def _find(self, **filters):
+        res = self.cache.search(dict(tags="get,python", **filters))
+        self.assertEqual(res["return"], 0)
+        return sorted(item.path for item in res["list"])
+
+    def test_version_filters(self):
+        self.assertEqual(self._find(version_min="3.10"),
+                         sorted([self.paths["3.10.12"], self.paths["3.12.0"]]))
+        self.assertEqual(self._find(version_max="3.10.12"),
+                         sorted([self.paths["3.8.10"], self.paths["3.10.12"]]))
+        self.assertEqual(self._find(version_min="3.9", version_max="3.11"),
+                         [self.paths["3.10.12"]])
+        self.assertEqual(len(self._find()), 3)
+
+    def test_versions_are_stored_in_the_index(self):
+        versions = {entry["path"]: entry.get("version")
+                    for entry in self.action.get_index().indices["cache"]}
+        for version, path in self.paths.items():
+            self.assertEqual(versions[path], version)
+
+
+if __name__ == "__main__":
+    unittest.main()
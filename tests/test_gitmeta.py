@@ -0,0 +1,84 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from mlc import gitmeta
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(["git", "-c", "user.name=mlc", "-c", "user.email=mlc@example.com",
+                           "-c", "init.defaultBranch=main", *args],
+                          cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class GitMetaTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.repo = os.path.join(self.temp_dir.name, "repo")
+        os.makedirs(self.repo)
+        _git("init", "-q", cwd=self.repo)
+        with open(os.path.join(self.repo, "file.txt"), "w") as f:
+            f.write("one")
+        _git("add", "file.txt", cwd=self.repo)
+        _git("commit", "-q", "-m", "init", cwd=self.repo)
+        self.commit = _git("rev-parse", "HEAD", cwd=self.repo)
+
+    def test_loose_and_packed_refs(self):
+        self.assertEqual(gitmeta.read_head(self.repo),
+                         {'branch': 'main', 'commit': self.commit})
+
+        _git("pack-refs", "--all", cwd=self.repo)
+        self.assertFalse(os.path.exists(os.path.join(
+            self.repo, ".git", "refs", "heads", "main")))
+        self.assertEqual(gitmeta.read_head(self.repo)['commit'], self.commit)
+
+    def test_detached_head_and_unborn_branch(self):
+        _git("checkout", "-q", "--detach", cwd=self.repo)
+        self.assertEqual(gitmeta.read_head(self.repo),
+                         {'branch': None, 'commit': self.commit})
+
+        _git("checkout", "-q", "--orphan", "empty", cwd=self.repo)
+        self.assertEqual(gitmeta.read_head(self.repo),
+                         {'branch': 'empty', 'commit': None})
+
+        self.assertIsNone(gitmeta.read_head(self.temp_dir.name))
+
+    def test_worktree(self):
+        worktree = os.path.join(self.temp_dir.name, "repo+dev")
+        _git("worktree", "add", "-q", "-b", "dev", worktree, cwd=self.repo)
+        with open(os.path.join(worktree, "file.txt"), "w") as f:
+            f.write("two")
+        _git("commit", "-q", "-am", "dev", cwd=worktree)
+        _git("pack-refs", "--all", cwd=self.repo)
+
+        git_dir, common_dir = gitmeta.find_git_dir(worktree)
+        self.assertEqual(os.path.realpath(common_dir),
+                         os.path.realpath(os.path.join(self.repo, ".git")))
+        self.assertEqual(gitmeta.read_head(worktree),
+                         {'branch': 'dev',
+                          'commit': _git("rev-parse", "HEAD", cwd=worktree)})
+
+    def test_repos_status(self):
+        with open(os.path.join(self.repo, "file.txt"), "w") as f:
+            f.write("changed")
+        other = os.path.join(self.temp_dir.name, "other")
+        os.makedirs(other)
+
+        statuses = gitmeta.get_repos_status([other, self.repo], timeout=30)
+        self.assertEqual(len(statuses), 1)
+        self.assertEqual(statuses[0]['path'], self.repo)
+        self.assertEqual(statuses[0]['branch'], 'main')
+        self.assertEqual(statuses[0]['short'], self.commit[:7])
+        self.assertTrue(statuses[0]['dirty'])
+
+        _git("checkout", "-q", "--", "file.txt", cwd=self.repo)
+        self.assertFalse(gitmeta.get_repos_status([self.repo])[0]['dirty'])
+
+
+if __name__ == "__main__":
+    unittest.main()
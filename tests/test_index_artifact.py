@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import subprocess
+import unittest
+
+import yaml
+
+from mlc.action import Action
+from mlc.repo_action import RepoAction
+from mlc import index_artifact
+
+from helpers import MLCTestCase
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(["git", "-c", "user.name=mlc", "-c", "user.email=mlc@example.com",
+                           "-c", "init.defaultBranch=main", *args],
+                          cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class IndexArtifactTest(MLCTestCase):
+    env_keys = ["MLC_INDEX_ARTIFACTS"]
+
+    def setUp(self):
+        super().setUp()
+        os.environ.pop("MLC_INDEX_ARTIFACTS", None)
+
+        self.source = os.path.join(self.temp_dir.name, "sources", "scripts")
+        script_path = os.path.join(self.source, "script", "hello")
+        os.makedirs(script_path)
+        with open(os.path.join(self.source, "meta.yaml"), "w") as f:
+            yaml.safe_dump({"uid": "6666666666666666", "alias": "scripts"}, f)
+        with open(os.path.join(script_path, "meta.yaml"), "w") as f:
+            yaml.safe_dump({"uid": "7777777777777777", "alias": "hello",
+                            "automation_alias": "script",
+                            "automation_uid": "5b4e0237da074764",
+                            "tags": ["hello"]}, f)
+        _git("init", "-q", cwd=self.source)
+        _git("add", ".", cwd=self.source)
+        _git("commit", "-q", "-m", "init", cwd=self.source)
+        self.commit = _git("rev-parse", "HEAD", cwd=self.source)
+        self.artifacts = os.path.join(self.temp_dir.name, "artifacts")
+
+    def _pull(self, repos_name):
+        os.environ["MLC_REPOS"] = os.path.join(self.temp_dir.name, repos_name)
+        action = Action()
+        repo_action = RepoAction(action)
+        action.parent = None
+        res = repo_action.pull({"repo": "file://" + self.source})
+        self.assertEqual(res["return"], 0, res.get("error"))
+        return os.path.join(os.environ["MLC_REPOS"], "scripts")
+
+    def _script_tags(self):
+        index = Action().get_index()
+        return {item["alias"]: item["tags"]
+                for item in index.indices["script"]}
+
+    def test_reindex_writes_and_pull_loads_the_artifact(self):
+        self._pull("first")
+        res = Action().reindex({"artifacts": self.artifacts})
+        self.assertEqual(res["return"], 0, res.get("error"))
+        artifact_path = index_artifact.get_artifact_path(
+            self.artifacts, "6666666666666666", self.commit)
+        with open(artifact_path) as f:
+            artifact = json.load(f)
+        self.assertEqual(artifact["indices"]["script"],
+                         [{"uid": "7777777777777777", "tags": ["hello"], "alias": "hello",
+                           "path": "script/hello", "config": "meta.yaml"}])
+
+        # mark the artifact to see whether it is used instead of the metas
+        artifact["indices"]["script"][0]["tags"] = ["hello", "prebuilt"]
+        with open(artifact_path, "w") as f:
+            json.dump(artifact, f)
+
+        os.environ["MLC_INDEX_ARTIFACTS"] = self.artifacts
+        repo_path = self._pull("second")
+        self.assertEqual(self._script_tags()["hello"], ["hello", "prebuilt"])
+        index = Action().get_index()
+        self.assertIn(os.path.join(repo_path, "script", "hello", "meta.yaml"),
+                      index.modified_times)
+
+        # a checkout with local changes is parsed
+        with open(os.path.join(self.temp_dir.name, "second", "scripts", "notes.txt"), "w") as f:
+            f.write("untracked")
+        self.assertIsNone(index_artifact.get_clean_commit(repo_path))
+        shutil.copytree(repo_path, os.path.join(
+            self.temp_dir.name, "third", "scripts"))
+        self._pull("third")
+        self.assertEqual(self._script_tags()["hello"], ["hello"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import unittest
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+from mlc.repo_registry import RepoRegistry
+
+from helpers import MLCTestCase
+
+
+class RelocateTest(MLCTestCase):
+    env_keys = ["MLC_CACHE_PIN"]
+
+    def _node(self, repos_path):
+        os.environ["MLC_REPOS"] = repos_path
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        return action, cache
+
+    def test_index_is_stored_relative(self):
+        repos_path = os.path.realpath(os.path.join(self.temp_dir.name, "a"))
+        action, cache = self._node(repos_path)
+        res = action.add({"target_name": "cache", "item": "rel",
+                          "tags": "get,rel"})
+        self.assertEqual(res["return"], 0)
+
+        with open(os.path.join(repos_path, "index_cache.json")) as f:
+            entries = json.load(f)
+        self.assertEqual(entries[0]["path"], os.path.join(
+            "local", "cache", "rel"))
+        self.assertEqual(entries[0]["repo"]["path"], "local")
+
+    def test_relocate_moved_repos_folder(self):
+        old_path = os.path.realpath(os.path.join(self.temp_dir.name, "old"))
+        pinned_root = os.path.realpath(
+            os.path.join(self.temp_dir.name, "pinned"))
+        os.environ["MLC_CACHE_PIN"] = f"get,pinned={pinned_root}"
+        action, cache = self._node(old_path)
+        res = action.add({"target_name": "cache", "item": "moved",
+                          "tags": "get,moved"})
+        self.assertEqual(res["return"], 0)
+        old_cache = res["path"]
+        with open(os.path.join(old_cache, "mlc-cached-state.json"), "w") as f:
+            json.dump({"new_env": {
+                "MLC_MOVED_PATH": os.path.join(old_cache, "file.bin")}}, f)
+        # a cache outside the repos folder depending on the moved one
+        res = action.add({"target_name": "cache", "item": "pinned",
+                          "tags": "get,pinned"})
+        self.assertEqual(res["return"], 0)
+        pinned_cache = res["path"]
+        self.assertTrue(pinned_cache.startswith(pinned_root))
+        with open(os.path.join(pinned_cache, "mlc-cached-state.json"), "w") as f:
+            json.dump({"new_env": {
+                "MLC_MOVED_PATH": os.path.join(old_cache, "file.bin")}}, f)
+
+        new_path = os.path.realpath(os.path.join(self.temp_dir.name, "new"))
+        shutil.move(old_path, new_path)
+
+        action, cache = self._node(new_path)
+        new_cache = os.path.join(new_path, "local", "cache", "moved")
+        # the index is resolved against the new location without a reindex
+        res = cache.search({"tags": "get,moved"})
+        self.assertEqual([item.path for item in res["list"]], [new_cache])
+
+        res = action.relocate({})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(res["from"], old_path)
+
+        with open(os.path.join(new_path, "repos.json")) as f:
+            self.assertEqual(json.load(f), [os.path.join(new_path, "local")])
+        with open(os.path.join(new_cache, "mlc-cached-state.json")) as f:
+            state = json.load(f)
+        self.assertEqual(state["new_env"]["MLC_MOVED_PATH"],
+                         os.path.join(new_cache, "file.bin"))
+        with open(os.path.join(pinned_cache, "mlc-cached-state.json")) as f:
+            state = json.load(f)
+        self.assertEqual(state["new_env"]["MLC_MOVED_PATH"],
+                         os.path.join(new_cache, "file.bin"))
+        self.assertEqual([repo.path for repo in RepoRegistry.get(
+            new_path).get_repos()], [os.path.join(new_path, "local")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import unittest
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+
+from mlc.action import Action
+from mlc.cache_action import CacheAction
+
+from helpers import MLCTestCase
+
+
+class PutRequestHandler(SimpleHTTPRequestHandler):
+    def do_PUT(self):
+        path = self.translate_path(self.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        length = int(self.headers['Content-Length'])
+        with open(path, "wb") as f:
+            f.write(self.rfile.read(length))
+        self.send_response(201)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RemoteCacheTest(MLCTestCase):
+    env_keys = ["MLC_CACHE_REMOTE"]
+
+    def _node(self, name):
+        os.environ["MLC_REPOS"] = os.path.join(self.temp_dir.name, name)
+        action = Action()
+        cache = CacheAction(action)
+        action.parent = None
+        return action, cache
+
+    def _create_and_push(self):
+        action, cache = self._node("producer")
+        res = action.add({"target_name": "cache", "tags": "get,remote",
+                          "cache_key_env": {"MLC_VERSION": "1"}})
+        self.assertEqual(res["return"], 0)
+        path = res["path"]
+        with open(os.path.join(path, "payload.bin"), "wb") as f:
+            f.write(b"x" * 1000)
+        with open(os.path.join(path, "mlc-cached-state.json"), "w") as f:
+            json.dump({"new_env": {
+                "MLC_REMOTE_PATH": os.path.join(path, "payload.bin")}}, f)
+
+        res = cache.push({"tags": "get,remote"})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(len(res["list"]), 1)
+        return res["list"][0].meta["cache_key"]
+
+    def _check_consumer(self, key):
+        action, cache = self._node("consumer")
+        res = cache.lookup({"key": key})
+        self.assertEqual(res["return"], 0)
+        self.assertTrue(res.get("remote"))
+        path = res["list"][0].path
+        self.assertTrue(path.startswith(action.repos_path))
+        with open(os.path.join(path, "mlc-cached-state.json")) as f:
+            state = json.load(f)
+        self.assertEqual(state["new_env"]["MLC_REMOTE_PATH"],
+                         os.path.join(path, "payload.bin"))
+
+        # registered locally, so the next lookup is a local hit
+        res = cache.lookup({"key": key})
+        self.assertEqual(res["list"][0].path, path)
+        self.assertFalse(res.get("remote"))
+
+        # single-flight creation reuses the fetched entry
+        action, cache = self._node("consumer-2")
+        res = action.add({"target_name": "cache", "tags": "get,remote",
+                          "cache_key_env": {"MLC_VERSION": "1"},
+                          "single_flight": True})
+        self.assertEqual(res["return"], 0)
+        self.assertTrue(res.get("remote"))
+        self.assertTrue(os.path.isfile(
+            os.path.join(res["path"], "payload.bin")))
+
+    def test_shared_folder_remote(self):
+        os.environ["MLC_CACHE_REMOTE"] = os.path.join(
+            self.temp_dir.name, "remote")
+        key = self._create_and_push()
+        self._check_consumer(key)
+
+    def test_http_remote(self):
+        root = os.path.join(self.temp_dir.name, "http-root")
+        os.makedirs(root)
+        server = HTTPServer(("127.0.0.1", 0),
+                            partial(PutRequestHandler, directory=root))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        os.environ["MLC_CACHE_REMOTE"] = f"http://127.0.0.1:{server.server_address[1]}/cache"
+        key = self._create_and_push()
+        self._check_consumer(key)
+
+    def test_corrupted_remote_entry_is_a_miss(self):
+        remote = os.path.join(self.temp_dir.name, "remote")
+        os.environ["MLC_CACHE_REMOTE"] = remote
+        key = self._create_and_push()
+        with open(os.path.join(remote, key[:2], key + ".tar.gz.sha256"), "w") as f:
+            f.write("0" * 64)
+
+        action, cache = self._node("consumer")
+        res = cache.lookup({"key": key})
+        self.assertEqual(res["return"], 0)
+        self.assertEqual(res["list"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from mlc.action import Action
+from mlc.repo_action import RepoAction
+from mlc.repo_registry import RepoRegistry
+
+from helpers import MLCTestCase
+
+
+class RepoRegistryTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.repos_path = os.path.join(self.temp_dir.name, "repos")
+        os.environ["MLC_REPOS"] = self.repos_path
+
+        self.action = Action()
+        self.repo_action = RepoAction(self.action)
+        self.action.parent = None
+
+    def _make_repo(self, folder, alias, uid):
+        path = os.path.join(self.repos_path, folder)
+        os.makedirs(path)
+        with open(os.path.join(path, "meta.yaml"), "w") as f:
+            yaml.safe_dump({"alias": alias, "uid": uid}, f)
+        return path
+
+    def _repos_file(self):
+        with open(os.path.join(self.repos_path, "repos.json")) as f:
+            return json.load(f)
+
+    def test_lookups(self):
+        path = self._make_repo("owner@tools", "tools", "1234567890abcdef")
+        res = self.repo_action.register_repo(
+            path, {"alias": "tools", "uid": "1234567890abcdef"})
+        self.assertEqual(res["return"], 0)
+
+        registry = RepoRegistry.get(self.repos_path)
+        self.assertIs(registry, RepoRegistry.get(self.repos_path))
+        self.assertEqual(registry.find_by_path(path).path, path)
+        self.assertEqual(registry.find_by_folder("owner@tools").path, path)
+        self.assertEqual(
+            [r.path for r in registry.find(alias="tools")], [path])
+        self.assertEqual([r.path for r in registry.find(
+            uid="1234567890abcdef")], [path])
+
+        for repo in ["tools", "1234567890abcdef", "owner@tools",
+                     "tools,1234567890abcdef"]:
+            res = self.repo_action.find({"item": repo})
+            self.assertEqual(res["return"], 0, repo)
+            self.assertEqual([r.path for r in res["list"]], [path], repo)
+
+    def test_reload_on_external_change(self):
+        registry = RepoRegistry.get(self.repos_path)
+        count = len(registry.get_repos())
+
+        # another process registers a repo
+        path = self._make_repo("other", "other", "abcdef1234567890")
+        paths = self._repos_file() + [path]
+        with open(os.path.join(self.repos_path, "repos.json"), "w") as f:
+            json.dump(paths, f)
+
+        self.assertEqual(len(registry.get_repos()), count + 1)
+        self.assertEqual(registry.find(alias="other")[0].path, path)
+
+        self.repo_action.unregister_repo(path)
+        self.assertNotIn(path, self._repos_file())
+        self.assertEqual(registry.find(alias="other"), [])
+
+    def test_concurrent_updates_are_not_lost(self):
+        paths = [self._make_repo(f"repo{i}", f"repo{i}", f"{i:016x}")
+                 for i in range(20)]
+        registry = RepoRegistry(self.repos_path)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(
+                lambda p: registry.update(lambda repos: repos + [p]), paths))
+
+        repos_list = self._repos_file()
+        for path in paths:
+            self.assertIn(path, repos_list)
+        self.assertEqual(len(registry.get_repos()), len(repos_list))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import unittest
+
+import yaml
+
+from mlc.action import Action
+from mlc.repo_action import RepoAction
+
+from helpers import MLCTestCase
+
+
+def _git(*args, cwd=None):
+    subprocess.run(["git", "-c", "user.name=mlc", "-c", "user.email=mlc@example.com",
+                    "-c", "init.defaultBranch=main", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+@unittest.skipUnless(shutil.which("git"), "git is not installed")
+class RepoStatusTest(MLCTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.temp_dir.name, "sources", "scripts")
+        os.makedirs(self.source)
+        with open(os.path.join(self.source, "meta.yaml"), "w") as f:
+            yaml.safe_dump({"uid": "4444444444444444", "alias": "scripts"}, f)
+        _git("init", "-q", cwd=self.source)
+        _git("add", ".", cwd=self.source)
+        _git("commit", "-q", "-m", "init", cwd=self.source)
+        self.repo_path = os.path.join(os.environ["MLC_REPOS"], "scripts")
+
+    def _repo_action(self):
+        action = Action()
+        repo_action = RepoAction(action)
+        action.parent = None
+        return repo_action
+
+    def _status(self, run_args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            res = self._repo_action().status(run_args)
+        self.assertEqual(res["return"], 0, res.get("error"))
+        return res, output.getvalue()
+
+    def test_status_of_a_changed_repo(self):
+        res = self._repo_action().pull({"repo": "file://" + self.source})
+        self.assertEqual(res["return"], 0, res.get("error"))
+
+        # a local commit with a script meta missing its automation_uid
+        script_path = os.path.join(self.repo_path, "script", "broken")
+        os.makedirs(script_path)
+        with open(os.path.join(script_path, "meta.yaml"), "w") as f:
+            yaml.safe_dump({"uid": "5555555555555555", "alias": "broken",
+                            "automation_alias": "script"}, f)
+        _git("add", ".", cwd=self.repo_path)
+        _git("commit", "-q", "-m", "broken script", cwd=self.repo_path)
+        with open(os.path.join(self.repo_path, "meta.yaml"), "a") as f:
+            f.write("# edited\n")
+        Action().get_index()
+
+        res, output = self._status({"json": True})
+        report = json.loads(output)
+        self.assertEqual(report, res["list"])
+        status = [s for s in report if s["path"] == self.repo_path][0]
+        self.assertEqual(status["type"], "git")
+        self.assertEqual(status["branch"], "main")
+        self.assertTrue(status["dirty"])
+        self.assertEqual(status["upstream"], "origin/main")
+        self.assertEqual((status["ahead"], status["behind"]), (1, 0))
+        self.assertEqual(list(status["meta_errors"]),
+                         [os.path.join("script", "broken", "meta.yaml")])
+
+        # the upstream is only fetched with --remote
+        with open(os.path.join(self.source, "README.md"), "w") as f:
+            f.write("readme")
+        _git("add", ".", cwd=self.source)
+        _git("commit", "-q", "-m", "readme", cwd=self.source)
+        res, output = self._status({"repo": "scripts"})
+        self.assertEqual(res["list"][0]["behind"], 0)
+        self.assertIn("+1/-0", output)
+        self.assertIn("modified", output)
+        res, output = self._status({"repo": "scripts", "remote": True})
+        self.assertEqual(res["list"][0]["behind"], 1)
+        self.assertIn("+1/-1", output)
+
+    def test_meta_errors_of_an_existing_index(self):
+        res = self._repo_action().pull({"repo": "file://" + self.source})
+        self.assertEqual(res["return"], 0, res.get("error"))
+        script_path = os.path.join(self.repo_path, "script", "broken")
+        os.makedirs(script_path)
+        with open(os.path.join(script_path, "meta.yaml"), "w") as f:
+            yaml.safe_dump({"uid": "5555555555555555", "alias": "broken",
+                            "automation_alias": "script"}, f)
+        index = Action().get_index()
+        self.assertEqual(len(index.get_meta_errors(self.repo_path)), 1)
+
+        # an index built before the validation errors were recorded
+        os.remove(index.meta_errors_file)
+        res, _ = self._status({"json": True})
+        status = [s for s in res["list"] if s["path"] == self.repo_path][0]
+        self.assertEqual(list(status["meta_errors"]),
+                         [os.path.join("script", "broken", "meta.yaml")])
+
+        # the recorded errors are used from then on, also when there is none
+        shutil.rmtree(script_path)
+        Action().get_index()
+        self.assertTrue(os.path.exists(index.meta_errors_file))
+        self.assertEqual(Action().get_index().get_meta_errors(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()